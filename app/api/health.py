@@ -0,0 +1,30 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.core.warmup import global_warmup
+
+router = APIRouter()
+
+
+def setup_health_api(state):
+    @router.get("/healthz")
+    async def liveness():
+        """存活探针：进程与事件循环能够响应即可"""
+        return {"status": "ok"}
+
+    @router.get("/readyz")
+    async def readiness():
+        """就绪探针：启动流程完成且转换引擎预热结束后才接收流量"""
+        initialized = state.initialized.is_set()
+        ready = initialized and global_warmup.ready
+        return JSONResponse(
+            status_code=200 if ready else 503,
+            content={
+                "status": "ready" if ready else "starting",
+                "initialized": initialized,
+                "database": state.db_connected,
+                "warmup": global_warmup.get_status(),
+            },
+        )
+
+    return router
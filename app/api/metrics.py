@@ -0,0 +1,41 @@
+import asyncio
+import secrets
+
+from fastapi import APIRouter, Request, Response
+
+from app.core.auth import get_admin_allowed_hosts, is_host_allowed
+from app.core.config import settings
+from app.core.metrics import queue_snapshot, registry
+
+router = APIRouter()
+
+
+async def _scrape_allowed(request: Request) -> bool:
+    """
+    配置了 METRICS_TOKEN 时凭 Bearer 令牌抓取，否则按管理员白名单判断；两者都未配置时不开放。
+    同机反向代理转发的请求来源均为 127.0.0.1，不能再以本机地址作为默认放行条件。
+    """
+    if settings.METRICS_TOKEN:
+        auth = request.headers.get("authorization", "")
+        return secrets.compare_digest(auth, f"Bearer {settings.METRICS_TOKEN}")
+    allowed_hosts = await get_admin_allowed_hosts()
+    if not allowed_hosts:
+        return False
+    client_ip = request.client.host if request.client else ""
+    return is_host_allowed(allowed_hosts, client_ip, request.headers.get("host", ""))
+
+
+def setup_metrics_api():
+    @router.get("/metrics")
+    async def metrics(request: Request):
+        if not await _scrape_allowed(request):
+            return Response(content="Forbidden", status_code=403)
+
+        # 调度器状态只能在事件循环中读取，先取快照；目录占用等采集项会访问磁盘，放到线程中生成
+        queue_snapshot.capture()
+        body = await asyncio.get_running_loop().run_in_executor(None, registry.render)
+        return Response(
+            content=body, media_type="text/plain; version=0.0.4; charset=utf-8"
+        )
+
+    return router
@@ -40,3 +40,15 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def is_authenticated() -> bool:
     """检查当前会话是否已通过身份验证"""
     return app.storage.user.get("authenticated", False)
+
+
+async def get_admin_allowed_hosts() -> list:
+    """读取管理员白名单（站点/IP），未配置时返回空列表"""
+    from app.core.settings_manager import get_setting
+
+    allowed_hosts_str = await get_setting("admin_allowed_hosts", "")
+    return [h.strip() for h in allowed_hosts_str.split(",") if h.strip()]
+
+
+def is_host_allowed(allowed_hosts: list, client_ip: str, request_host: str) -> bool:
+    return client_ip in allowed_hosts or request_host in allowed_hosts
@@ -0,0 +1,207 @@
+import asyncio
+import os
+from typing import Optional
+
+from app.core.task_manager import (
+    COST_HEAVY,
+    COST_WEIGHTS,
+    TaskManager,
+    global_task_manager,
+)
+
+# 设置项键名（存储于 settings 表）
+SETTING_ENABLED = "task_autotune_enabled"
+SETTING_CAPACITY = "task_capacity"
+SETTING_FLOOR = "task_autotune_floor"
+SETTING_CEILING = "task_autotune_ceiling"
+
+# 计算最近耗时所用的样本数
+RATIO_WINDOW = 5
+# 耗时基线的滑动平均系数：低于基线时较快跟随，高于基线时缓慢上升
+BASELINE_FALL = 0.5
+BASELINE_RISE = 0.1
+
+
+class ConcurrencyAutotuner:
+    """
+    并发预算自动调节器（AIMD）。
+    队列有积压且 CPU、内存、执行耗时都健康时按 increase_step 加法扩容；
+    任一指标过载时按 decrease_factor 乘法缩容，预算始终限制在 [floor, ceiling] 内。
+    """
+
+    def __init__(
+        self,
+        manager: TaskManager,
+        floor: Optional[int] = None,
+        ceiling: Optional[int] = None,
+        interval: float = 10.0,
+        increase_step: int = 1,
+        decrease_factor: float = 0.5,
+        cpu_target: float = 70.0,
+        cpu_high: float = 90.0,
+        min_available_memory_percent: float = 15.0,
+        max_service_time_ratio: float = 1.5,
+    ):
+        self.manager = manager
+        self.floor = floor or manager.capacity
+        self.ceiling = ceiling or max(
+            self.floor, (os.cpu_count() or 1) * COST_WEIGHTS[COST_HEAVY] // 2
+        )
+        self.interval = interval
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.cpu_target = cpu_target
+        self.cpu_high = cpu_high
+        self.min_available_memory_percent = min_available_memory_percent
+        self.max_service_time_ratio = max_service_time_ratio
+        self.enabled = False
+        self.last_decision = "未启用"
+        self._baselines = {}
+        # 上次更新基线时各模块的累计样本数，没有新样本时不更新基线
+        self._sample_counts = {}
+        self._runner: Optional[asyncio.Task] = None
+
+    def _service_time_ratio(self) -> float:
+        """
+        最近执行耗时相对基线的倍数，按模块（任务名与资源类别）分别计算后取最大值。
+        同一资源类别下各模块的耗时差异很大（单个文档与批量分组），按模块比较才不会互相干扰；
+        基线为指数滑动平均，耗时下降时较快跟随，上升时缓慢抬高，
+        避免一次偶然的快速窗口把基线永久压低；只在模块有新样本时更新，
+        空闲期间同一窗口不会被反复计入基线。
+        """
+        ratio = 1.0
+        for module, samples in list(self.manager.durations.items()):
+            if len(samples) < RATIO_WINDOW:
+                continue
+            recent = sum(list(samples)[-RATIO_WINDOW:]) / RATIO_WINDOW
+            if recent <= 0:
+                continue
+            baseline = self._baselines.get(module, recent)
+            ratio = max(ratio, recent / baseline)
+            count = self.manager.duration_counts.get(module, 0)
+            if self._sample_counts.get(module) == count:
+                continue
+            self._sample_counts[module] = count
+            alpha = BASELINE_FALL if recent < baseline else BASELINE_RISE
+            self._baselines[module] = baseline + alpha * (recent - baseline)
+        return ratio
+
+    def step(self) -> int:
+        """执行一次调节并返回新的预算"""
+        import psutil
+
+        capacity = self.manager.capacity
+        cpu = psutil.cpu_percent()
+        vm = psutil.virtual_memory()
+        available_percent = vm.available / vm.total * 100
+        ratio = self._service_time_ratio()
+        waiting = self.manager.get_status()["waiting_count"]
+        head = self.manager.next_waiting()
+
+        if cpu > self.cpu_high:
+            reason = f"CPU {cpu}% 过载"
+        elif available_percent < self.min_available_memory_percent:
+            reason = f"可用内存 {available_percent:.0f}% 不足"
+        elif ratio > self.max_service_time_ratio:
+            reason = f"执行耗时上升至 {ratio:.1f} 倍"
+        else:
+            reason = None
+
+        if reason is not None:
+            new_capacity = max(self.floor, int(capacity * self.decrease_factor))
+            self.last_decision = f"缩容: {reason}"
+        elif (
+            head is not None
+            and cpu < self.cpu_target
+            and self.manager.used_capacity + head.weight > capacity
+        ):
+            new_capacity = min(self.ceiling, capacity + self.increase_step)
+            self.last_decision = f"扩容: 等待 {waiting} 个, CPU {cpu}%"
+        else:
+            new_capacity = capacity
+            self.last_decision = f"保持: 等待 {waiting} 个, CPU {cpu}%"
+
+        new_capacity = min(self.ceiling, max(self.floor, new_capacity))
+        if new_capacity != capacity:
+            print(
+                f"[Autotune] 并发预算 {capacity} -> {new_capacity} ({self.last_decision})"
+            )
+            self.manager.set_capacity(new_capacity)
+        return new_capacity
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.step()
+            except Exception as e:
+                print(f"[Autotune] 调节失败: {e}")
+
+    def start(self):
+        self.enabled = True
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+        self.last_decision = "已启用"
+
+    def stop(self):
+        self.enabled = False
+        if self._runner is not None:
+            self._runner.cancel()
+            self._runner = None
+        self.last_decision = "手动模式"
+
+    def get_status(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "capacity": self.manager.capacity,
+            "floor": self.floor,
+            "ceiling": self.ceiling,
+            "last_decision": self.last_decision,
+        }
+
+    async def load_settings(self):
+        """从设置表恢复管理员配置"""
+        from app.core.settings_manager import get_setting
+
+        floor = await get_setting(SETTING_FLOOR, "")
+        ceiling = await get_setting(SETTING_CEILING, "")
+        if floor.isdigit():
+            self.floor = max(1, int(floor))
+        if ceiling.isdigit():
+            self.ceiling = max(self.floor, int(ceiling))
+
+        capacity = await get_setting(SETTING_CAPACITY, "")
+        if capacity.isdigit():
+            self.manager.set_capacity(int(capacity))
+
+        if (await get_setting(SETTING_ENABLED, "false")) == "true":
+            self.start()
+
+    async def override(self, capacity: int):
+        """管理员手动指定预算，同时关闭自动调节"""
+        from app.core.settings_manager import set_setting
+
+        self.stop()
+        self.manager.set_capacity(capacity)
+        await set_setting(SETTING_CAPACITY, str(self.manager.capacity))
+        await set_setting(SETTING_ENABLED, "false")
+
+    async def set_enabled(self, enabled: bool):
+        from app.core.settings_manager import set_setting
+
+        if enabled:
+            self.start()
+        else:
+            self.stop()
+        await set_setting(SETTING_ENABLED, "true" if enabled else "false")
+
+    async def set_bounds(self, floor: int, ceiling: int):
+        from app.core.settings_manager import set_setting
+
+        self.floor = max(1, int(floor))
+        self.ceiling = max(self.floor, int(ceiling))
+        await set_setting(SETTING_FLOOR, str(self.floor))
+        await set_setting(SETTING_CEILING, str(self.ceiling))
+
+
+global_autotuner = ConcurrencyAutotuner(global_task_manager)
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.pdf_tools import PdfInfo, inspect_pdf
+
+ENGINE_LIBREOFFICE = "libreoffice"
+ENGINE_MARKDOWN = "markdown"
+# 简单 Word 文档的纯 Python 快速路径
+ENGINE_DOCX = "docx"
+
+# 渲染逻辑变化时递增，使旧的缓存结果失效
+MARKDOWN_RENDERER_VERSION = "2"
+DOCX_RENDERER_VERSION = "1"
+RENDERER_VERSIONS = {
+    ENGINE_MARKDOWN: MARKDOWN_RENDERER_VERSION,
+    ENGINE_DOCX: DOCX_RENDERER_VERSION,
+}
+
+_engine_versions = {}
+_engine_lock = threading.Lock()
+
+
+def engine_version(engine: str) -> str:
+    """转换引擎版本，作为缓存键的一部分；首次调用时探测并缓存"""
+    with _engine_lock:
+        if engine not in _engine_versions:
+            if engine == ENGINE_LIBREOFFICE:
+                from app.core.office_pool import libreoffice_path
+
+                try:
+                    out = subprocess.run(
+                        [libreoffice_path(), "--version"],
+                        capture_output=True,
+                        text=True,
+                        timeout=60,
+                    ).stdout.strip()
+                except (OSError, subprocess.SubprocessError):
+                    out = ""
+                _engine_versions[engine] = out or "unknown"
+            elif engine in RENDERER_VERSIONS:
+                import reportlab
+
+                _engine_versions[engine] = (
+                    f"{RENDERER_VERSIONS[engine]}/reportlab-{reportlab.Version}"
+                )
+            else:
+                _engine_versions[engine] = "unknown"
+        return _engine_versions[engine]
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def make_key(content_hash: str, engine: str, **options) -> str:
+    """由输入内容的 SHA-256、引擎版本与转换选项组成缓存键"""
+    raw = json.dumps(
+        {
+            "sha256": content_hash,
+            "engine": engine,
+            "version": engine_version(engine),
+            "options": options,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class ConversionCache:
+    """
+    以内容寻址的转换结果缓存：<key>.pdf 为转换结果，<key>.json 记录 PDF 元数据与写入时间。
+    按最近访问时间淘汰，总大小不超过 max_bytes，超过 ttl 秒的条目视为失效。
+    索引在首次访问时扫描目录重建，重启后缓存仍然有效。
+    """
+
+    def __init__(self, root: str, max_bytes: int, ttl: float):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # key -> (字节数, PDF 元数据, 写入时间)，按访问顺序排列，最久未访问的在前
+        self._index: "OrderedDict[str, Tuple[int, PdfInfo, float]]" = OrderedDict()
+        self._bytes = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.root, key)
+        return f"{base}.pdf", f"{base}.json"
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        os.makedirs(self.root, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.root):
+            if not name.endswith(".json"):
+                continue
+            key = name[:-5]
+            pdf_path, meta_path = self._paths(key)
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                stat = os.stat(pdf_path)
+                # 旧格式的条目只记录了页数，没有完整的元数据记录，直接丢弃
+                info = PdfInfo.from_dict(meta["info"])
+                entries.append(
+                    (stat.st_mtime, key, stat.st_size, info, meta["created"])
+                )
+            except (OSError, ValueError, KeyError, TypeError):
+                self._remove_files(key)
+        for _, key, size, info, created in sorted(entries, key=lambda e: e[:2]):
+            self._index[key] = (size, info, created)
+            self._bytes += size
+        self._evict()
+
+    def _remove_files(self, key: str):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _drop(self, key: str):
+        size, _, _ = self._index.pop(key)
+        self._bytes -= size
+        self._remove_files(key)
+
+    def _evict(self):
+        while self._index and self._bytes > self.max_bytes:
+            self._drop(next(iter(self._index)))
+
+    def _record(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        metrics.conversion_cache_total.inc(result="hit" if hit else "miss")
+
+    def lookup(self, key: str) -> Optional[Tuple[str, PdfInfo]]:
+        """命中时返回 (缓存的 PDF 路径, 元数据记录)，路径只可读取或复制"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            self._load()
+            entry = self._index.get(key)
+            if entry is not None and time.time() - entry[2] > self.ttl:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self._record(False)
+                return None
+            self._index.move_to_end(key)
+            pdf_path, _ = self._paths(key)
+            try:
+                os.utime(pdf_path)
+            except OSError:
+                self._drop(key)
+                self._record(False)
+                return None
+            self._record(True)
+            return pdf_path, entry[1]
+
+    def fetch(self, key: str, dest_path: str) -> Optional[PdfInfo]:
+        """命中时把缓存结果复制到 dest_path 并返回元数据记录，未命中返回 None"""
+        found = self.lookup(key)
+        if found is None:
+            return None
+        try:
+            shutil.copyfile(found[0], dest_path)
+        except OSError as e:
+            print(f"[Cache] 复制缓存结果失败: {e}")
+            return None
+        return found[1]
+
+    def store(self, key: str, pdf_path: str, info: Optional[PdfInfo] = None):
+        """把转换结果及其元数据记录写入缓存，失败时只打印日志"""
+        if not self.enabled or not os.path.exists(pdf_path):
+            return
+        if info is None:
+            info = inspect_pdf(pdf_path)
+        try:
+            size = info.size or os.path.getsize(pdf_path)
+            if size > self.max_bytes:
+                return
+            with self._lock:
+                self._load()
+            target_pdf, target_meta = self._paths(key)
+            tmp = os.path.join(self.root, f".{uuid.uuid4().hex}.tmp")
+            shutil.copyfile(pdf_path, tmp)
+            created = time.time()
+            with self._lock:
+                if key in self._index:
+                    self._drop(key)
+                os.replace(tmp, target_pdf)
+                with open(target_meta, "w", encoding="utf-8") as f:
+                    json.dump({"info": info.to_dict(), "created": created}, f)
+                self._index[key] = (size, info, created)
+                self._bytes += size
+                self._evict()
+        except OSError as e:
+            print(f"[Cache] 写入缓存失败: {e}")
+
+    def get_status(self) -> dict:
+        with self._lock:
+            if self.enabled:
+                self._load()
+            total = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total * 100, 1) if total else 0.0,
+                "entries": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+global_conversion_cache = ConversionCache(
+    root=os.path.join(os.getcwd(), "temp_files", "conversion_cache"),
+    max_bytes=settings.CONVERSION_CACHE_MAX_MB * 1024 * 1024,
+    ttl=settings.CONVERSION_CACHE_TTL_HOURS * 3600,
+)
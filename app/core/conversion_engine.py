@@ -0,0 +1,420 @@
+import asyncio
+import hashlib
+import io
+import os
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.conversion_cache import (
+    ENGINE_DOCX,
+    ENGINE_LIBREOFFICE,
+    ENGINE_MARKDOWN,
+    ConversionCache,
+    file_digest,
+    global_conversion_cache,
+    make_key,
+)
+from app.core.pdf_tools import PdfInfo
+from app.core.worker_pool import ConversionProcessPool, global_process_pool
+
+# 进程池渲染的等待间隔（秒），每次等待结束后检查任务是否被取消
+RENDER_POLL_SECONDS = 0.5
+
+# 文件扩展名 -> 转换引擎
+ENGINES = {".docx": ENGINE_LIBREOFFICE, ".md": ENGINE_MARKDOWN}
+
+
+def engine_for(file_name: str) -> Optional[str]:
+    return ENGINES.get(Path(file_name).suffix.lower())
+
+
+@dataclass
+class ConversionOptions:
+    """
+    一次转换的选项。
+    add_blank_page 会影响输出内容，是缓存键的一部分；其余字段只影响执行方式。
+    """
+
+    add_blank_page: bool = False
+    # 单个文档（或一批文档）的转换时限，秒
+    timeout: Optional[float] = None
+    # 所属任务，转换进程会登记到任务上，任务取消或超时时被结束
+    task_id: Optional[str] = None
+    # 记录转换字节数指标时使用的模块名，为空则不记录
+    module: str = ""
+
+    def cache_options(self) -> dict:
+        return {"add_blank_page": self.add_blank_page}
+
+
+@dataclass
+class ConversionResult:
+    success: bool
+    output_path: Optional[str] = None
+    pages: int = 0
+    # 结果是否直接取自转换缓存
+    cached: bool = False
+    error: str = ""
+    # 输出 PDF 的元数据记录（页数、尺寸、字节数、哈希），同时保存在输出文件旁
+    info: Optional[PdfInfo] = None
+
+
+class ConversionEngine:
+    """
+    所有 PDF 转换模块共用的转换服务。
+    Word 文档交给 LibreOffice（常驻实例池或命令行），通过复杂度检查的简单文档与 Markdown
+    在转换进程池中直接用 reportlab 排版，快速排版失败时自动退回 LibreOffice；
+    统一负责超时、空白页补齐、页数统计、结果缓存与指标。
+    同步方法供工作线程调用，异步方法在线程池中执行同步方法，不阻塞事件循环。
+    """
+
+    def __init__(self, cache: ConversionCache, process_pool: ConversionProcessPool):
+        self.cache = cache
+        self.process_pool = process_pool
+
+    def supports(self, file_name: str) -> bool:
+        return engine_for(file_name) is not None
+
+    def select_engine(
+        self, input_path: str, content: Optional[bytes] = None
+    ) -> Optional[str]:
+        """按扩展名选择引擎；Word 文档通过复杂度检查时改走快速路径"""
+        engine = engine_for(input_path)
+        if engine == ENGINE_LIBREOFFICE and settings.DOCX_FAST_PATH:
+            from app.core.docx_renderer import analyze_docx
+
+            source = io.BytesIO(content) if content is not None else input_path
+            if analyze_docx(source) is None:
+                return ENGINE_DOCX
+        return engine
+
+    def cache_key(
+        self,
+        input_path: str,
+        options: ConversionOptions,
+        content: Optional[bytes] = None,
+        engine: Optional[str] = None,
+    ) -> Optional[str]:
+        if not self.cache.enabled:
+            return None
+        engine = engine or self.select_engine(input_path, content)
+        if engine is None:
+            return None
+        try:
+            digest = (
+                hashlib.sha256(content).hexdigest()
+                if content is not None
+                else file_digest(input_path)
+            )
+        except OSError:
+            return None
+        return make_key(digest, engine, **options.cache_options())
+
+    def lookup_sync(
+        self,
+        input_path: str,
+        output_path: str,
+        options: ConversionOptions,
+        content: Optional[bytes] = None,
+    ) -> Optional[ConversionResult]:
+        """
+        查询转换缓存，命中时把结果复制到 output_path，并在旁边写入元数据记录。
+        content 为输入文件内容，文件尚未写入磁盘时可直接传入，此时 input_path 只用于判断类型。
+        """
+        from app.core.pdf_tools import save_pdf_info
+
+        if not self.cache.enabled:
+            return None
+        engine = self.select_engine(input_path, content)
+        key = self.cache_key(input_path, options, content, engine)
+        if key is None:
+            return None
+        started = time.perf_counter()
+        info = self.cache.fetch(key, output_path)
+        if info is None:
+            return None
+        save_pdf_info(output_path, info)
+        metrics.conversion_seconds.observe(
+            time.perf_counter() - started, engine=engine, status="hit"
+        )
+        if options.module:
+            metrics.observe_file_size(options.module, "out", output_path)
+        return ConversionResult(True, output_path, info.pages, cached=True, info=info)
+
+    async def lookup(
+        self,
+        input_path: str,
+        output_path: str,
+        options: ConversionOptions,
+        content: Optional[bytes] = None,
+    ) -> Optional[ConversionResult]:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.lookup_sync, input_path, output_path, options, content
+        )
+
+    def _cancelled(self, options: ConversionOptions) -> bool:
+        from app.core.task_manager import global_task_manager
+
+        return bool(options.task_id) and global_task_manager.is_cancelled(
+            options.task_id
+        )
+
+    def _finish(
+        self,
+        input_path: str,
+        output_path: str,
+        options: ConversionOptions,
+        started: float,
+        engine: str,
+        selected: str,
+    ) -> ConversionResult:
+        """
+        转换后的统一处理：统计页数、补齐空白页、线性化、生成元数据记录、写入缓存并记录指标。
+        元数据记录只在这里生成一次，之后的结果展示与下载都直接读取记录，不再解析 PDF。
+        :param engine: 实际完成转换的引擎
+        :param selected: select_engine 选出的引擎，缓存按它寻址以便 lookup_sync 命中
+            （快速排版失败后改用 LibreOffice 的文档两者不同）
+        """
+        from app.core.pdf_tools import (
+            count_pages,
+            inspect_pdf,
+            linearize_pdf,
+            pad_to_even_pages,
+            save_pdf_info,
+        )
+
+        if not os.path.exists(output_path):
+            metrics.conversion_seconds.observe(
+                time.perf_counter() - started, engine=engine, status="failed"
+            )
+            return ConversionResult(False, error="转换失败，未生成输出文件")
+        pages = count_pages(output_path)
+        if options.add_blank_page:
+            pages = pad_to_even_pages(output_path, pages)
+        # 线性化会重排整个文件，必须在补齐空白页（增量更新）之后进行
+        linearize_pdf(output_path, pages, options.task_id, options.timeout)
+        info = inspect_pdf(output_path, pages)
+        save_pdf_info(output_path, info)
+        metrics.conversion_seconds.observe(
+            time.perf_counter() - started, engine=engine, status="converted"
+        )
+        if options.module:
+            metrics.observe_file_size(options.module, "in", input_path)
+            metrics.observe_file_size(options.module, "out", output_path)
+        key = self.cache_key(input_path, options, engine=selected)
+        if key is not None:
+            self.cache.store(key, output_path, info)
+        return ConversionResult(True, output_path, info.pages, info=info)
+
+    def _render_in_pool(
+        self,
+        render: Callable[[str, str], None],
+        items: List[Tuple[str, str]],
+        options: ConversionOptions,
+        label: str,
+    ) -> Dict[str, str]:
+        """
+        在转换进程池中并行执行纯 Python 渲染，返回 {输入路径: 错误信息}。
+        整组渲染共用一个截止时间，等待期间检查任务是否被取消；超时或取消时回收进程池，
+        结束仍在运行的渲染。输出先写入临时文件，成功后才改名为目标文件，
+        被放弃的渲染不会与随后的 LibreOffice 回退写入同一个文件。
+        """
+        deadline = time.monotonic() + options.timeout if options.timeout else None
+        targets = {src: (dst, f"{dst}.part") for src, dst in items}
+        pending = {
+            self.process_pool.submit(render, src, tmp): src
+            for src, (_, tmp) in targets.items()
+        }
+        retried = set()
+        errors = {}
+        while pending:
+            if self._cancelled(options):
+                stop = "任务已取消"
+            elif deadline is not None and time.monotonic() >= deadline:
+                stop = f"{label}超时 ({options.timeout}s)"
+            else:
+                stop = None
+            if stop is not None:
+                for future, src in pending.items():
+                    future.cancel()
+                    errors[src] = stop
+                if any(future.running() for future in pending):
+                    self.process_pool.recycle(stop)
+                break
+
+            remaining = RENDER_POLL_SECONDS
+            if deadline is not None:
+                remaining = min(remaining, max(0.0, deadline - time.monotonic()))
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                src = pending.pop(future)
+                try:
+                    future.result()
+                except BrokenProcessPool:
+                    # 进程池被回收（其他任务超时）或工作进程崩溃，重新提交一次
+                    if src in retried:
+                        errors[src] = f"{label}失败: 工作进程异常退出"
+                    else:
+                        retried.add(src)
+                        pending[
+                            self.process_pool.submit(render, src, targets[src][1])
+                        ] = src
+                except Exception as e:
+                    errors[src] = f"{label}失败: {e}"
+
+        for src, (dst, tmp) in targets.items():
+            if src not in errors and os.path.exists(tmp):
+                os.replace(tmp, dst)
+            elif os.path.exists(tmp):
+                os.remove(tmp)
+            elif src not in errors:
+                errors[src] = f"{label}失败: 未生成输出文件"
+        return errors
+
+    def _run_libreoffice(
+        self, items: List[Tuple[str, str]], options: ConversionOptions
+    ) -> Dict[str, str]:
+        """按输出目录分组调用 LibreOffice，返回 {输入路径: 错误信息}"""
+        from app.core.office_pool import convert_many_to_pdf, convert_to_pdf
+
+        groups: Dict[str, List[Tuple[str, str]]] = {}
+        for src, dst in items:
+            groups.setdefault(os.path.dirname(dst), []).append((src, dst))
+
+        errors = {}
+        for output_dir, group in groups.items():
+            if self._cancelled(options):
+                errors.update((src, "任务已取消") for src, _ in group)
+                continue
+            try:
+                if len(group) == 1:
+                    code, error = convert_to_pdf(
+                        group[0][0], output_dir, options.task_id, options.timeout
+                    )
+                    oks = [code == 0]
+                    if code != 0:
+                        errors[group[0][0]] = error or f"LibreOffice 退出码 {code}"
+                else:
+                    oks = convert_many_to_pdf(
+                        [src for src, _ in group],
+                        output_dir,
+                        options.task_id,
+                        options.timeout,
+                    )
+            except Exception as e:
+                errors.update((src, f"LibreOffice 调用失败: {e}") for src, _ in group)
+                continue
+            for (src, dst), ok in zip(group, oks):
+                # LibreOffice 总是以输入文件名命名输出，必要时改为调用方指定的名称
+                produced = os.path.join(output_dir, f"{Path(src).stem}.pdf")
+                if ok and produced != dst and os.path.exists(produced):
+                    shutil.move(produced, dst)
+                elif not ok:
+                    errors.setdefault(src, "LibreOffice 未生成输出文件")
+        return errors
+
+    def convert_batch_sync(
+        self, items: List[Tuple[str, str]], options: ConversionOptions
+    ) -> List[ConversionResult]:
+        """
+        转换一组文档（同步），返回与输入一一对应的结果。
+        :param items: [(输入路径, 输出 PDF 路径)]，同一输出目录的 Word 文档合并为一次 LibreOffice 调用
+        """
+        from app.core.docx_renderer import render_docx_file
+        from app.core.markdown_renderer import render_markdown_file
+
+        started = time.perf_counter()
+        by_engine: Dict[str, List[Tuple[str, str]]] = {}
+        engines: Dict[str, str] = {}
+        errors: Dict[str, str] = {}
+        for src, dst in items:
+            engine = self.select_engine(src)
+            if engine is None:
+                errors[src] = f"不支持的文件类型: {Path(src).suffix}"
+            else:
+                engines[src] = engine
+                by_engine.setdefault(engine, []).append((src, dst))
+        selected = dict(engines)
+
+        if ENGINE_MARKDOWN in by_engine and not self._cancelled(options):
+            errors.update(
+                self._render_in_pool(
+                    render_markdown_file,
+                    by_engine[ENGINE_MARKDOWN],
+                    options,
+                    "Markdown 渲染",
+                )
+            )
+        if ENGINE_DOCX in by_engine and not self._cancelled(options):
+            failed = self._render_in_pool(
+                render_docx_file, by_engine[ENGINE_DOCX], options, "快速排版"
+            )
+            for src, dst in by_engine[ENGINE_DOCX]:
+                if src in failed:
+                    print(
+                        f"[Convert] {os.path.basename(src)} {failed[src]}，改用 LibreOffice"
+                    )
+                    engines[src] = ENGINE_LIBREOFFICE
+                    by_engine.setdefault(ENGINE_LIBREOFFICE, []).append((src, dst))
+        if ENGINE_LIBREOFFICE in by_engine:
+            errors.update(self._run_libreoffice(by_engine[ENGINE_LIBREOFFICE], options))
+
+        results = []
+        for src, dst in items:
+            if self._cancelled(options):
+                results.append(ConversionResult(False, error="任务已取消"))
+            elif src in errors:
+                metrics.conversion_seconds.observe(
+                    time.perf_counter() - started,
+                    engine=engines.get(src, "unknown"),
+                    status="failed",
+                )
+                results.append(ConversionResult(False, error=errors[src]))
+            else:
+                results.append(
+                    self._finish(
+                        src, dst, options, started, engines[src], selected[src]
+                    )
+                )
+        return results
+
+    def convert_sync(
+        self, input_path: str, output_path: str, options: ConversionOptions
+    ) -> ConversionResult:
+        return self.convert_batch_sync([(input_path, output_path)], options)[0]
+
+    async def convert(
+        self,
+        input_path: str,
+        output_path: str,
+        options: Optional[ConversionOptions] = None,
+    ) -> ConversionResult:
+        """异步转换单个文档，不阻塞事件循环"""
+        return await asyncio.get_running_loop().run_in_executor(
+            None,
+            self.convert_sync,
+            input_path,
+            output_path,
+            options or ConversionOptions(),
+        )
+
+    async def convert_batch(
+        self,
+        items: List[Tuple[str, str]],
+        options: Optional[ConversionOptions] = None,
+    ) -> List[ConversionResult]:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.convert_batch_sync, items, options or ConversionOptions()
+        )
+
+
+global_conversion_engine = ConversionEngine(
+    global_conversion_cache, global_process_pool
+)
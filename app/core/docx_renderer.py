@@ -0,0 +1,502 @@
+import re
+import zipfile
+from typing import IO, Dict, List, Optional, Tuple, Union
+from xml.etree import ElementTree as ET
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MATH = "{http://schemas.openxmlformats.org/officeDocument/2006/math}"
+MC = "{http://schemas.openxmlformats.org/markup-compatibility/2006}"
+
+# document.xml 超过该大小的文档直接交给 LibreOffice
+MAX_DOCUMENT_XML_BYTES = 4 * 1024 * 1024
+
+# 出现即需要 LibreOffice 排版的元素
+COMPLEX_ELEMENTS = {
+    f"{W}drawing": "图片或图形",
+    f"{W}pict": "图片或图形",
+    f"{W}object": "嵌入对象",
+    f"{MC}AlternateContent": "图片或图形",
+    f"{W}txbxContent": "文本框",
+    f"{W}fldSimple": "域代码",
+    f"{W}fldChar": "域代码",
+    f"{W}instrText": "域代码",
+    f"{W}ins": "修订记录",
+    f"{W}del": "修订记录",
+    f"{W}moveFrom": "修订记录",
+    f"{W}moveTo": "修订记录",
+    f"{W}footnoteReference": "脚注",
+    f"{W}endnoteReference": "尾注",
+    f"{W}altChunk": "嵌入内容",
+    f"{W}sdt": "内容控件或目录",
+    f"{W}sym": "符号字体",
+    f"{W}ruby": "拼音指南",
+    f"{W}gridSpan": "合并单元格",
+    f"{W}vMerge": "合并单元格",
+    f"{W}hMerge": "合并单元格",
+    f"{W}textDirection": "竖排文字",
+    f"{W}bidi": "从右到左文字",
+    f"{W}rtl": "从右到左文字",
+    f"{W}headerReference": "页眉页脚",
+    f"{W}footerReference": "页眉页脚",
+    f"{MATH}oMath": "公式",
+    f"{MATH}oMathPara": "公式",
+}
+
+NUMBER_FORMATS = {
+    "bullet",
+    "decimal",
+    "lowerLetter",
+    "upperLetter",
+    "lowerRoman",
+    "upperRoman",
+}
+
+HEADING_SCALE = {0: 2.0, 1: 1.6, 2: 1.4, 3: 1.2, 4: 1.1, 5: 1.0, 6: 1.0}
+ALIGNMENTS = {
+    "left": 0,
+    "start": 0,
+    "center": 1,
+    "right": 2,
+    "end": 2,
+    "both": 4,
+    "distribute": 4,
+}
+
+# 未声明时的页面设置（A4，上下 2.54cm、左右 3.17cm）与正文字号
+DEFAULT_PAGE = (595.3, 841.9)
+DEFAULT_MARGINS = (72.0, 90.0, 72.0, 90.0)
+DEFAULT_FONT_SIZE = 10.5
+
+Source = Union[str, IO[bytes]]
+
+
+def _attr(el: Optional[ET.Element], name: str) -> Optional[str]:
+    return None if el is None else el.get(f"{W}{name}")
+
+
+def _twips(value: Optional[str], default: float = 0.0) -> float:
+    """Word 的长度单位为 1/20 磅"""
+    try:
+        return int(value) / 20.0
+    except (TypeError, ValueError):
+        return default
+
+
+def _on(el: Optional[ET.Element]) -> Optional[bool]:
+    """开关型属性（<w:b/>、<w:b w:val="0"/>），未设置时返回 None"""
+    if el is None:
+        return None
+    return _attr(el, "val") not in ("0", "false", "off")
+
+
+def _read_xml(z: zipfile.ZipFile, name: str) -> Optional[ET.Element]:
+    try:
+        return ET.fromstring(z.read(name))
+    except KeyError:
+        return None
+
+
+class _Numbering:
+    """numbering.xml：numId -> 各级编号格式，渲染时维护各级计数"""
+
+    def __init__(self, root: Optional[ET.Element]):
+        self.levels: Dict[str, Dict[int, Tuple[str, str, float, float]]] = {}
+        self.counters: Dict[str, List[int]] = {}
+        if root is None:
+            return
+        abstract = {}
+        for a in root.findall(f"{W}abstractNum"):
+            levels = {}
+            for lvl in a.findall(f"{W}lvl"):
+                ind = lvl.find(f"{W}pPr/{W}ind")
+                levels[int(_attr(lvl, "ilvl") or 0)] = (
+                    _attr(lvl.find(f"{W}numFmt"), "val") or "decimal",
+                    _attr(lvl.find(f"{W}lvlText"), "val") or "",
+                    _twips(_attr(ind, "left") or _attr(ind, "start")),
+                    _twips(_attr(ind, "hanging")),
+                )
+            abstract[_attr(a, "abstractNumId")] = levels
+        for num in root.findall(f"{W}num"):
+            ref = _attr(num.find(f"{W}abstractNumId"), "val")
+            self.levels[_attr(num, "numId")] = abstract.get(ref, {})
+
+    def unsupported(self) -> Optional[str]:
+        for levels in self.levels.values():
+            for fmt, *_ in levels.values():
+                if fmt not in NUMBER_FORMATS and fmt != "none":
+                    return f"编号格式 {fmt}"
+        return None
+
+    @staticmethod
+    def _format(fmt: str, n: int) -> str:
+        if fmt in ("lowerLetter", "upperLetter"):
+            s = ""
+            while n > 0:
+                n, r = divmod(n - 1, 26)
+                s = chr(ord("a") + r) + s
+            return s.upper() if fmt == "upperLetter" else s
+        if fmt in ("lowerRoman", "upperRoman"):
+            s = ""
+            for value, sym in (
+                (1000, "m"),
+                (900, "cm"),
+                (500, "d"),
+                (400, "cd"),
+                (100, "c"),
+                (90, "xc"),
+                (50, "l"),
+                (40, "xl"),
+                (10, "x"),
+                (9, "ix"),
+                (5, "v"),
+                (4, "iv"),
+                (1, "i"),
+            ):
+                while n >= value:
+                    s += sym
+                    n -= value
+            return s.upper() if fmt == "upperRoman" else s
+        return str(n)
+
+    def next_label(self, num_id: str, ilvl: int) -> Tuple[str, float, float]:
+        """返回 (编号文本, 左缩进, 悬挂缩进)，并推进计数"""
+        levels = self.levels.get(num_id)
+        if not levels or ilvl not in levels:
+            return "", 0.0, 0.0
+        counters = self.counters.setdefault(num_id, [0] * 9)
+        counters[ilvl] += 1
+        for deeper in range(ilvl + 1, 9):
+            counters[deeper] = 0
+        fmt, text, left, hanging = levels[ilvl]
+        if fmt == "bullet":
+            return "•", left, hanging
+        if fmt == "none":
+            return "", left, hanging
+
+        def level_number(m: re.Match) -> str:
+            level = int(m.group(1)) - 1
+            level_fmt = levels.get(level, ("decimal",))[0]
+            return self._format(level_fmt, max(1, counters[level]))
+
+        return re.sub(r"%(\d)", level_number, text), left, hanging
+
+
+def analyze_docx(source: Source) -> Optional[str]:
+    """
+    快速检查文档是否只包含纯 Python 渲染器支持的内容（段落、标题、列表、简单表格）。
+    返回需要 LibreOffice 的原因；返回 None 表示可以走快速路径。
+    """
+    try:
+        with zipfile.ZipFile(source) as z:
+            info = z.getinfo("word/document.xml")
+            if info.file_size > MAX_DOCUMENT_XML_BYTES:
+                return "文档过大"
+            root = ET.fromstring(z.read(info))
+            numbering = _Numbering(_read_xml(z, "word/numbering.xml"))
+    except (KeyError, zipfile.BadZipFile, ET.ParseError, OSError) as e:
+        return f"无法解析: {e}"
+
+    sections = 0
+    for el in root.iter():
+        reason = COMPLEX_ELEMENTS.get(el.tag)
+        if reason and el.tag in (f"{W}bidi", f"{W}rtl") and not _on(el):
+            reason = None
+        if reason:
+            return reason
+        if el.tag == f"{W}sectPr":
+            sections += 1
+        elif el.tag == f"{W}cols" and int(_attr(el, "num") or 1) > 1:
+            return "多栏排版"
+        elif el.tag == f"{W}tc" and el.find(f".//{W}tbl") is not None:
+            return "嵌套表格"
+    if sections > 1:
+        return "多个分节"
+    return numbering.unsupported()
+
+
+class _DocxRenderer:
+    def __init__(self, z: zipfile.ZipFile):
+        from app.core.pdf_fonts import cjk_font
+
+        self.font = cjk_font()
+        self.document = ET.fromstring(z.read("word/document.xml"))
+        self.numbering = _Numbering(_read_xml(z, "word/numbering.xml"))
+        self.styles: Dict[str, ET.Element] = {}
+        self.default_style: Optional[str] = None
+        self.base_size = DEFAULT_FONT_SIZE
+        self.base_after = 0.0
+        self.base_line = 1.0
+        styles = _read_xml(z, "word/styles.xml")
+        if styles is not None:
+            self._load_styles(styles)
+        # 相同排版参数的段落共用一个 ParagraphStyle
+        self._para_styles: Dict[tuple, object] = {}
+
+    def _load_styles(self, root: ET.Element):
+        defaults = root.find(f"{W}docDefaults")
+        if defaults is not None:
+            sz = _attr(defaults.find(f"{W}rPrDefault/{W}rPr/{W}sz"), "val")
+            if sz:
+                self.base_size = int(sz) / 2.0
+            spacing = defaults.find(f"{W}pPrDefault/{W}pPr/{W}spacing")
+            self.base_after = _twips(_attr(spacing, "after"))
+            line = _attr(spacing, "line")
+            if line and _attr(spacing, "lineRule") in (None, "auto"):
+                self.base_line = int(line) / 240.0
+        for style in root.findall(f"{W}style"):
+            style_id = _attr(style, "styleId")
+            self.styles[style_id] = style
+            if _attr(style, "type") == "paragraph" and _attr(style, "default") in (
+                "1",
+                "true",
+            ):
+                self.default_style = style_id
+
+    def _chain(self, style_id: Optional[str]) -> List[ET.Element]:
+        """样式及其 basedOn 祖先，由近及远"""
+        chain = []
+        while style_id and style_id in self.styles and len(chain) < 10:
+            style = self.styles[style_id]
+            chain.append(style)
+            style_id = _attr(style.find(f"{W}basedOn"), "val")
+        return chain
+
+    def _heading_level(self, chain: List[ET.Element]) -> Optional[int]:
+        for style in chain:
+            name = (_attr(style.find(f"{W}name"), "val") or "").lower()
+            if name == "title":
+                return 0
+            m = re.fullmatch(r"heading (\d)", name)
+            if m:
+                return int(m.group(1))
+            level = _attr(style.find(f"{W}pPr/{W}outlineLvl"), "val")
+            if level is not None and int(level) < 9:
+                return int(level) + 1
+        return None
+
+    @staticmethod
+    def _first(elements: List[Optional[ET.Element]], path: str) -> Optional[ET.Element]:
+        for el in elements:
+            if el is not None:
+                found = el.find(path)
+                if found is not None:
+                    return found
+        return None
+
+    def _run_props(self, rpr_sources: List[Optional[ET.Element]]) -> dict:
+        """按优先级从高到低合并运行属性"""
+        props = {}
+        for key in ("b", "i", "strike", "u"):
+            el = self._first(rpr_sources, f"{W}{key}")
+            if key == "u":
+                props[key] = el is not None and _attr(el, "val") != "none"
+            else:
+                props[key] = bool(_on(el))
+        sz = _attr(self._first(rpr_sources, f"{W}sz"), "val")
+        props["size"] = int(sz) / 2.0 if sz else None
+        color = _attr(self._first(rpr_sources, f"{W}color"), "val")
+        props["color"] = (
+            color if color and re.fullmatch(r"[0-9A-Fa-f]{6}", color) else None
+        )
+        props["hidden"] = bool(_on(self._first(rpr_sources, f"{W}vanish")))
+        return props
+
+    def _run_markup(
+        self, run: ET.Element, para_rprs: List[Optional[ET.Element]]
+    ) -> str:
+        from xml.sax.saxutils import escape
+
+        rpr = run.find(f"{W}rPr")
+        char_style = _attr(None if rpr is None else rpr.find(f"{W}rStyle"), "val")
+        sources = [rpr, *[s.find(f"{W}rPr") for s in self._chain(char_style)]]
+        props = self._run_props(sources + para_rprs)
+        if props["hidden"]:
+            return ""
+        parts = []
+        for child in run:
+            if child.tag == f"{W}t":
+                parts.append(escape(child.text or ""))
+            elif child.tag == f"{W}tab":
+                parts.append(" " * 4)
+            elif child.tag in (f"{W}br", f"{W}cr") and _attr(child, "type") != "page":
+                parts.append("<br/>")
+            elif child.tag == f"{W}noBreakHyphen":
+                parts.append("-")
+        text = "".join(parts)
+        if not text:
+            return ""
+        for key, tag in (("b", "b"), ("i", "i"), ("u", "u"), ("strike", "strike")):
+            if props[key]:
+                text = f"<{tag}>{text}</{tag}>"
+        attrs = []
+        if props["size"]:
+            attrs.append(f'size="{props["size"]}"')
+        if props["color"]:
+            attrs.append(f'color="#{props["color"]}"')
+        if attrs:
+            text = f"<font {' '.join(attrs)}>{text}</font>"
+        return text
+
+    def _paragraph_style(self, key: tuple):
+        from reportlab.lib.styles import ParagraphStyle
+
+        style = self._para_styles.get(key)
+        if style is None:
+            size, align, left, first, before, after, line = key
+            style = ParagraphStyle(
+                f"p{len(self._para_styles)}",
+                fontName=self.font,
+                fontSize=size,
+                leading=size * 1.3 * line,
+                alignment=align,
+                leftIndent=left,
+                firstLineIndent=first,
+                spaceBefore=before,
+                spaceAfter=after,
+                wordWrap="CJK",
+            )
+            self._para_styles[key] = style
+        return style
+
+    def _paragraph(self, p: ET.Element) -> list:
+        from reportlab.platypus import PageBreak, Paragraph
+
+        ppr = p.find(f"{W}pPr")
+        style_id = _attr(None if ppr is None else ppr.find(f"{W}pStyle"), "val")
+        chain = self._chain(style_id or self.default_style)
+        pprs = [ppr, *[s.find(f"{W}pPr") for s in chain]]
+        para_rprs = [s.find(f"{W}rPr") for s in chain]
+
+        heading = self._heading_level(chain)
+        props = self._run_props(para_rprs)
+        size = props["size"] or self.base_size
+        if heading is not None and props["size"] is None:
+            size = self.base_size * HEADING_SCALE.get(heading, 1.0)
+        markup = "".join(self._run_markup(r, para_rprs) for r in p.iter(f"{W}r"))
+        if heading is not None and not props["b"] and markup:
+            markup = f"<b>{markup}</b>"
+
+        jc = _attr(self._first(pprs, f"{W}jc"), "val")
+        ind = self._first(pprs, f"{W}ind")
+        left = _twips(_attr(ind, "left") or _attr(ind, "start"))
+        first = _twips(_attr(ind, "firstLine")) - _twips(_attr(ind, "hanging"))
+        first_chars = _attr(ind, "firstLineChars")
+        if first_chars:
+            first = int(first_chars) / 100.0 * size
+        spacing = self._first(pprs, f"{W}spacing")
+        before = _twips(_attr(spacing, "before"))
+        after = _twips(_attr(spacing, "after"), self.base_after)
+        line = self.base_line
+        if (
+            spacing is not None
+            and _attr(spacing, "line")
+            and (_attr(spacing, "lineRule") in (None, "auto"))
+        ):
+            line = int(_attr(spacing, "line")) / 240.0
+
+        num_pr = self._first(pprs, f"{W}numPr")
+        if num_pr is not None:
+            num_id = _attr(num_pr.find(f"{W}numId"), "val")
+            ilvl = int(_attr(num_pr.find(f"{W}ilvl"), "val") or 0)
+            label, num_left, hanging = self.numbering.next_label(num_id, ilvl)
+            if label:
+                markup = f"{label} {markup}"
+                if ind is None:
+                    left, first = num_left, -hanging
+
+        style = self._paragraph_style(
+            (size, ALIGNMENTS.get(jc, 0), left, first, before, after, line)
+        )
+        flowables = []
+        breaks = [br for br in p.iter(f"{W}br") if _attr(br, "type") == "page"]
+        if _on(self._first(pprs, f"{W}pageBreakBefore")) or (breaks and not markup):
+            flowables.append(PageBreak())
+        # 空段落同样占一行高度
+        flowables.append(Paragraph(markup or " ", style))
+        if breaks and markup:
+            flowables.append(PageBreak())
+        return flowables
+
+    def _table(self, tbl: ET.Element, frame_width: float) -> list:
+        from reportlab.platypus import Table, TableStyle
+
+        widths = [_twips(_attr(c, "w")) for c in tbl.findall(f"{W}tblGrid/{W}gridCol")]
+        rows = []
+        header_rows = 0
+        for tr in tbl.findall(f"{W}tr"):
+            if _on(tr.find(f"{W}trPr/{W}tblHeader")) and header_rows == len(rows):
+                header_rows += 1
+            row = []
+            for tc in tr.findall(f"{W}tc"):
+                cell = []
+                for p in tc.findall(f"{W}p"):
+                    cell.extend(self._paragraph(p))
+                row.append(cell)
+            rows.append(row)
+        if not rows:
+            return []
+        columns = max(len(widths), *(len(r) for r in rows))
+        for row in rows:
+            row.extend([""] * (columns - len(row)))
+        if len(widths) != columns or not all(widths):
+            widths = [frame_width / columns] * columns
+        total = sum(widths)
+        if total > frame_width:
+            widths = [w * frame_width / total for w in widths]
+        table = Table(rows, colWidths=widths, repeatRows=header_rows)
+        table.setStyle(
+            TableStyle(
+                [
+                    ("GRID", (0, 0), (-1, -1), 0.5, "black"),
+                    ("VALIGN", (0, 0), (-1, -1), "TOP"),
+                ]
+            )
+        )
+        return [table]
+
+    def render(self, output_path: str):
+        from reportlab.platypus import SimpleDocTemplate
+
+        body = self.document.find(f"{W}body")
+        sect = body.find(f"{W}sectPr")
+        size = sect.find(f"{W}pgSz") if sect is not None else None
+        margins = sect.find(f"{W}pgMar") if sect is not None else None
+        page = (
+            _twips(_attr(size, "w"), DEFAULT_PAGE[0]),
+            _twips(_attr(size, "h"), DEFAULT_PAGE[1]),
+        )
+        top, right, bottom, left = (
+            _twips(_attr(margins, side), default)
+            for side, default in zip(
+                ("top", "right", "bottom", "left"), DEFAULT_MARGINS
+            )
+        )
+        doc = SimpleDocTemplate(
+            output_path,
+            pagesize=page,
+            topMargin=abs(top),
+            rightMargin=right,
+            bottomMargin=abs(bottom),
+            leftMargin=left,
+        )
+        story = []
+        for el in body:
+            if el.tag == f"{W}p":
+                story.extend(self._paragraph(el))
+            elif el.tag == f"{W}tbl":
+                story.extend(self._table(el, doc.width))
+        doc.build(story)
+
+
+def render_docx(source: Source, output_path: str):
+    """以 reportlab 直接排版 docx 中的段落、标题、列表与简单表格（调用前应先通过 analyze_docx 检查）"""
+    with zipfile.ZipFile(source) as z:
+        _DocxRenderer(z).render(output_path)
+
+
+def render_docx_file(docx_path: str, output_path: str):
+    """在转换进程池中执行：渲染前再次检查，遇到不支持的内容抛出异常，由调用方退回 LibreOffice"""
+    reason = analyze_docx(docx_path)
+    if reason:
+        raise ValueError(f"文档包含{reason}")
+    render_docx(docx_path, output_path)
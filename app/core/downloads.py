@@ -0,0 +1,48 @@
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+from app.core.pdf_tools import load_pdf_info
+
+# 下载链接带有用户的 token，只允许浏览器缓存；每次使用前以 ETag 向服务端确认
+CACHE_CONTROL = "private, no-cache"
+
+
+def file_response(
+    request: Request,
+    file_path: str,
+    filename: str,
+    media_type: str,
+    inline: bool = False,
+) -> Response:
+    """
+    各模块下载接口共用的文件响应。
+    PDF 旁有转换时生成的元数据记录时，直接用其中的 SHA-256 作为强 ETag，
+    浏览器重复请求（预览后再下载）时返回 304，不必重新读取或哈希文件；
+    响应自带 Cache-Control，全局的禁止缓存中间件不会覆盖，浏览器才会保存文件并发出条件请求。
+    响应支持 Range 请求（单段与多段，If-Range 以该 ETag 校验）；inline 为 True 时
+    以内联方式返回供页面内预览，浏览器的 PDF 查看器可按需分段读取，
+    配合线性化输出先显示第一页。
+    """
+    disposition = "inline" if inline else "attachment"
+    info = load_pdf_info(file_path) if media_type == "application/pdf" else None
+    if info is None or not info.sha256:
+        return FileResponse(
+            file_path,
+            media_type=media_type,
+            filename=filename,
+            headers={"Cache-Control": CACHE_CONTROL},
+            content_disposition_type=disposition,
+        )
+
+    etag = f'"{info.sha256}"'
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(
+        file_path,
+        media_type=media_type,
+        filename=filename,
+        headers=headers,
+        content_disposition_type=disposition,
+    )
@@ -0,0 +1,128 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Optional
+
+from sqlalchemy import insert
+
+from app.core import database
+from app.models.models import TaskHistory
+
+
+class HistoryWriter:
+    """
+    TaskHistory 的后写缓冲。
+    完成的任务记录先进入有界内存缓冲，由后台协程每 batch_size 条或每 flush_interval_ms
+    毫秒合并为一条多行 INSERT 写入，数据库抖动不会阻塞任务队列。
+    """
+
+    def __init__(
+        self,
+        max_buffer: int = 5000,
+        batch_size: int = 50,
+        flush_interval_ms: int = 1000,
+        max_attempts: int = 5,
+    ):
+        self.max_buffer = max_buffer
+        self.batch_size = batch_size
+        self.flush_interval_ms = flush_interval_ms
+        self.max_attempts = max_attempts
+        self._buffer: Deque[dict] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._attempts = 0
+        self.stats = {
+            "flushed": 0,
+            "dropped": 0,
+            "failed_flushes": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "last_error": None,
+        }
+
+    @property
+    def backlog(self) -> int:
+        return len(self._buffer)
+
+    def submit(self, record: dict):
+        """加入一条待写入记录，缓冲已满时丢弃最旧的记录"""
+        if len(self._buffer) >= self.max_buffer:
+            self._buffer.popleft()
+            self.stats["dropped"] += 1
+        self._buffer.append(record)
+        self._ensure_started()
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def _ensure_started(self):
+        if self._flusher is not None and not self._flusher.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._flusher = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=self.flush_interval_ms / 1000
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not await self.flush():
+                # 写入失败时指数退避，记录保留在缓冲中等待下次重试
+                await asyncio.sleep(min(0.2 * 2**self._attempts, 30))
+
+    async def flush(self) -> bool:
+        """写出缓冲中的全部记录，遇到失败时返回 False"""
+        while self._buffer:
+            if database.AsyncSessionLocal is None:
+                return True
+
+            batch = [
+                self._buffer.popleft()
+                for _ in range(min(self.batch_size, self.backlog))
+            ]
+            start = time.perf_counter()
+            try:
+                async with database.AsyncSessionLocal() as session:
+                    await session.execute(insert(TaskHistory).values(batch))
+                    await session.commit()
+            except asyncio.CancelledError:
+                self._buffer.extendleft(reversed(batch))
+                raise
+            except Exception as e:
+                self._attempts += 1
+                self.stats["failed_flushes"] += 1
+                self.stats["last_error"] = str(e)[:200]
+                print(f"[History] 批量写入失败 (第 {self._attempts} 次): {e}")
+                if self._attempts >= self.max_attempts:
+                    # 持续失败的批次（如唯一键冲突）放弃写入，避免阻塞后续记录
+                    self.stats["dropped"] += len(batch)
+                    self._attempts = 0
+                else:
+                    self._buffer.extendleft(reversed(batch))
+                return False
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._attempts = 0
+            self.stats["flushed"] += len(batch)
+            self.stats["last_flush_ms"] = round(elapsed_ms, 1)
+            self.stats["max_flush_ms"] = round(
+                max(self.stats["max_flush_ms"], elapsed_ms), 1
+            )
+        return True
+
+    def get_stats(self) -> dict:
+        return {"backlog": self.backlog, **self.stats}
+
+    async def close(self):
+        """停止后台协程并尽力写出剩余记录"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.flush()
+
+
+global_history_writer = HistoryWriter()
@@ -0,0 +1,409 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+from sqlalchemy import func, select, update
+
+from app.core import database
+from app.core.config import settings
+from app.models.models import Job
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+TERMINAL_STATUSES = (JOB_COMPLETED, JOB_FAILED)
+
+# 等待方在任务执行时限之外额外允许的排队时间（秒），超过后取消任务
+QUEUE_GRACE_SECONDS = 600
+
+
+def _snapshot(job: Job) -> dict:
+    return {
+        "job_id": job.job_id,
+        "kind": job.kind,
+        "status": job.status,
+        "priority": job.priority,
+        "payload": job.payload or {},
+        "result": job.result,
+        "error_message": job.error_message,
+        "worker": job.worker,
+        "attempts": job.attempts,
+        "created_at": job.created_at,
+        "claimed_at": job.claimed_at,
+        "completed_at": job.completed_at,
+    }
+
+
+class JobQueue:
+    """
+    基于 jobs 表的持久化任务队列。
+    领取时使用 SELECT ... FOR UPDATE SKIP LOCKED，多个节点并发领取互不阻塞；
+    随后的条件 UPDATE 保证同一任务只会被一个节点领取（SQLite 等不支持行锁的库也适用）。
+    """
+
+    def __init__(
+        self,
+        session_factory=None,
+        node_id: Optional[str] = None,
+        lease_seconds: int = 120,
+        max_attempts: int = 3,
+    ):
+        self._session_factory = session_factory
+        self.node_id = node_id or settings.NODE_ID
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # 本进程内完成的任务直接唤醒等待方，跨节点完成的任务靠轮询发现
+        self._local_events: Dict[str, asyncio.Event] = {}
+
+    def _sessions(self):
+        factory = self._session_factory or database.AsyncSessionLocal
+        if factory is None:
+            raise RuntimeError("Database engine not initialized.")
+        return factory()
+
+    async def enqueue(self, kind: str, payload: dict, priority: int = 1) -> str:
+        job_id = str(uuid.uuid4())
+        async with self._sessions() as session:
+            session.add(
+                Job(
+                    job_id=job_id,
+                    kind=kind,
+                    status=JOB_QUEUED,
+                    priority=priority,
+                    payload=payload,
+                    created_at=datetime.utcnow(),
+                )
+            )
+            await session.commit()
+        print(f"[Jobs] 任务已入队: {job_id} ({kind})")
+        return job_id
+
+    async def claim(self, kinds: Optional[Iterable[str]] = None) -> Optional[dict]:
+        """领取一个排队中的任务，没有可领取的任务时返回 None"""
+        now = datetime.utcnow()
+        async with self._sessions() as session:
+            async with session.begin():
+                stmt = select(Job).where(Job.status == JOB_QUEUED)
+                if kinds is not None:
+                    stmt = stmt.where(Job.kind.in_(list(kinds)))
+                stmt = (
+                    stmt.order_by(Job.priority, Job.id)
+                    .limit(1)
+                    .with_for_update(skip_locked=True)
+                )
+                job = (await session.execute(stmt)).scalars().first()
+                if job is None:
+                    return None
+
+                res = await session.execute(
+                    update(Job)
+                    .where(Job.id == job.id, Job.status == JOB_QUEUED)
+                    .values(
+                        status=JOB_RUNNING,
+                        worker=self.node_id,
+                        claimed_at=now,
+                        heartbeat_at=now,
+                        attempts=Job.attempts + 1,
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                if res.rowcount != 1:
+                    return None
+                await session.refresh(job)
+                return _snapshot(job)
+
+    async def heartbeat(self, job_id: str) -> bool:
+        """续约执行中的任务，任务已被取消或回收（不再由本节点执行）时返回 False"""
+        async with self._sessions() as session:
+            res = await session.execute(
+                update(Job)
+                .where(
+                    Job.job_id == job_id,
+                    Job.worker == self.node_id,
+                    Job.status == JOB_RUNNING,
+                )
+                .values(heartbeat_at=datetime.utcnow())
+            )
+            await session.commit()
+        return res.rowcount == 1
+
+    async def complete(
+        self,
+        job_id: str,
+        status: str = JOB_COMPLETED,
+        result: Optional[dict] = None,
+        error_message: Optional[str] = None,
+        attempt: Optional[int] = None,
+    ) -> bool:
+        """
+        记录任务结果，仅当任务仍由本节点执行中时生效。
+        心跳超时的任务可能已被回收并由其他节点重新领取，此时迟到的结果不写入，返回 False。
+        :param attempt: 领取时的尝试次数，用于区分本节点对同一任务的先后两次领取
+        """
+        stmt = update(Job).where(
+            Job.job_id == job_id,
+            Job.worker == self.node_id,
+            Job.status == JOB_RUNNING,
+        )
+        if attempt is not None:
+            stmt = stmt.where(Job.attempts == attempt)
+        async with self._sessions() as session:
+            res = await session.execute(
+                stmt.values(
+                    status=status,
+                    result=result,
+                    error_message=error_message,
+                    completed_at=datetime.utcnow(),
+                ).execution_options(synchronize_session=False)
+            )
+            await session.commit()
+        if res.rowcount != 1:
+            print(
+                f"[Jobs] 任务 {job_id} 已不属于本节点（已取消或租约过期后被回收），丢弃结果"
+            )
+            return False
+        event = self._local_events.get(job_id)
+        if event is not None:
+            event.set()
+        return True
+
+    async def cancel(self, job_id: str, reason: str = "任务已取消") -> bool:
+        """
+        把未结束的任务标记为失败。排队中的任务不会再被领取；
+        执行中的任务由执行节点在下次心跳时发现并终止，其迟到的结果不再写入。
+        """
+        async with self._sessions() as session:
+            res = await session.execute(
+                update(Job)
+                .where(Job.job_id == job_id, Job.status.in_([JOB_QUEUED, JOB_RUNNING]))
+                .values(
+                    status=JOB_FAILED,
+                    error_message=reason,
+                    completed_at=datetime.utcnow(),
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+        if res.rowcount != 1:
+            return False
+        print(f"[Jobs] 任务已取消: {job_id} ({reason})")
+        event = self._local_events.get(job_id)
+        if event is not None:
+            event.set()
+        return True
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        async with self._sessions() as session:
+            res = await session.execute(select(Job).where(Job.job_id == job_id))
+            job = res.scalars().first()
+            return _snapshot(job) if job else None
+
+    async def position(self, job_id: str) -> Optional[int]:
+        """返回前方排队的任务数，任务已被领取或不存在时返回 None"""
+        async with self._sessions() as session:
+            res = await session.execute(select(Job).where(Job.job_id == job_id))
+            job = res.scalars().first()
+            if job is None or job.status != JOB_QUEUED:
+                return None
+            ahead = await session.execute(
+                select(func.count(Job.id)).where(
+                    Job.status == JOB_QUEUED,
+                    (Job.priority < job.priority)
+                    | ((Job.priority == job.priority) & (Job.id < job.id)),
+                )
+            )
+            return ahead.scalar() or 0
+
+    async def wait(
+        self,
+        job_id: str,
+        poll_interval: float = 1.0,
+        on_poll: Optional[Callable[[dict], Awaitable[None]]] = None,
+        timeout: Optional[float] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+    ) -> dict:
+        """
+        等待任务进入终态并返回其快照。
+        超过 timeout 秒或 should_stop 返回 True 时取消任务，返回取消后的快照，
+        没有节点处理该类型或等待方已离开时任务不会一直留在队列中。
+        """
+        event = self._local_events.setdefault(job_id, asyncio.Event())
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout is not None else None
+        try:
+            while True:
+                job = await self.get(job_id)
+                if job is None:
+                    raise KeyError(job_id)
+                if job["status"] in TERMINAL_STATUSES:
+                    return job
+                if deadline is not None and loop.time() >= deadline:
+                    await self.cancel(job_id, f"等待超过 {timeout:.0f}s")
+                    continue
+                if should_stop is not None and should_stop():
+                    await self.cancel(job_id)
+                    continue
+                if on_poll is not None:
+                    await on_poll(job)
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._local_events.pop(job_id, None)
+
+    async def requeue_stale(self) -> int:
+        """回收心跳超时的任务（节点崩溃或重启），超过最大尝试次数的标记为失败"""
+        deadline = datetime.utcnow() - timedelta(seconds=self.lease_seconds)
+        async with self._sessions() as session:
+            failed = await session.execute(
+                update(Job)
+                .where(
+                    Job.status == JOB_RUNNING,
+                    Job.heartbeat_at < deadline,
+                    Job.attempts >= self.max_attempts,
+                )
+                .values(
+                    status=JOB_FAILED,
+                    error_message="worker lease expired",
+                    completed_at=datetime.utcnow(),
+                )
+            )
+            requeued = await session.execute(
+                update(Job)
+                .where(Job.status == JOB_RUNNING, Job.heartbeat_at < deadline)
+                .values(status=JOB_QUEUED, worker=None)
+            )
+            await session.commit()
+        if failed.rowcount or requeued.rowcount:
+            print(
+                f"[Jobs] 回收超时任务: 重新排队 {requeued.rowcount} 个, 失败 {failed.rowcount} 个"
+            )
+        return requeued.rowcount
+
+
+JobHandler = Callable[[dict], Awaitable[Optional[dict]]]
+
+
+class JobWorker:
+    """
+    从 jobs 表领取任务并在本节点执行。
+    每个领取到的任务都经过全局 TaskManager 执行，以沿用本地的加权准入与历史记录。
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        concurrency: int = 1,
+        idle_interval: float = 1.0,
+    ):
+        self.queue = queue
+        self.concurrency = concurrency
+        self.idle_interval = idle_interval
+        self.handlers: Dict[str, JobHandler] = {}
+        self._loops = []
+
+    def register_handler(self, kind: str, handler: JobHandler):
+        self.handlers[kind] = handler
+
+    async def _heartbeat(self, job_id: str, task_id: str):
+        from app.core.task_manager import global_task_manager
+
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            try:
+                owned = await self.queue.heartbeat(job_id)
+            except Exception as e:
+                print(f"[Jobs] 心跳失败 {job_id}: {e}")
+                continue
+            if not owned:
+                # 任务已被等待方取消或被回收，结束本地执行并释放名额
+                global_task_manager.cancel_task(
+                    task_id, "cancelled", "任务已在队列中取消"
+                )
+                return
+
+    async def _execute(self, job: dict):
+        from app.core.task_manager import COST_LIGHT, global_task_manager
+
+        payload = job["payload"]
+        task = await global_task_manager.add_task(
+            name=payload.get("task_name", job["kind"]),
+            user_type=payload.get("user_type", "guest"),
+            ip=payload.get("ip", "Unknown"),
+            filename=payload.get("filename"),
+            cost_class=payload.get("cost_class", COST_LIGHT),
+            timeout=payload.get("timeout"),
+            check_backlog=False,
+        )
+        heartbeat = asyncio.create_task(self._heartbeat(job["job_id"], task.id))
+        status, error = "completed", None
+        try:
+            if await global_task_manager.start_task(task.id) is None:
+                raise RuntimeError(task.error_message or task.status)
+            result = await self.handlers[job["kind"]](dict(payload, task_id=task.id))
+            if global_task_manager.is_cancelled(task.id):
+                raise RuntimeError(task.error_message or task.status)
+            await self.queue.complete(
+                job["job_id"], JOB_COMPLETED, result=result, attempt=job["attempts"]
+            )
+        except Exception as e:
+            status, error = "failed", str(e)
+            await self.queue.complete(
+                job["job_id"], JOB_FAILED, error_message=error, attempt=job["attempts"]
+            )
+        finally:
+            heartbeat.cancel()
+            await global_task_manager.complete_task(task.id, status, error)
+
+    async def _loop(self):
+        while True:
+            try:
+                job = await self.queue.claim(self.handlers.keys())
+            except Exception as e:
+                print(f"[Jobs] 领取任务失败: {e}")
+                job = None
+            if job is None:
+                await asyncio.sleep(self.idle_interval)
+                continue
+            try:
+                await self._execute(job)
+            except Exception as e:
+                print(f"[Jobs] 执行任务异常 {job['job_id']}: {e}")
+
+    async def _reaper(self):
+        while True:
+            try:
+                await self.queue.requeue_stale()
+            except Exception as e:
+                print(f"[Jobs] 回收任务失败: {e}")
+            await asyncio.sleep(self.queue.lease_seconds)
+
+    def start(self):
+        if self._loops:
+            return
+        self._loops.append(asyncio.create_task(self._reaper()))
+        for _ in range(self.concurrency):
+            self._loops.append(asyncio.create_task(self._loop()))
+        print(
+            f"[Jobs] 节点 {self.queue.node_id} 已启动 {self.concurrency} 个工作协程, "
+            f"处理类型: {', '.join(self.handlers) or '-'}"
+        )
+
+    async def stop(self):
+        for t in self._loops:
+            t.cancel()
+        await asyncio.gather(*self._loops, return_exceptions=True)
+        self._loops.clear()
+
+
+def is_enabled() -> bool:
+    return settings.TASK_QUEUE_BACKEND.lower() == "sql"
+
+
+global_job_queue = JobQueue()
+global_job_worker = JobWorker(
+    global_job_queue, concurrency=settings.JOB_WORKER_CONCURRENCY
+)
@@ -5,7 +5,10 @@ import asyncio
 from sqlalchemy import select
 from nicegui import app
 
-from app.core import database
+from app.core import database, job_queue
+from app.core.office_pool import global_office_pool
+from app.core.worker_pool import global_process_pool
+from app.core.warmup import global_warmup
 from app.models.models import AdminConfig
 from app.core.database import (
     Base,
@@ -16,6 +19,15 @@ from app.modules.base import BaseModule
 from app.core.settings_manager import get_or_create_secret_key
 
 
+async def shutdown_handler():
+    from app.core.history_writer import global_history_writer
+
+    await job_queue.global_job_worker.stop()
+    await asyncio.get_running_loop().run_in_executor(None, global_office_pool.close)
+    await asyncio.get_running_loop().run_in_executor(None, global_process_pool.shutdown)
+    await global_history_writer.close()
+
+
 def load_modules(modules_list, module_instances_dict):
     modules_list.clear()
     module_instances_dict.clear()
@@ -90,6 +102,20 @@ async def startup_handler(state, modules_list, module_instances_dict):
                 except Exception:
                     pass
 
+            # 补齐 task_history 表的列
+            for col_name, col_def in [
+                ("error_message", "TEXT"),
+                ("cost_class", "VARCHAR(50)"),
+            ]:
+                try:
+                    await conn.execute(
+                        text(
+                            f"ALTER TABLE task_history ADD COLUMN {col_name} {col_def}"
+                        )
+                    )
+                except Exception:
+                    pass
+
         print("数据库核心引擎就绪。")
     except Exception as e:
         import traceback
@@ -125,4 +151,24 @@ async def startup_handler(state, modules_list, module_instances_dict):
         m.setup_api()
         app.include_router(m.router)
 
+    if state.db_connected:
+        from app.core.autotuner import global_autotuner
+        from app.core.task_manager import global_task_manager
+
+        try:
+            await global_autotuner.load_settings()
+        except Exception as e:
+            print(f"并发调节配置加载失败: {e}")
+        try:
+            await global_task_manager.load_settings()
+        except Exception as e:
+            print(f"队列等待估算初始化失败: {e}")
+
+    # 集群模式下启动 jobs 表工作协程（处理函数已在模块初始化时注册）
+    if state.db_connected and job_queue.is_enabled():
+        job_queue.global_job_worker.start()
+
+    # 后台预热转换引擎，/readyz 在预热结束后才返回就绪
+    global_warmup.start()
+
     state.initialized.set()
@@ -0,0 +1,432 @@
+import re
+from functools import lru_cache
+from typing import List, Tuple
+from xml.sax.saxutils import escape
+
+# 块级语法，模块导入时编译一次，所有文档共用
+_FENCE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+_HEADING = re.compile(r"^ {0,3}(#{1,6})(?:[ \t]+(.*?))?(?:[ \t]+#+)?[ \t]*$")
+_SETEXT = re.compile(r"^ {0,3}(=+|-+)[ \t]*$")
+_RULE = re.compile(r"^ {0,3}([-*_])(?:[ \t]*\1){2,}[ \t]*$")
+_QUOTE = re.compile(r"^ {0,3}> ?(.*)$")
+_LIST_ITEM = re.compile(r"^( {0,12})([-*+]|\d{1,9}[.)])(?:[ \t]+(.*))?$")
+_TABLE_RULE = re.compile(r"^ *\|? *:?-+:? *(?:\| *:?-+:? *)*\|? *$")
+_INDENTED = re.compile(r"^(?: {4}|\t)(.*)$")
+
+# 行内语法
+_CODE_SPAN = re.compile(r"(`+)(.+?)\1", re.S)
+_BACKSLASH = re.compile(r"\\([\\`*_{}\[\]()#+\-.!|~<>])")
+_AUTOLINK = re.compile(r"<((?:https?|mailto):[^>\s]+)>")
+_IMAGE = re.compile(r"!\[([^\]]*)\]\([^)]*\)")
+_LINK = re.compile(r"\[([^\]]+)\]\(([^)\s]+)(?:\s+&quot;.*?&quot;)?\)")
+_BOLD = re.compile(r"(\*\*|__)(?=\S)(.+?)(?<=\S)\1", re.S)
+_ITALIC = re.compile(
+    r"(?<![\w*])\*(?=[^\s*])(.+?)(?<=[^\s*])\*(?!\w)"
+    r"|(?<![\w_])_(?=[^\s_])(.+?)(?<=[^\s_])_(?!\w)",
+    re.S,
+)
+_STRIKE = re.compile(r"~~(?=\S)(.+?)(?<=\S)~~", re.S)
+_HARD_BREAK = re.compile(r"(?: {2,}|\\)\n")
+_PLACEHOLDER = re.compile("\x00(\\d+)\x00")
+
+# 各级标题字号（磅）
+HEADING_SIZES = (20, 17, 14.5, 12.5, 11, 10.5)
+BODY_SIZE = 10.5
+CODE_SIZE = 8.5
+
+Block = Tuple
+
+
+@lru_cache(maxsize=None)
+def _styles() -> dict:
+    """段落、代码与表格样式，每个进程只创建一次"""
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER, TA_RIGHT
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.platypus import TableStyle
+
+    from app.core.pdf_fonts import cjk_font, cjk_mono_font
+
+    font = cjk_font()
+    body = ParagraphStyle(
+        "md-body",
+        fontName=font,
+        fontSize=BODY_SIZE,
+        leading=BODY_SIZE * 1.55,
+        spaceAfter=6,
+        wordWrap="CJK",
+    )
+    styles = {"body": body, "mono": cjk_mono_font()}
+    for level, size in enumerate(HEADING_SIZES, 1):
+        styles[f"h{level}"] = ParagraphStyle(
+            f"md-h{level}",
+            parent=body,
+            fontSize=size,
+            leading=size * 1.35,
+            spaceBefore=size * 0.7,
+            spaceAfter=size * 0.4,
+        )
+    styles["quote"] = ParagraphStyle(
+        "md-quote", parent=body, textColor=colors.HexColor("#555555")
+    )
+    styles["code"] = ParagraphStyle(
+        "md-code",
+        fontName=styles["mono"],
+        fontSize=CODE_SIZE,
+        leading=CODE_SIZE * 1.4,
+        backColor=colors.HexColor("#f5f5f5"),
+        borderPadding=4,
+        spaceBefore=4,
+        spaceAfter=10,
+    )
+    styles["cell"] = ParagraphStyle("md-cell", parent=body, spaceAfter=0)
+    styles["cell-center"] = ParagraphStyle(
+        "md-cell-center", parent=styles["cell"], alignment=TA_CENTER
+    )
+    styles["cell-right"] = ParagraphStyle(
+        "md-cell-right", parent=styles["cell"], alignment=TA_RIGHT
+    )
+    styles["table"] = TableStyle(
+        [
+            ("GRID", (0, 0), (-1, -1), 0.5, colors.HexColor("#999999")),
+            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#eeeeee")),
+            ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ]
+    )
+    return styles
+
+
+def inline_markup(text: str) -> str:
+    """把行内 Markdown（代码、强调、删除线、链接、换行）转换为 reportlab Paragraph 标记"""
+    stash: List[str] = []
+
+    def keep(markup: str) -> str:
+        stash.append(markup)
+        return f"\x00{len(stash) - 1}\x00"
+
+    mono = _styles()["mono"]
+    text = _CODE_SPAN.sub(
+        lambda m: keep(f'<font face="{mono}">{escape(m.group(2).strip())}</font>'),
+        text,
+    )
+    text = _BACKSLASH.sub(lambda m: keep(escape(m.group(1))), text)
+    text = _AUTOLINK.sub(
+        lambda m: keep(
+            f'<link href="{escape(m.group(1), {chr(34): "&quot;"})}" color="blue">'
+            f"{escape(m.group(1))}</link>"
+        ),
+        text,
+    )
+    text = escape(text, {'"': "&quot;"})
+    text = _IMAGE.sub(lambda m: m.group(1), text)
+    text = _LINK.sub(r'<link href="\2" color="blue">\1</link>', text)
+    text = _BOLD.sub(r"<b>\2</b>", text)
+    text = _ITALIC.sub(lambda m: f"<i>{m.group(1) or m.group(2)}</i>", text)
+    text = _STRIKE.sub(r"<strike>\1</strike>", text)
+    text = _HARD_BREAK.sub("<br/>", text).replace("\n", " ")
+    # 占位内容本身不含占位符，一次替换即可
+    return _PLACEHOLDER.sub(lambda m: stash[int(m.group(1))], text)
+
+
+def _split_row(line: str) -> List[str]:
+    line = line.strip()
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|") and not line.endswith("\\|"):
+        line = line[:-1]
+    return [cell.strip().replace("\\|", "|") for cell in re.split(r"(?<!\\)\|", line)]
+
+
+def _block_start(line: str) -> bool:
+    """该行是否开始一个新的块（用于结束段落的惰性续行）"""
+    return bool(
+        _FENCE.match(line)
+        or _HEADING.match(line)
+        or _RULE.match(line)
+        or _QUOTE.match(line)
+        or _LIST_ITEM.match(line)
+    )
+
+
+def parse_blocks(lines: List[str]) -> List[Block]:
+    """
+    把 Markdown 行解析为块：
+    ("heading", 级别, 文本) ("paragraph", 文本) ("code", 文本) ("rule",)
+    ("quote", 子块) ("list", 是否有序, 起始序号, [子块列表]) ("table", 对齐, 表头, 行)
+    """
+    blocks: List[Block] = []
+    para: List[str] = []
+    i, n = 0, len(lines)
+
+    def flush():
+        if para:
+            blocks.append(("paragraph", "\n".join(s.strip() for s in para)))
+            para.clear()
+
+    while i < n:
+        line = lines[i]
+        if not line.strip():
+            flush()
+            i += 1
+            continue
+
+        fence = _FENCE.match(line)
+        if fence:
+            flush()
+            marker = fence.group(1)
+            code = []
+            i += 1
+            while i < n and not lines[i].strip().startswith(marker):
+                code.append(lines[i])
+                i += 1
+            blocks.append(("code", "\n".join(code)))
+            i += 1
+            continue
+
+        heading = _HEADING.match(line)
+        if heading:
+            flush()
+            blocks.append(("heading", len(heading.group(1)), heading.group(2) or ""))
+            i += 1
+            continue
+
+        setext = _SETEXT.match(line)
+        if setext and para:
+            level = 1 if setext.group(1)[0] == "=" else 2
+            blocks.append(("heading", level, " ".join(s.strip() for s in para)))
+            para.clear()
+            i += 1
+            continue
+
+        if _RULE.match(line):
+            flush()
+            blocks.append(("rule",))
+            i += 1
+            continue
+
+        if "|" in line and i + 1 < n and _TABLE_RULE.match(lines[i + 1]):
+            flush()
+            header = _split_row(line)
+            aligns = []
+            for spec in _split_row(lines[i + 1]):
+                if spec.startswith(":") and spec.endswith(":"):
+                    aligns.append("center")
+                elif spec.endswith(":"):
+                    aligns.append("right")
+                else:
+                    aligns.append("left")
+            rows = []
+            i += 2
+            while i < n and lines[i].strip() and "|" in lines[i]:
+                rows.append(_split_row(lines[i]))
+                i += 1
+            blocks.append(("table", aligns, header, rows))
+            continue
+
+        if _QUOTE.match(line):
+            flush()
+            quoted = []
+            while i < n and lines[i].strip():
+                m = _QUOTE.match(lines[i])
+                if m is None and _block_start(lines[i]):
+                    break
+                quoted.append(m.group(1) if m else lines[i])
+                i += 1
+            blocks.append(("quote", parse_blocks(quoted)))
+            continue
+
+        item = _LIST_ITEM.match(line)
+        if item:
+            flush()
+            i = _parse_list(lines, i, blocks)
+            continue
+
+        indented = _INDENTED.match(line)
+        if indented and not para:
+            code = []
+            while i < n and (not lines[i].strip() or _INDENTED.match(lines[i])):
+                m = _INDENTED.match(lines[i])
+                code.append(m.group(1) if m else "")
+                i += 1
+            blocks.append(("code", "\n".join(code).rstrip("\n")))
+            continue
+
+        para.append(line)
+        i += 1
+    flush()
+    return blocks
+
+
+def _parse_list(lines: List[str], i: int, blocks: List[Block]) -> int:
+    """从第 i 行解析一个列表（同一缩进、同一类型的连续列表项），返回下一行的下标"""
+    first = _LIST_ITEM.match(lines[i])
+    indent = len(first.group(1))
+    ordered = first.group(2)[0].isdigit()
+    start = int(first.group(2)[:-1]) if ordered else 1
+    items: List[List[str]] = []
+    content_indent = indent + 2
+    n = len(lines)
+    while i < n:
+        line = lines[i]
+        m = _LIST_ITEM.match(line)
+        if m and len(m.group(1)) <= indent + 1:
+            if m.group(2)[0].isdigit() != ordered:
+                break
+            items.append([m.group(3) or ""])
+            content_indent = len(m.group(1)) + len(m.group(2)) + 1
+            i += 1
+            continue
+        if not line.strip():
+            # 空行之后仍有缩进内容或同级列表项时，列表继续
+            j = i + 1
+            while j < n and not lines[j].strip():
+                j += 1
+            if j >= n:
+                break
+            nxt = lines[j]
+            follows = _LIST_ITEM.match(nxt)
+            indent_next = len(nxt) - len(nxt.lstrip(" "))
+            if indent_next >= content_indent or (
+                follows and len(follows.group(1)) <= indent + 1
+            ):
+                items[-1].extend([""] * (j - i))
+                i = j
+                continue
+            break
+        leading = len(line) - len(line.lstrip(" "))
+        if leading >= min(content_indent, indent + 2):
+            items[-1].append(line[min(leading, content_indent) :])
+        elif not _block_start(line):
+            # 惰性续行：未缩进的文字仍属于当前列表项的段落
+            items[-1].append(line.strip())
+        else:
+            break
+        i += 1
+    blocks.append(("list", ordered, start, [parse_blocks(item) for item in items]))
+    return i
+
+
+class _Renderer:
+    """把块映射为 reportlab flowable，样式取自进程级缓存"""
+
+    def __init__(self, width: float):
+        self.styles = _styles()
+        self.width = width
+
+    def paragraph(self, markup: str, style):
+        from reportlab.platypus import Paragraph
+
+        try:
+            return Paragraph(markup, style)
+        except Exception:
+            # 标记无法解析（如不配对的原始 HTML）时按纯文本排版
+            plain = re.sub(r"<[^>]*>", "", markup)
+            return Paragraph(escape(plain), style)
+
+    def code(self, text: str):
+        from reportlab.platypus import Preformatted
+
+        # 按等宽字符估算每行可容纳的字符数，超长的行折行显示
+        columns = max(20, int(self.width / (CODE_SIZE * 0.6)))
+        return Preformatted(
+            text.expandtabs(4) or " ",
+            self.styles["code"],
+            maxLineLength=columns,
+            newLineChars="",
+        )
+
+    def table(self, aligns: List[str], header: List[str], rows: List[List[str]]):
+        from reportlab.platypus import Table
+
+        columns = len(header)
+        cell_styles = [
+            self.styles["cell" if a == "left" else f"cell-{a}"] for a in aligns
+        ]
+        cell_styles += [self.styles["cell"]] * (columns - len(cell_styles))
+        data = []
+        for r, row in enumerate([header, *rows]):
+            row = (row + [""] * columns)[:columns]
+            data.append(
+                [
+                    self.paragraph(
+                        f"<b>{inline_markup(c)}</b>" if r == 0 else inline_markup(c),
+                        cell_styles[k],
+                    )
+                    for k, c in enumerate(row)
+                ]
+            )
+        table = Table(data, colWidths=[self.width / columns] * columns, repeatRows=1)
+        table.setStyle(self.styles["table"])
+        return table
+
+    def flowables(self, blocks: List[Block], body=None) -> list:
+        from reportlab.lib import colors
+        from reportlab.platypus import (
+            HRFlowable,
+            Indenter,
+            ListFlowable,
+            ListItem,
+            Spacer,
+        )
+
+        body = body or self.styles["body"]
+        story = []
+        for block in blocks:
+            kind = block[0]
+            if kind == "heading":
+                story.append(
+                    self.paragraph(inline_markup(block[2]), self.styles[f"h{block[1]}"])
+                )
+            elif kind == "paragraph":
+                story.append(self.paragraph(inline_markup(block[1]), body))
+            elif kind == "code":
+                story.append(self.code(block[1]))
+            elif kind == "rule":
+                story.append(
+                    HRFlowable(
+                        width="100%",
+                        thickness=0.5,
+                        color=colors.HexColor("#999999"),
+                        spaceBefore=4,
+                        spaceAfter=8,
+                    )
+                )
+            elif kind == "quote":
+                story.append(Indenter(left=16))
+                story.extend(self.flowables(block[1], self.styles["quote"]))
+                story.append(Indenter(left=-16))
+            elif kind == "list":
+                _, ordered, start, items = block
+                story.append(
+                    ListFlowable(
+                        [
+                            ListItem(self.flowables(item, body) or [Spacer(1, 0)])
+                            for item in items
+                        ],
+                        bulletType="1" if ordered else "bullet",
+                        start=start if ordered else "•",
+                        bulletFontName=self.styles["body"].fontName,
+                        bulletFontSize=BODY_SIZE,
+                        leftIndent=18,
+                    )
+                )
+            elif kind == "table":
+                story.append(self.table(*block[1:]))
+                story.append(Spacer(1, 8))
+        return story
+
+
+def render_markdown(md_content: str, output_path: str):
+    """将 Markdown 文本一次解析为块，再排版为 PDF（标题、段落、列表、引用、代码块、表格）"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate
+
+    doc = SimpleDocTemplate(output_path, pagesize=A4)
+    blocks = parse_blocks(md_content.replace("\r\n", "\n").split("\n"))
+    story = _Renderer(doc.width).flowables(blocks)
+    doc.build(story or [_Renderer(doc.width).paragraph(" ", _styles()["body"])])
+
+
+def render_markdown_file(md_path: str, output_path: str):
+    with open(md_path, "r", encoding="utf-8") as f:
+        render_markdown(f.read(), output_path)
@@ -0,0 +1,289 @@
+import bisect
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# 等待/执行耗时直方图的分桶上界（秒）
+DURATION_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        # 指标可能在转换工作线程中更新
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = self.header()
+        for key, value in items:
+            lines.append(
+                f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            )
+        return lines
+
+
+class Gauge(_Metric):
+    """抓取时通过回调取值的仪表，回调返回 {标签值元组: 数值}"""
+
+    type_name = "gauge"
+
+    def __init__(self, name, documentation, labels=(), callback=None):
+        super().__init__(name, documentation, labels)
+        self._callback: Optional[Callable[[], Dict[LabelValues, float]]] = callback
+
+    def collect(self) -> List[str]:
+        lines = self.header()
+        try:
+            values = self._callback() if self._callback else {}
+        except Exception as e:
+            print(f"[Metrics] 采集 {self.name} 失败: {e}")
+            values = {}
+        for key, value in sorted(values.items()):
+            lines.append(
+                f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            )
+        return lines
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 -> [各分桶计数..., 总和, 总数]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        lines = self.header()
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = _format_labels(self.label_names, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _format_labels(self.label_names, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {state[-1]}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{labels} {state[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """进程内指标注册表，按 Prometheus 文本格式输出"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labels=()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=(), callback=None) -> Gauge:
+        return self.register(Gauge(name, documentation, labels, callback))
+
+    def histogram(self, name, documentation, labels=(), buckets=DURATION_BUCKETS):
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+task_wait_seconds = registry.histogram(
+    "toolbox_task_wait_seconds", "任务从入队到开始执行的等待时间", ("module",)
+)
+task_service_seconds = registry.histogram(
+    "toolbox_task_service_seconds", "任务从开始到结束的执行时间", ("module", "status")
+)
+tasks_finished_total = registry.counter(
+    "toolbox_tasks_finished_total", "已结束的任务数", ("module", "status")
+)
+process_exit_total = registry.counter(
+    "toolbox_process_exit_total", "外部转换进程的退出码计数", ("program", "code")
+)
+process_limit_total = registry.counter(
+    "toolbox_process_limit_total",
+    "外部转换进程超出资源上限被结束的次数（limit: memory / cpu）",
+    ("program", "limit"),
+)
+converted_bytes_total = registry.counter(
+    "toolbox_converted_bytes_total", "转换处理的字节数", ("module", "direction")
+)
+downloads_total = registry.counter(
+    "toolbox_downloads_total", "结果文件下载次数", ("module",)
+)
+conversion_cache_total = registry.counter(
+    "toolbox_conversion_cache_total", "转换结果缓存查询次数", ("result",)
+)
+conversion_seconds = registry.histogram(
+    "toolbox_conversion_seconds",
+    "单次转换调用的耗时（status: hit 缓存命中 / converted 转换成功 / failed 失败）",
+    ("engine", "status"),
+)
+
+
+class _QueueSnapshot:
+    """
+    调度器状态快照。TaskManager 的字典与堆只能在事件循环中访问，而指标在线程中生成；
+    每次抓取前在事件循环中调用 capture() 取一次 get_status()，各队列指标读取同一份数据。
+    """
+
+    def __init__(self):
+        self.status: Dict[str, float] = {}
+
+    def capture(self):
+        from app.core.task_manager import global_task_manager
+
+        self.status = global_task_manager.get_status()
+
+    def gauge(self, key: str) -> Callable[[], Dict[LabelValues, float]]:
+        return lambda: {(): self.status.get(key, 0)}
+
+
+queue_snapshot = _QueueSnapshot()
+
+
+def _history_backlog() -> Dict[LabelValues, float]:
+    from app.core.history_writer import global_history_writer
+
+    return {(): global_history_writer.backlog}
+
+
+registry.gauge(
+    "toolbox_queue_waiting",
+    "等待中的任务数",
+    callback=queue_snapshot.gauge("waiting_count"),
+)
+registry.gauge(
+    "toolbox_tasks_active",
+    "执行中的任务数",
+    callback=queue_snapshot.gauge("active_count"),
+)
+registry.gauge(
+    "toolbox_capacity_used",
+    "已占用的并发预算",
+    callback=queue_snapshot.gauge("used_capacity"),
+)
+registry.gauge(
+    "toolbox_capacity_total", "并发预算上限", callback=queue_snapshot.gauge("capacity")
+)
+registry.gauge(
+    "toolbox_queue_estimated_wait_seconds",
+    "新的普通任务入队时的预计等待秒数",
+    callback=queue_snapshot.gauge("estimated_wait"),
+)
+registry.gauge(
+    "toolbox_history_backlog", "等待写入的任务历史记录数", callback=_history_backlog
+)
+
+
+class _DirectorySize:
+    """临时目录占用，遍历结果缓存 ttl 秒，避免每次抓取都扫描磁盘"""
+
+    def __init__(self, path: str, ttl: float = 30.0):
+        self.path = path
+        self.ttl = ttl
+        self._value = 0
+        self._updated = 0.0
+
+    def __call__(self) -> Dict[LabelValues, float]:
+        now = time.monotonic()
+        if now - self._updated > self.ttl:
+            total = 0
+            for root, _, files in os.walk(self.path):
+                for f in files:
+                    try:
+                        total += os.path.getsize(os.path.join(root, f))
+                    except OSError:
+                        pass
+            self._value, self._updated = total, now
+        return {(): self._value}
+
+
+registry.gauge(
+    "toolbox_temp_dir_bytes",
+    "temp_files 目录占用的字节数",
+    callback=_DirectorySize(os.path.join(os.getcwd(), "temp_files")),
+)
+
+
+def observe_file_size(module: str, direction: str, path: Optional[str]):
+    """记录输入/输出文件大小，文件不存在时忽略"""
+    try:
+        if path and os.path.exists(path):
+            converted_bytes_total.inc(
+                os.path.getsize(path), module=module, direction=direction
+            )
+    except OSError:
+        pass
@@ -0,0 +1,507 @@
+import asyncio
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+
+# Debian 的 python3-uno 安装在系统 dist-packages 中，镜像内的 Python 需要手动加入搜索路径
+UNO_SEARCH_PATHS = ("/usr/lib/python3/dist-packages", "/usr/lib/libreoffice/program")
+
+
+# 实例连续启动失败达到该次数后停用实例池
+MAX_START_FAILURES = 3
+# 一次命令行调用最多转换的文档数，兼顾进程启动开销与单批失败的影响范围
+OFFICE_BATCH_SIZE = 8
+# 实例因超出资源上限被结束时 OfficePool.convert 返回的退出码，调用方不再改用命令行重试
+LIMIT_EXIT_CODE = 2
+
+
+def libreoffice_path() -> str:
+    return shutil.which("libreoffice") or "/usr/bin/libreoffice"
+
+
+def default_profile_root() -> str:
+    return os.path.join(tempfile.gettempdir(), "toolbox_office_profiles")
+
+
+def user_installation_arg(profile_dir: str) -> str:
+    """独立用户配置目录参数，避免并发的 soffice 争用同一个配置目录的锁"""
+    return f"-env:UserInstallation={Path(profile_dir).as_uri()}"
+
+
+def _import_uno():
+    try:
+        import uno  # noqa: F401
+
+        return True
+    except ImportError:
+        pass
+    extra = [p for p in settings.OFFICE_UNO_PATH.split(os.pathsep) if p]
+    for path in [*extra, *UNO_SEARCH_PATHS]:
+        if os.path.isdir(path) and path not in sys.path:
+            sys.path.append(path)
+    try:
+        import uno  # noqa: F401
+
+        return True
+    except ImportError:
+        return False
+
+
+def _prop(name: str, value):
+    from com.sun.star.beans import PropertyValue
+
+    p = PropertyValue()
+    p.Name = name
+    p.Value = value
+    return p
+
+
+class OfficeInstance:
+    """
+    一个常驻的 headless soffice 进程，通过 UNO socket 接收转换请求。
+    每个实例使用独立的用户配置目录，同一时间只处理一个文档。
+    """
+
+    def __init__(self, index: int, port: int, profile_root: str):
+        self.index = index
+        self.port = port
+        self.profile_dir = os.path.join(profile_root, f"instance_{index}")
+        self.process: Optional[subprocess.Popen] = None
+        self.conversions = 0
+        self._desktop = None
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.process else None
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def start(self, startup_timeout: float = 60.0):
+        from app.core.processes import sandbox_command
+
+        os.makedirs(self.profile_dir, exist_ok=True)
+        # 常驻实例的 CPU 时间跨转换累计，只设内存上限，单次转换的 CPU 由看门狗检查
+        self.process = subprocess.Popen(
+            sandbox_command(
+                [
+                    libreoffice_path(),
+                    "--headless",
+                    "--invisible",
+                    "--nologo",
+                    "--nodefault",
+                    "--norestore",
+                    "--nofirststartwizard",
+                    user_installation_arg(self.profile_dir),
+                    f"--accept=socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext",
+                ],
+                cpu_limit=False,
+            ),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        self.conversions = 0
+        self._desktop = None
+        deadline = time.monotonic() + startup_timeout
+        last_error = None
+        while time.monotonic() < deadline:
+            if not self.is_alive():
+                raise RuntimeError(f"soffice 实例 {self.index} 启动后立即退出")
+            try:
+                self._connect()
+                print(f"[Office] 实例 {self.index} 已就绪 (端口 {self.port})")
+                return
+            except Exception as e:
+                last_error = e
+                time.sleep(0.25)
+        self.stop()
+        raise RuntimeError(f"soffice 实例 {self.index} 启动超时: {last_error}")
+
+    def _connect(self):
+        import uno
+
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local
+        )
+        ctx = resolver.resolve(
+            f"uno:socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext"
+        )
+        self._desktop = ctx.ServiceManager.createInstanceWithContext(
+            "com.sun.star.frame.Desktop", ctx
+        )
+
+    def healthy(self) -> bool:
+        """进程存活且 UNO 连接可用"""
+        if not self.is_alive():
+            return False
+        try:
+            if self._desktop is None:
+                self._connect()
+            self._desktop.getComponents()
+            return True
+        except Exception:
+            self._desktop = None
+            return False
+
+    def convert(self, input_path: str, output_path: str):
+        import uno
+
+        if self._desktop is None:
+            self._connect()
+        doc = self._desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(os.path.abspath(input_path)),
+            "_blank",
+            0,
+            (_prop("Hidden", True), _prop("ReadOnly", True)),
+        )
+        if doc is None:
+            raise RuntimeError("无法打开文档")
+        try:
+            doc.storeToURL(
+                uno.systemPathToFileUrl(os.path.abspath(output_path)),
+                (_prop("FilterName", "writer_pdf_Export"),),
+            )
+        finally:
+            doc.close(True)
+        self.conversions += 1
+
+    def stop(self):
+        from app.core.processes import kill_process_group
+
+        if self.process is not None:
+            kill_process_group(self.process.pid)
+            try:
+                self.process.wait(timeout=5)
+            except Exception:
+                pass
+        self.process = None
+        self._desktop = None
+
+
+class OfficePool:
+    """
+    常驻 soffice 实例池，避免每个文档都冷启动 LibreOffice。
+    实例在首次使用时启动；取出前做健康检查，崩溃或完成 max_conversions 次转换后重启。
+    uno 模块或 LibreOffice 不可用时 available() 返回 False，调用方退回命令行转换。
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        base_port: int = 2002,
+        max_conversions: int = 200,
+        profile_root: Optional[str] = None,
+    ):
+        self.size = size
+        self.base_port = base_port
+        self.max_conversions = max_conversions
+        self.profile_root = profile_root or default_profile_root()
+        self._idle: "queue.Queue[OfficeInstance]" = queue.Queue()
+        self._instances: List[OfficeInstance] = []
+        self._lock = threading.Lock()
+        self._available: Optional[bool] = None
+        self._disabled_reason = ""
+        self._start_failures = 0
+
+    def available(self) -> bool:
+        if self._available is None:
+            with self._lock:
+                if self._available is None:
+                    self._available = self._probe()
+        return self._available
+
+    def _probe(self) -> bool:
+        if self.size <= 0:
+            self._disabled_reason = "OFFICE_POOL_SIZE=0"
+        elif not os.path.exists(libreoffice_path()):
+            self._disabled_reason = "未找到 LibreOffice"
+        elif not _import_uno():
+            self._disabled_reason = "uno 模块不可用"
+        else:
+            for i in range(self.size):
+                instance = OfficeInstance(i, self.base_port + i, self.profile_root)
+                self._instances.append(instance)
+                self._idle.put(instance)
+            print(f"[Office] 转换实例池已启用，共 {self.size} 个实例")
+            return True
+        print(f"[Office] 转换实例池未启用 ({self._disabled_reason})，使用命令行转换")
+        return False
+
+    def _checkout(self, timeout: Optional[float]) -> OfficeInstance:
+        instance = self._idle.get(timeout=timeout)
+        try:
+            if instance.conversions >= self.max_conversions:
+                print(
+                    f"[Office] 实例 {instance.index} 已转换 {instance.conversions} 次，回收重启"
+                )
+                instance.stop()
+            if not instance.healthy():
+                instance.stop()
+                instance.start()
+        except Exception as e:
+            self._idle.put(instance)
+            self._start_failures += 1
+            if self._start_failures >= MAX_START_FAILURES:
+                # 连续启动失败说明环境不支持常驻实例，停用实例池，后续直接走命令行
+                self._available = False
+                self._disabled_reason = f"实例连续启动失败: {e}"
+                print(f"[Office] 转换实例池已停用 ({self._disabled_reason})")
+            raise
+        self._start_failures = 0
+        return instance
+
+    def convert(
+        self,
+        input_path: str,
+        output_dir: str,
+        task_id: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> Tuple[int, str]:
+        """
+        同步转换为 PDF（供工作线程调用），返回 (退出码, 错误信息)。
+        转换期间实例进程登记到任务，取消、超时或超出资源上限会结束该实例，下次取出时自动重启。
+        """
+        from app.core.processes import ResourceWatchdog, report_limit_breach
+        from app.core.task_manager import global_task_manager
+
+        output_path = os.path.join(output_dir, f"{Path(input_path).stem}.pdf")
+        try:
+            instance = self._checkout(timeout)
+        except queue.Empty:
+            return 1, "等待 LibreOffice 实例超时"
+        except Exception as e:
+            return 1, f"LibreOffice 实例启动失败: {e}"
+
+        # 超时结束实例后 instance.pid 会被清空，登记与注销都使用开始时的进程号
+        pid = instance.pid
+        watchdog = None
+        if timeout:
+            # UNO 调用本身无法中断，超时后直接结束实例进程
+            watchdog = threading.Timer(timeout, instance.stop)
+            watchdog.daemon = True
+            watchdog.start()
+        if task_id:
+            global_task_manager.attach_process(task_id, pid)
+        limits = ResourceWatchdog(pid).start()
+        try:
+            instance.convert(input_path, output_path)
+            code, error = 0, ""
+        except Exception as e:
+            # 连接断开通常意味着实例崩溃或被结束，丢弃连接，下次取出时重启
+            instance._desktop = None
+            code, error = 1, f"LibreOffice (UNO) Error: {e}"
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+            limits.stop()
+            if task_id:
+                global_task_manager.detach_process(task_id, pid)
+            self._idle.put(instance)
+        if limits.breach:
+            report_limit_breach("soffice-pool", task_id, *limits.breach)
+            code, error = LIMIT_EXIT_CODE, limits.breach[1]
+        metrics.process_exit_total.inc(program="soffice-pool", code=str(code))
+        if code == 0 and not os.path.exists(output_path):
+            code, error = 1, "LibreOffice 未生成输出文件"
+        return code, error
+
+    def warm(self):
+        """启动全部实例（首次启动时创建配置目录），供启动预热调用"""
+        if not self.available():
+            return
+        started = []
+        try:
+            for _ in range(len(self._instances)):
+                started.append(self._checkout(timeout=None))
+        finally:
+            for instance in started:
+                self._idle.put(instance)
+
+    def get_status(self) -> dict:
+        return {
+            "enabled": self.available(),
+            "reason": self._disabled_reason,
+            "size": len(self._instances),
+            "idle": self._idle.qsize(),
+            "alive": sum(1 for i in self._instances if i.is_alive()),
+        }
+
+    def close(self):
+        for instance in self._instances:
+            instance.stop()
+
+
+class ProfilePool:
+    """
+    命令行转换使用的用户配置目录池。
+    每次 libreoffice 调用独占一个目录，首次使用前以 --terminate_after_init 初始化一次，
+    之后反复复用，N 个转换可以同时进行而不会争用默认配置目录的锁。
+    目录数同时限制了命令行转换的并发数。
+    """
+
+    def __init__(self, size: int, root: Optional[str] = None):
+        self.size = max(1, size)
+        self.root = root or default_profile_root()
+        self._free: "queue.Queue[str]" = queue.Queue()
+        for i in range(self.size):
+            self._free.put(os.path.join(self.root, f"cli_{i}"))
+        self._initialized = set()
+        self._init_lock = threading.Lock()
+
+    def _ensure_initialized(self, profile_dir: str):
+        if profile_dir in self._initialized:
+            return
+        with self._init_lock:
+            if profile_dir in self._initialized:
+                return
+            os.makedirs(profile_dir, exist_ok=True)
+            if not os.path.isdir(os.path.join(profile_dir, "user")):
+                from app.core.processes import run_process
+
+                start = time.perf_counter()
+                run_process(
+                    [
+                        libreoffice_path(),
+                        "--headless",
+                        "--terminate_after_init",
+                        user_installation_arg(profile_dir),
+                    ],
+                    timeout=120,
+                )
+                print(
+                    f"[Office] 已初始化配置目录 {os.path.basename(profile_dir)} "
+                    f"({time.perf_counter() - start:.1f}s)"
+                )
+            self._initialized.add(profile_dir)
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None) -> Iterator[str]:
+        profile_dir = self._free.get(timeout=timeout)
+        try:
+            self._ensure_initialized(profile_dir)
+            yield profile_dir
+        finally:
+            self._free.put(profile_dir)
+
+    def initialize_all(self):
+        """预先初始化全部配置目录"""
+        for i in range(self.size):
+            self._ensure_initialized(os.path.join(self.root, f"cli_{i}"))
+
+
+def _run_cli(
+    input_paths: List[str],
+    output_dir: str,
+    task_id: Optional[str],
+    timeout: Optional[float],
+) -> subprocess.CompletedProcess:
+    """以独占的用户配置目录调用一次 libreoffice 命令行转换"""
+    from app.core.processes import run_process
+
+    with global_profile_pool.acquire() as profile_dir:
+        return run_process(
+            [
+                libreoffice_path(),
+                "--headless",
+                user_installation_arg(profile_dir),
+                "--convert-to",
+                "pdf",
+                "--outdir",
+                output_dir,
+                *input_paths,
+            ],
+            task_id=task_id,
+            timeout=timeout,
+        )
+
+
+def convert_to_pdf(
+    input_path: str,
+    output_dir: str,
+    task_id: Optional[str] = None,
+    timeout: Optional[float] = None,
+) -> Tuple[int, str]:
+    """
+    将文档转换为 PDF（同步），返回 (退出码, 错误信息)。
+    优先使用常驻实例池，不可用或转换失败时退回命令行 libreoffice。
+    """
+    from app.core.task_manager import global_task_manager
+
+    if global_office_pool.available():
+        code, error = global_office_pool.convert(
+            input_path, output_dir, task_id, timeout
+        )
+        if code in (0, LIMIT_EXIT_CODE) or (
+            task_id and global_task_manager.is_cancelled(task_id)
+        ):
+            return code, error
+        print(f"[Office] 实例池转换失败，改用命令行: {error}")
+
+    result = _run_cli([input_path], output_dir, task_id, timeout)
+    return result.returncode, result.stderr or ""
+
+
+def convert_many_to_pdf(
+    input_paths: List[str],
+    output_dir: str,
+    task_id: Optional[str] = None,
+    timeout: Optional[float] = None,
+) -> List[bool]:
+    """
+    将同一输出目录下的多个文档转换为 PDF（同步），返回与输入一一对应的成功标记。
+    实例池可用时逐个交给常驻实例；其余文档合并为一次 libreoffice 命令行调用，
+    按生成的输出文件判断每个文档是否成功。
+    """
+    from app.core.task_manager import global_task_manager
+
+    def output_of(path: str) -> str:
+        return os.path.join(output_dir, f"{Path(path).stem}.pdf")
+
+    remaining = list(input_paths)
+    if global_office_pool.available():
+        failed = []
+        for path in remaining:
+            if task_id and global_task_manager.is_cancelled(task_id):
+                return [os.path.exists(output_of(p)) for p in input_paths]
+            code, _ = global_office_pool.convert(path, output_dir, task_id, timeout)
+            # 超出资源上限的文档不再交给命令行重试
+            if code not in (0, LIMIT_EXIT_CODE):
+                failed.append(path)
+        remaining = failed
+
+    if remaining and not (task_id and global_task_manager.is_cancelled(task_id)):
+        _run_cli(remaining, output_dir, task_id, timeout)
+    return [os.path.exists(output_of(p)) for p in input_paths]
+
+
+async def convert_to_pdf_async(
+    input_path: str,
+    output_dir: str,
+    task_id: Optional[str] = None,
+    timeout: Optional[float] = None,
+) -> Tuple[int, str]:
+    """convert_to_pdf 的异步版本，在线程中执行，不阻塞事件循环"""
+    return await asyncio.get_running_loop().run_in_executor(
+        None, convert_to_pdf, input_path, output_dir, task_id, timeout
+    )
+
+
+global_office_pool = OfficePool(
+    size=settings.OFFICE_POOL_SIZE,
+    base_port=settings.OFFICE_POOL_BASE_PORT,
+    max_conversions=settings.OFFICE_POOL_MAX_CONVERSIONS,
+)
+global_profile_pool = ProfilePool(size=settings.OFFICE_CLI_PROFILES)
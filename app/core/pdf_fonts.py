@@ -0,0 +1,58 @@
+import os
+from functools import lru_cache
+
+# 基础镜像安装的中文字体（fonts-wqy-microhei / fonts-wqy-zenhei），均为 reportlab 可嵌入的 TrueType 轮廓
+CJK_FONT_FILES = (
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc",
+)
+# 找不到字体文件时使用 reportlab 内置的 CID 字体（不嵌入，由阅读器提供字形）
+CID_FALLBACK_FONT = "STSong-Light"
+CJK_FONT_NAME = "ToolboxCJK"
+# 文泉驿微米黑 TTC 中的第二个字体为等宽版本，用于代码
+CJK_MONO_FONT = ("/usr/share/fonts/truetype/wqy/wqy-microhei.ttc", 1)
+CJK_MONO_FONT_NAME = "ToolboxCJKMono"
+
+
+@lru_cache(maxsize=None)
+def cjk_font() -> str:
+    """
+    注册支持中文的字体并返回字体名，每个进程只注册一次。
+    字体没有粗体/斜体字形，<b>、<i> 映射到同一字体，避免 Paragraph 查找字体族时报错。
+    """
+    from reportlab.lib.fonts import addMapping
+    from reportlab.pdfbase import pdfmetrics
+
+    name = CID_FALLBACK_FONT
+    for path in CJK_FONT_FILES:
+        if os.path.exists(path):
+            from reportlab.pdfbase.ttfonts import TTFont
+
+            pdfmetrics.registerFont(TTFont(CJK_FONT_NAME, path, subfontIndex=0))
+            name = CJK_FONT_NAME
+            break
+    else:
+        from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+
+        pdfmetrics.registerFont(UnicodeCIDFont(CID_FALLBACK_FONT))
+    for bold in (0, 1):
+        for italic in (0, 1):
+            addMapping(name, bold, italic, name)
+    return name
+
+
+@lru_cache(maxsize=None)
+def cjk_mono_font() -> str:
+    """注册支持中文的等宽字体并返回字体名；没有等宽字体时退回 cjk_font()"""
+    path, index = CJK_MONO_FONT
+    if not os.path.exists(path):
+        return cjk_font()
+    from reportlab.lib.fonts import addMapping
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    pdfmetrics.registerFont(TTFont(CJK_MONO_FONT_NAME, path, subfontIndex=index))
+    for bold in (0, 1):
+        for italic in (0, 1):
+            addMapping(CJK_MONO_FONT_NAME, bold, italic, CJK_MONO_FONT_NAME)
+    return CJK_MONO_FONT_NAME
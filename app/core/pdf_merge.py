@@ -0,0 +1,301 @@
+import os
+from collections import deque
+from typing import BinaryIO, Callable, Deque, Dict, List, Optional, Tuple
+
+from app.core.pdf_tools import (
+    PdfInfo,
+    count_pages,
+    inspect_pdf,
+    linearize_pdf,
+    load_pdf_info,
+    save_pdf_info,
+)
+
+# 页面可以从上级 /Pages 节点继承的属性，合并时改挂到新的页面树上，需写入页面本身
+INHERITABLE_KEYS = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+# 不复制的页面键：/Parent 由新页面树指定，/B（文章线程）指向源文档目录中的对象
+SKIPPED_PAGE_KEYS = ("/Parent", "/B")
+
+
+class MergeCancelled(Exception):
+    """合并过程中任务被取消"""
+
+
+class _StreamingWriter:
+    """按对象顺序直接写入文件的最小 PDF 写入器，内存中只保存各对象的偏移量"""
+
+    def __init__(self, f: BinaryIO):
+        self.f = f
+        # 下标为对象号，0 号为空闲对象
+        self.offsets: List[Optional[int]] = [0]
+        f.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    def reserve(self) -> int:
+        self.offsets.append(None)
+        return len(self.offsets) - 1
+
+    def write(self, num: int, obj, data: Optional[bytes] = None):
+        self.offsets[num] = self.f.tell()
+        self.f.write(f"{num} 0 obj\n".encode())
+        obj.write_to_stream(self.f)
+        if data is not None:
+            self.f.write(b"\nstream\n")
+            self.f.write(data)
+            self.f.write(b"\nendstream")
+        self.f.write(b"\nendobj\n")
+
+    def finish(self, root: int, info: int):
+        from pypdf.generic import NullObject
+
+        # 源文件损坏时已分配但未写出的对象号以 null 对象占位
+        for num, offset in enumerate(self.offsets):
+            if offset is None:
+                self.write(num, NullObject())
+        start = self.f.tell()
+        lines = [f"xref\n0 {len(self.offsets)}\n0000000000 65535 f\r\n"]
+        lines.extend(f"{offset:010d} 00000 n\r\n" for offset in self.offsets[1:])
+        self.f.write("".join(lines).encode())
+        self.f.write(
+            f"trailer\n<< /Size {len(self.offsets)} /Root {root} 0 R /Info {info} 0 R >>\n"
+            f"startxref\n{start}\n%%EOF\n".encode()
+        )
+
+
+class _SourceCopier:
+    """把一个源文档中被页面引用的对象按需复制到输出文件，每个源对象只写一次"""
+
+    def __init__(self, writer: _StreamingWriter):
+        self.writer = writer
+        # (源对象号, 代数) -> 新对象号
+        self.numbers: Dict[Tuple[int, int], int] = {}
+        self.pending: Deque = deque()
+
+    def ref(self, indirect):
+        from pypdf.generic import IndirectObject
+
+        key = (indirect.idnum, indirect.generation)
+        num = self.numbers.get(key)
+        if num is None:
+            num = self.numbers[key] = self.writer.reserve()
+            self.pending.append((num, indirect))
+        return IndirectObject(num, 0, None)
+
+    def copy(self, obj):
+        """复制直接对象，其中的间接引用改为新对象号（被引用对象排入待写队列）"""
+        from pypdf.generic import (
+            ArrayObject,
+            DictionaryObject,
+            IndirectObject,
+            NameObject,
+        )
+
+        if isinstance(obj, IndirectObject):
+            return self.ref(obj)
+        if isinstance(obj, DictionaryObject):
+            copied = DictionaryObject()
+            for key, value in obj.items():
+                copied[NameObject(key)] = self.copy(value)
+            return copied
+        if isinstance(obj, ArrayObject):
+            return ArrayObject(self.copy(value) for value in obj)
+        return obj
+
+    def drain(self):
+        from pypdf.generic import (
+            DictionaryObject,
+            NameObject,
+            NumberObject,
+            StreamObject,
+        )
+
+        while self.pending:
+            num, indirect = self.pending.popleft()
+            obj = indirect.get_object()
+            if isinstance(obj, StreamObject):
+                # 流数据保持源文件中的编码原样写出，不解压再压缩
+                data = obj._data
+                head = DictionaryObject()
+                for key, value in obj.items():
+                    if key != "/Length":
+                        head[NameObject(key)] = self.copy(value)
+                head[NameObject("/Length")] = NumberObject(len(data))
+                self.writer.write(num, head, data)
+            else:
+                self.writer.write(num, self.copy(obj))
+
+    def page(self, page, parent: int):
+        """复制页面字典：补齐继承属性并挂到新的父节点下"""
+        from pypdf.generic import DictionaryObject, IndirectObject, NameObject
+
+        copied = DictionaryObject()
+        for key, value in page.items():
+            if key not in SKIPPED_PAGE_KEYS:
+                copied[NameObject(key)] = self.copy(value)
+        for key in INHERITABLE_KEYS:
+            node = page
+            while key not in node and "/Parent" in node:
+                node = node["/Parent"]
+            if key in node and key not in copied:
+                copied[NameObject(key)] = self.copy(node.raw_get(key))
+        copied[NameObject("/Parent")] = IndirectObject(parent, 0, None)
+        return copied
+
+
+def _pages_node(parent: Optional[int], kids: List[int], count: int):
+    from pypdf.generic import (
+        ArrayObject,
+        DictionaryObject,
+        IndirectObject,
+        NameObject,
+        NumberObject,
+    )
+
+    node = DictionaryObject()
+    node[NameObject("/Type")] = NameObject("/Pages")
+    if parent is not None:
+        node[NameObject("/Parent")] = IndirectObject(parent, 0, None)
+    node[NameObject("/Kids")] = ArrayObject(IndirectObject(k, 0, None) for k in kids)
+    node[NameObject("/Count")] = NumberObject(count)
+    return node
+
+
+def _write_outline(
+    writer: _StreamingWriter, bookmarks: List[Tuple[str, int]]
+) -> Optional[int]:
+    """写入一层书签（标题, 首页对象号），返回书签根对象号"""
+    from pypdf.generic import (
+        ArrayObject,
+        DictionaryObject,
+        IndirectObject,
+        NameObject,
+        NumberObject,
+        TextStringObject,
+    )
+
+    if not bookmarks:
+        return None
+    root = writer.reserve()
+    items = [writer.reserve() for _ in bookmarks]
+    for i, (title, page) in enumerate(bookmarks):
+        item = DictionaryObject()
+        item[NameObject("/Title")] = TextStringObject(title)
+        item[NameObject("/Parent")] = IndirectObject(root, 0, None)
+        item[NameObject("/Dest")] = ArrayObject(
+            [IndirectObject(page, 0, None), NameObject("/Fit")]
+        )
+        if i > 0:
+            item[NameObject("/Prev")] = IndirectObject(items[i - 1], 0, None)
+        if i < len(items) - 1:
+            item[NameObject("/Next")] = IndirectObject(items[i + 1], 0, None)
+        writer.write(items[i], item)
+    outline = DictionaryObject()
+    outline[NameObject("/Type")] = NameObject("/Outlines")
+    outline[NameObject("/First")] = IndirectObject(items[0], 0, None)
+    outline[NameObject("/Last")] = IndirectObject(items[-1], 0, None)
+    outline[NameObject("/Count")] = NumberObject(len(items))
+    writer.write(root, outline)
+    return root
+
+
+def merge_pdfs(
+    parts: List[Tuple[str, str]],
+    output_path: str,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> PdfInfo:
+    """
+    按顺序把多个 PDF 合并为一个，每个源文档生成一个书签。
+    逐页复制并立即写入输出文件，同一时刻只打开一个源文档，内存占用与总页数无关；
+    各源文档的页数取自转换时生成的元数据记录，用于进度统计。
+    :param parts: [(PDF 路径, 书签标题)]
+    :param on_progress: 进度回调 (已写入页数, 总页数)
+    :param should_stop: 返回 True 时中止合并并抛出 MergeCancelled
+    :return: 合并结果的元数据记录（同时保存在输出文件旁）
+    """
+    from pypdf import PdfReader
+    from pypdf.generic import (
+        DictionaryObject,
+        IndirectObject,
+        NameObject,
+        TextStringObject,
+    )
+
+    sizes = []
+    for path, _ in parts:
+        info = load_pdf_info(path)
+        sizes.append(info.pages if info else count_pages(path))
+    total = sum(sizes)
+
+    written = 0
+    documents: List[Tuple[int, int]] = []  # (文档节点对象号, 页数)
+    bookmarks: List[Tuple[str, int]] = []
+    tmp_path = f"{output_path}.part"
+    try:
+        with open(tmp_path, "wb") as f:
+            writer = _StreamingWriter(f)
+            root = writer.reserve()
+            for (path, title), expected in zip(parts, sizes):
+                if expected <= 0:
+                    continue
+                node = writer.reserve()
+                kids: List[int] = []
+                copier = _SourceCopier(writer)
+                try:
+                    reader = PdfReader(path)
+                    if reader.is_encrypted:
+                        reader.decrypt("")
+                    pages = reader.pages
+                    # 先为全部页面分配对象号，页面之间的链接注释可以直接指向新页面
+                    for page in pages:
+                        kids.append(copier.ref(page.indirect_reference).idnum)
+                    copier.pending.clear()
+                    for page, num in zip(pages, kids):
+                        if should_stop is not None and should_stop():
+                            raise MergeCancelled("任务已取消")
+                        writer.write(num, copier.page(page, node))
+                        copier.drain()
+                        written += 1
+                        if on_progress is not None:
+                            on_progress(written, total)
+                except MergeCancelled:
+                    raise
+                except Exception as e:
+                    print(f"[Merge] 读取 {os.path.basename(path)} 失败，已跳过: {e}")
+                    # 已分配但未写出的页面从页面树中去掉，由 finish 以 null 占位
+                    kids = [k for k in kids if writer.offsets[k] is not None]
+                    written += expected - len(kids)
+                writer.write(node, _pages_node(root, kids, len(kids)))
+                documents.append((node, len(kids)))
+                if kids:
+                    bookmarks.append((title, kids[0]))
+
+            writer.write(
+                root,
+                _pages_node(
+                    None, [n for n, _ in documents], sum(c for _, c in documents)
+                ),
+            )
+            outline = _write_outline(writer, bookmarks)
+            catalog = DictionaryObject()
+            catalog[NameObject("/Type")] = NameObject("/Catalog")
+            catalog[NameObject("/Pages")] = IndirectObject(root, 0, None)
+            if outline is not None:
+                catalog[NameObject("/Outlines")] = IndirectObject(outline, 0, None)
+                catalog[NameObject("/PageMode")] = NameObject("/UseOutlines")
+            catalog_num = writer.reserve()
+            writer.write(catalog_num, catalog)
+            info_num = writer.reserve()
+            producer = DictionaryObject()
+            producer[NameObject("/Producer")] = TextStringObject("ToolBox Web")
+            writer.write(info_num, producer)
+            writer.finish(catalog_num, info_num)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    pages = sum(c for _, c in documents)
+    linearize_pdf(output_path, pages)
+    info = inspect_pdf(output_path, pages)
+    save_pdf_info(output_path, info)
+    return info
@@ -0,0 +1,501 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+# 从文件末尾读取的字节数，用于定位 startxref
+TAIL_BYTES = 2048
+# 读取单个对象时每次多读的字节数
+OBJECT_CHUNK = 16 * 1024
+# 沿 /Prev 追溯的增量更新层数上限，防止损坏文件造成死循环
+MAX_XREF_SECTIONS = 64
+# 与输出 PDF 同目录保存的元数据记录后缀
+INFO_SUFFIX = ".info.json"
+
+_STARTXREF = re.compile(rb"startxref\s+(\d+)\s*%%EOF")
+_SUBSECTION = re.compile(rb"\s*(\d+)\s+(\d+)[ \t]*(?:\r\n|\r|\n)")
+_REF = re.compile(rb"(\d+)\s+(\d+)\s+R")
+_OBJ = re.compile(rb"\s*(\d+)\s+(\d+)\s+obj")
+_STREAM = re.compile(rb">>\s*stream(?:\r\n|\r|\n)")
+# 只含数字、名字与引用的数组（如 Kids、MediaBox）一次匹配，不逐项扫描
+_FLAT_ARRAY = re.compile(rb"\[[^\[\]()<>%]*\]")
+_NUMBER = re.compile(rb"[-+]?(?:\d+\.?\d*|\.\d+)")
+_WHITESPACE = b" \t\r\n\x00\x0c"
+_DELIMITERS = _WHITESPACE + b"()<>[]{}/%"
+
+
+class UnsupportedPdf(Exception):
+    """文件结构超出增量更新的处理范围（交叉引用流、加密等），调用方应退回完整重写"""
+
+
+def _skip_ws(data: bytes, i: int) -> int:
+    while i < len(data):
+        c = data[i : i + 1]
+        if c in _WHITESPACE and c:
+            i += 1
+        elif c == b"%":
+            while i < len(data) and data[i : i + 1] not in (b"\r", b"\n"):
+                i += 1
+        else:
+            break
+    return i
+
+
+def _skip_value(data: bytes, i: int) -> int:
+    """跳过一个 PDF 对象值（字典、数组、字符串、名字、数字、引用），返回其结束位置"""
+    start = i
+    if data.startswith(b"<<", i):
+        i += 2
+        while True:
+            i = _skip_ws(data, i)
+            if data.startswith(b">>", i):
+                return i + 2
+            i = _skip_value(data, i)
+    c = data[i : i + 1]
+    if c == b"[":
+        m = _FLAT_ARRAY.match(data, i)
+        if m:
+            return m.end()
+        i += 1
+        while True:
+            i = _skip_ws(data, i)
+            if data[i : i + 1] == b"]":
+                return i + 1
+            i = _skip_value(data, i)
+    if c == b"(":
+        depth = 0
+        while i < len(data):
+            c = data[i : i + 1]
+            if c == b"\\":
+                i += 2
+                continue
+            if c == b"(":
+                depth += 1
+            elif c == b")":
+                depth -= 1
+                if depth == 0:
+                    return i + 1
+            i += 1
+        raise ValueError("字符串未结束")
+    if c == b"<":
+        return data.index(b">", i) + 1
+    m = _REF.match(data, i)
+    if m:
+        return m.end()
+    if c == b"/":
+        i += 1
+    while i < len(data) and data[i : i + 1] not in _DELIMITERS:
+        i += 1
+    if i == start:
+        raise ValueError(f"无法解析的 PDF 内容: {data[i : i + 20]!r}")
+    return i
+
+
+def _parse_dict(data: bytes, i: int = 0) -> Dict[bytes, bytes]:
+    """解析字典的顶层键值，值保留原始字节"""
+    i = _skip_ws(data, i)
+    if not data.startswith(b"<<", i):
+        raise ValueError("不是字典对象")
+    i += 2
+    items = {}
+    while True:
+        i = _skip_ws(data, i)
+        if data.startswith(b">>", i):
+            return items
+        if data[i : i + 1] != b"/":
+            raise ValueError("字典键不是名字")
+        end = _skip_value(data, i)
+        key = data[i + 1 : end]
+        i = _skip_ws(data, end)
+        end = _skip_value(data, i)
+        items[key] = data[i:end]
+        i = end
+
+
+def _format_dict(items: Dict[bytes, bytes]) -> bytes:
+    return b"<< " + b" ".join(b"/" + k + b" " + v for k, v in items.items()) + b" >>"
+
+
+def _ref(value: Optional[bytes]) -> Optional[int]:
+    m = _REF.fullmatch(value.strip()) if value else None
+    return int(m.group(1)) if m else None
+
+
+class _PdfFile:
+    """
+    只读取文件末尾的交叉引用表与页面树根节点，不解析页面内容。
+    交叉引用表每条记录定长，按对象号直接定位，读取开销与文档页数无关。
+    """
+
+    def __init__(self, f):
+        self.f = f
+        f.seek(0, os.SEEK_END)
+        self.size = f.tell()
+        f.seek(max(0, self.size - TAIL_BYTES))
+        matches = list(_STARTXREF.finditer(f.read()))
+        if not matches:
+            raise ValueError("未找到 startxref")
+        self.startxref = int(matches[-1].group(1))
+        # 各层交叉引用表的小节 (起始对象号, 数量, 首条记录位置, 记录长度)，最新的在前
+        self.sections: List[List[Tuple[int, int, int, int]]] = []
+        self.trailer: Dict[bytes, bytes] = {}
+        offset: Optional[int] = self.startxref
+        while offset is not None and len(self.sections) < MAX_XREF_SECTIONS:
+            trailer = self._read_section(offset)
+            if not self.trailer:
+                self.trailer = trailer
+            offset = int(trailer[b"Prev"]) if b"Prev" in trailer else None
+        if b"Encrypt" in self.trailer:
+            raise UnsupportedPdf("加密的 PDF")
+
+    def _read_section(self, offset: int) -> Dict[bytes, bytes]:
+        self.f.seek(offset)
+        head = self.f.read(64)
+        if not head.lstrip().startswith(b"xref"):
+            raise UnsupportedPdf("使用交叉引用流的 PDF")
+        if b"XRefStm" in self.trailer:
+            raise UnsupportedPdf("混合交叉引用的 PDF")
+        pos = offset + head.index(b"xref") + 4
+        subsections = []
+        while True:
+            self.f.seek(pos)
+            chunk = self.f.read(64)
+            if chunk.lstrip().startswith(b"trailer"):
+                pos += chunk.index(b"trailer") + 7
+                break
+            m = _SUBSECTION.match(chunk)
+            if not m:
+                raise ValueError("交叉引用表格式错误")
+            start, count = int(m.group(1)), int(m.group(2))
+            first = pos + m.end()
+            # 规范要求每条记录 20 字节，个别生成器只用单个换行（19 字节）
+            entry = chunk[m.end() : m.end() + 20]
+            length = 19 if count and entry[18:19] == b"\n" else 20
+            subsections.append((start, count, first, length))
+            pos = first + count * length
+        self.sections.append(subsections)
+        self.f.seek(pos)
+        return _parse_dict(self.f.read(OBJECT_CHUNK))
+
+    def locate(self, num: int) -> Tuple[int, int]:
+        """返回对象的 (文件偏移, 代号)"""
+        for subsections in self.sections:
+            for start, count, first, length in subsections:
+                if start <= num < start + count:
+                    self.f.seek(first + (num - start) * length)
+                    entry = self.f.read(18)
+                    if entry[17:18] != b"n":
+                        raise ValueError(f"对象 {num} 已被删除")
+                    return int(entry[:10]), int(entry[11:16])
+        raise UnsupportedPdf(f"对象 {num} 不在交叉引用表中（可能位于对象流）")
+
+    def read_object(self, num: int) -> bytes:
+        """读取间接对象的内容（obj 与 endobj / stream 之间的部分）"""
+        offset, _ = self.locate(num)
+        self.f.seek(offset)
+        data = b""
+        while True:
+            chunk = self.f.read(OBJECT_CHUNK)
+            data += chunk
+            stream = _STREAM.search(data)
+            end = stream.start() + 2 if stream else data.find(b"endobj")
+            if end >= 0 or not chunk:
+                break
+        m = _OBJ.match(data)
+        if not m or int(m.group(1)) != num or end < 0:
+            raise ValueError(f"对象 {num} 格式错误")
+        return data[m.end() : end]
+
+    def resolve(self, value: bytes) -> bytes:
+        num = _ref(value)
+        return self.read_object(num) if num is not None else value
+
+    def pages_root(self) -> Tuple[int, Dict[bytes, bytes]]:
+        catalog = _parse_dict(self.read_object(_ref(self.trailer[b"Root"])))
+        num = _ref(catalog[b"Pages"])
+        return num, _parse_dict(self.read_object(num))
+
+    def page_box(
+        self, root: Dict[bytes, bytes], last: bool = True
+    ) -> Tuple[float, float]:
+        """沿页面树最右（或最左）侧分支找到最后（或第一）页，返回其（可继承的）MediaBox 宽高"""
+        node, box = root, root.get(b"MediaBox")
+        for _ in range(64):
+            if node.get(b"Type", b"").strip() == b"/Page":
+                break
+            kids = _REF.findall(self.resolve(node[b"Kids"]))
+            if not kids:
+                break
+            node = _parse_dict(self.read_object(int(kids[-1 if last else 0][0])))
+            box = node.get(b"MediaBox", box)
+        if box is None:
+            raise ValueError("缺少 MediaBox")
+        x0, y0, x1, y1 = (float(v) for v in _NUMBER.findall(self.resolve(box))[:4])
+        return abs(x1 - x0), abs(y1 - y0)
+
+
+@dataclass
+class PdfInfo:
+    """转换输出的元数据记录：页数、首页尺寸（磅）、字节数与 SHA-256"""
+
+    pages: int
+    width: float = 0.0
+    height: float = 0.0
+    size: int = 0
+    sha256: str = ""
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PdfInfo":
+        return cls(
+            pages=int(data["pages"]),
+            width=float(data.get("width", 0.0)),
+            height=float(data.get("height", 0.0)),
+            size=int(data.get("size", 0)),
+            sha256=data.get("sha256", ""),
+        )
+
+    def describe(self) -> str:
+        """结果卡片上显示的摘要，如 12 页 · A4 · 1.3 MB"""
+        parts = [f"{self.pages} 页"]
+        if self.width and self.height:
+            portrait = sorted((round(self.width), round(self.height)))
+            parts.append(PAGE_SIZE_NAMES.get(tuple(portrait), "自定义尺寸"))
+        if self.size >= 1024 * 1024:
+            parts.append(f"{self.size / 1024 / 1024:.1f} MB")
+        else:
+            parts.append(f"{max(1, round(self.size / 1024))} KB")
+        return " · ".join(parts)
+
+
+# 常见纸张的尺寸（磅，短边在前）
+PAGE_SIZE_NAMES = {
+    (595, 842): "A4",
+    (420, 595): "A5",
+    (842, 1191): "A3",
+    (612, 792): "Letter",
+    (612, 1008): "Legal",
+    (516, 729): "B5",
+}
+
+
+def _page_count_fast(pdf_path: str) -> int:
+    with open(pdf_path, "rb") as f:
+        _, root = _PdfFile(f).pages_root()
+        return int(root[b"Count"])
+
+
+def count_pages(pdf_path: str) -> int:
+    """返回 PDF 页数，无法读取时返回 0；优先直接读取页面树根节点的 /Count"""
+    try:
+        return _page_count_fast(pdf_path)
+    except Exception:
+        pass
+    try:
+        from pypdf import PdfReader
+
+        return len(PdfReader(pdf_path).pages)
+    except Exception as e:
+        print(f"读取 PDF 信息出错: {e}")
+        return 0
+
+
+def info_path(pdf_path: str) -> str:
+    return pdf_path + INFO_SUFFIX
+
+
+def inspect_pdf(pdf_path: str, pages: Optional[int] = None) -> PdfInfo:
+    """
+    生成 PDF 的元数据记录：顺序读取一遍文件计算 SHA-256 与字节数，
+    页数与首页尺寸取自页面树（已知页数时直接使用）。
+    """
+    digest = hashlib.sha256()
+    size = 0
+    width = height = 0.0
+    with open(pdf_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+            size += len(chunk)
+        try:
+            pdf = _PdfFile(f)
+            _, root = pdf.pages_root()
+            width, height = pdf.page_box(root, last=False)
+            if pages is None:
+                pages = int(root[b"Count"])
+        except Exception:
+            pass
+    if pages is None or not width:
+        try:
+            from pypdf import PdfReader
+
+            reader = PdfReader(pdf_path)
+            if pages is None:
+                pages = len(reader.pages)
+            if reader.pages:
+                width = float(reader.pages[0].mediabox.width)
+                height = float(reader.pages[0].mediabox.height)
+        except Exception as e:
+            print(f"读取 PDF 信息出错: {e}")
+    return PdfInfo(pages or 0, width, height, size, digest.hexdigest())
+
+
+def save_pdf_info(pdf_path: str, info: PdfInfo):
+    """把元数据记录写到 PDF 旁边（<文件名>.info.json）"""
+    try:
+        with open(info_path(pdf_path), "w", encoding="utf-8") as f:
+            json.dump(info.to_dict(), f)
+    except OSError as e:
+        print(f"[PDF] 写入元数据失败: {e}")
+
+
+def load_pdf_info(pdf_path: str) -> Optional[PdfInfo]:
+    """读取 PDF 旁的元数据记录；记录缺失、损坏或与文件大小不符时返回 None"""
+    try:
+        with open(info_path(pdf_path), "r", encoding="utf-8") as f:
+            info = PdfInfo.from_dict(json.load(f))
+        if info.size != os.path.getsize(pdf_path):
+            return None
+        return info
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def linearize_pdf(
+    pdf_path: str,
+    pages: int,
+    task_id: Optional[str] = None,
+    timeout: Optional[float] = None,
+) -> bool:
+    """
+    用 qpdf 把 PDF 重写为线性化（快速 Web 查看）格式：第一页所需的对象与交叉引用集中在文件开头，
+    浏览器的 PDF 查看器通过 Range 请求取到开头一小段即可显示第一页。
+    页数少于 PDF_LINEARIZE_MIN_PAGES、未安装 qpdf 或重写失败时保留原文件；返回是否已线性化。
+    """
+    from app.core.config import settings
+    from app.core.processes import run_process
+
+    min_pages = settings.PDF_LINEARIZE_MIN_PAGES
+    qpdf = shutil.which("qpdf")
+    if min_pages <= 0 or pages < min_pages or qpdf is None:
+        return False
+    tmp = f"{pdf_path}.linearized"
+    try:
+        proc = run_process([qpdf, "--linearize", pdf_path, tmp], task_id, timeout)
+        # qpdf 退出码 3 表示修复了轻微问题并给出警告，输出仍然可用
+        if proc.returncode not in (0, 3) or not os.path.exists(tmp):
+            print(
+                f"[PDF] 线性化失败 (退出码 {proc.returncode}): {(proc.stderr or '').strip()[-200:]}"
+            )
+            return False
+        os.replace(tmp, pdf_path)
+        return True
+    except OSError as e:
+        print(f"[PDF] 线性化失败: {e}")
+        return False
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def append_blank_page(pdf_path: str) -> int:
+    """
+    以增量更新的方式在末尾追加一张与最后一页同尺寸的空白页，返回追加后的页数。
+    只在文件末尾写入新页面对象、改写后的页面树根节点与新的交叉引用表，
+    原有内容保持不变，耗时与文档大小无关。写入失败时截断回原长度。
+    """
+    with open(pdf_path, "r+b") as f:
+        pdf = _PdfFile(f)
+        pages_num, root = pdf.pages_root()
+        _, pages_gen = pdf.locate(pages_num)
+        width, height = pdf.page_box(root)
+        page_num = int(pdf.trailer[b"Size"])
+        count = int(root[b"Count"]) + 1
+
+        kids = pdf.resolve(root[b"Kids"]).strip()
+        if _ref(root[b"Kids"]) is not None or not kids.endswith(b"]"):
+            raise UnsupportedPdf("Kids 为间接对象")
+        root[b"Kids"] = kids[:-1].rstrip() + b" %d 0 R]" % page_num
+        root[b"Count"] = b"%d" % count
+
+        f.seek(pdf.size - 1)
+        body = b"" if f.read(1) in (b"\n", b"\r") else b"\n"
+        offsets = {}
+        offsets[page_num] = (pdf.size + len(body), 0)
+        body += (
+            b"%d 0 obj\n<< /Type /Page /Parent %d %d R /MediaBox [0 0 %s %s] "
+            b"/Resources << >> >>\nendobj\n"
+            % (page_num, pages_num, pages_gen, b"%g" % width, b"%g" % height)
+        )
+        offsets[pages_num] = (pdf.size + len(body), pages_gen)
+        body += b"%d %d obj\n%s\nendobj\n" % (pages_num, pages_gen, _format_dict(root))
+
+        xref_offset = pdf.size + len(body)
+        # 以对象 0 的空闲记录开头，部分阅读器要求每个交叉引用表从 0 开始
+        body += b"xref\n0 1\n0000000000 65535 f\r\n"
+        for num in sorted(offsets):
+            offset, gen = offsets[num]
+            body += b"%d 1\n%010d %05d n\r\n" % (num, offset, gen)
+        trailer = {
+            b"Size": b"%d" % (page_num + 1),
+            b"Root": pdf.trailer[b"Root"],
+            b"Prev": b"%d" % pdf.startxref,
+        }
+        for key in (b"Info", b"ID"):
+            if key in pdf.trailer:
+                trailer[key] = pdf.trailer[key]
+        body += b"trailer\n%s\nstartxref\n%d\n%%%%EOF\n" % (
+            _format_dict(trailer),
+            xref_offset,
+        )
+        try:
+            f.seek(pdf.size)
+            f.write(body)
+        except Exception:
+            f.truncate(pdf.size)
+            raise
+    return count
+
+
+def _pad_by_rewrite(pdf_path: str):
+    """用 pypdf 读取全部页面并重写整个文件，增量更新不适用时使用"""
+    from pypdf import PdfReader, PdfWriter
+
+    reader = PdfReader(pdf_path)
+    writer = PdfWriter()
+    for page in reader.pages:
+        writer.add_page(page)
+    last_page = reader.pages[-1]
+    writer.add_blank_page(
+        width=float(last_page.mediabox.width),
+        height=float(last_page.mediabox.height),
+    )
+    temp_output = pdf_path.replace(".pdf", "_temp.pdf")
+    with open(temp_output, "wb") as f:
+        writer.write(f)
+    shutil.move(temp_output, pdf_path)
+
+
+def pad_to_even_pages(pdf_path: str, pages: Optional[int] = None) -> int:
+    """
+    页数为奇数时在末尾追加一张与最后一页同尺寸的空白页，便于双面打印。
+    pages 为调用方已知的页数，传入时不再读取文件判断；返回补齐后的页数。
+    """
+    if pages is None:
+        pages = count_pages(pdf_path)
+    if pages % 2 == 0:
+        return pages
+    try:
+        try:
+            return append_blank_page(pdf_path)
+        except (UnsupportedPdf, ValueError, KeyError) as e:
+            print(f"[PDF] 无法增量追加空白页，改为重写文件: {e}")
+            _pad_by_rewrite(pdf_path)
+            return pages + 1
+    except Exception as e:
+        print(f"添加空白页时出错: {e}")
+        return pages
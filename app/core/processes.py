@@ -0,0 +1,246 @@
+import asyncio
+import os
+import shutil
+import signal
+import subprocess
+import threading
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+
+LIMIT_MEMORY = "memory"
+LIMIT_CPU = "cpu"
+# 资源看门狗的采样间隔（秒）
+WATCHDOG_INTERVAL = 0.5
+# 进程因资源耗尽退出时 stderr 中常见的关键字（触及地址空间上限）
+OOM_MARKERS = ("bad_alloc", "cannot allocate memory", "out of memory", "memoryerror")
+
+
+def kill_process_group(pid: int):
+    """结束以 pid 为组长的整个进程组（含 LibreOffice 派生的 soffice.bin）"""
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    except Exception as e:
+        print(f"[Process] 结束进程组 {pid} 失败: {e}")
+
+
+@lru_cache(maxsize=None)
+def _tool(name: str) -> Optional[str]:
+    return shutil.which(name)
+
+
+def sandbox_command(cmd: List[str], cpu_limit: bool = True) -> List[str]:
+    """
+    为外部转换命令加上资源限制前缀：prlimit 设置地址空间与 CPU 时间上限，
+    nice / ionice 降低其 CPU 与磁盘调度优先级，保证 Web 进程在转换负载下仍能及时响应。
+    上限在 exec 前设置并由 soffice 派生的子进程继承，不使用 preexec_fn（多线程下不安全）。
+    常驻进程的 CPU 时间会跨多次转换累计，应传 cpu_limit=False，由资源看门狗按单次转换计算。
+    未安装对应工具时跳过该项。
+    """
+    prefix = []
+    limits = []
+    if settings.CONVERSION_MEMORY_LIMIT_MB > 0:
+        # Linux 不执行 RLIMIT_RSS，常驻内存由看门狗检查，地址空间上限作为失控分配的兜底
+        limits.append(f"--as={settings.CONVERSION_MEMORY_LIMIT_MB * 2 * 1024 * 1024}")
+    if cpu_limit and settings.CONVERSION_CPU_SECONDS > 0:
+        # 软上限发送 SIGXCPU，留出几秒后由硬上限强制结束
+        cpu = settings.CONVERSION_CPU_SECONDS
+        limits.append(f"--cpu={cpu}:{cpu + 5}")
+    if limits and _tool("prlimit"):
+        prefix += [_tool("prlimit"), *limits, "--"]
+    if settings.CONVERSION_NICE > 0 and _tool("nice"):
+        prefix += [_tool("nice"), "-n", str(settings.CONVERSION_NICE)]
+    if settings.CONVERSION_IONICE_CLASS > 0 and _tool("ionice"):
+        prefix += [_tool("ionice"), "-c", str(settings.CONVERSION_IONICE_CLASS)]
+        if settings.CONVERSION_IONICE_CLASS == 2:
+            # best-effort 类中的最低优先级
+            prefix += ["-n", "7"]
+    return prefix + cmd
+
+
+class ResourceWatchdog:
+    """
+    在后台线程中定期统计进程组（组长及其全部子孙进程）的常驻内存和
+    自启动看门狗以来消耗的 CPU 时间，超出上限时结束整个进程组并记录原因。
+    """
+
+    def __init__(
+        self,
+        pid: int,
+        memory_mb: Optional[int] = None,
+        cpu_seconds: Optional[int] = None,
+    ):
+        self.pid = pid
+        self.memory_mb = (
+            settings.CONVERSION_MEMORY_LIMIT_MB if memory_mb is None else memory_mb
+        )
+        self.cpu_seconds = (
+            settings.CONVERSION_CPU_SECONDS if cpu_seconds is None else cpu_seconds
+        )
+        # 超限时为 (LIMIT_MEMORY / LIMIT_CPU, 说明)
+        self.breach: Optional[Tuple[str, str]] = None
+        self._stop = threading.Event()
+        self._cpu_base: Optional[float] = None
+
+    def _sample(self) -> Tuple[int, float]:
+        import psutil
+
+        root = psutil.Process(self.pid)
+        rss, cpu = 0, 0.0
+        for proc in [root, *root.children(recursive=True)]:
+            try:
+                rss += proc.memory_info().rss
+                times = proc.cpu_times()
+                cpu += times.user + times.system
+            except psutil.Error:
+                pass
+        return rss, cpu
+
+    def _check(self) -> bool:
+        """采样一次，超限时结束进程组；返回是否继续监视"""
+        try:
+            rss, cpu = self._sample()
+        except Exception:
+            # 进程已退出
+            return False
+        if self._cpu_base is None:
+            self._cpu_base = cpu
+        rss_mb = rss // (1024 * 1024)
+        if self.memory_mb > 0 and rss_mb > self.memory_mb:
+            self.breach = (
+                LIMIT_MEMORY,
+                f"转换进程内存超出上限 ({rss_mb}MB > {self.memory_mb}MB)",
+            )
+        elif self.cpu_seconds > 0 and cpu - self._cpu_base > self.cpu_seconds:
+            self.breach = (
+                LIMIT_CPU,
+                f"转换进程 CPU 时间超出上限 ({self.cpu_seconds}s)",
+            )
+        else:
+            return True
+        kill_process_group(self.pid)
+        return False
+
+    def _run(self):
+        while self._check() and not self._stop.wait(WATCHDOG_INTERVAL):
+            pass
+
+    def start(self) -> "ResourceWatchdog":
+        if self.memory_mb > 0 or self.cpu_seconds > 0:
+            threading.Thread(
+                target=self._run, name=f"watchdog-{self.pid}", daemon=True
+            ).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+def classify_limit_exit(
+    returncode: Optional[int], stderr: str
+) -> Optional[Tuple[str, str]]:
+    """根据退出状态判断进程是否因触及 rlimit 硬上限而退出，返回 (超限类型, 说明)"""
+    if returncode in (-signal.SIGXCPU, 128 + signal.SIGXCPU):
+        return (
+            LIMIT_CPU,
+            f"转换进程 CPU 时间超出上限 ({settings.CONVERSION_CPU_SECONDS}s)",
+        )
+    if returncode and any(m in stderr.lower() for m in OOM_MARKERS):
+        return LIMIT_MEMORY, "转换进程内存超出上限（内存分配失败）"
+    return None
+
+
+def report_limit_breach(program: str, task_id: Optional[str], limit: str, reason: str):
+    """记录资源超限：指标计数，并标记到任务上，任务失败时以 limit_exceeded 状态入库"""
+    from app.core.task_manager import global_task_manager
+
+    metrics.process_limit_total.inc(program=program, limit=limit)
+    print(f"[Process] {program} {reason}" + (f" (任务 {task_id})" if task_id else ""))
+    if task_id:
+        global_task_manager.record_limit_breach(task_id, reason)
+
+
+def _record_exit(cmd: List[str], returncode: Optional[int]):
+    metrics.process_exit_total.inc(
+        program=os.path.basename(cmd[0]), code=str(returncode)
+    )
+
+
+def run_process(
+    cmd: List[str], task_id: Optional[str] = None, timeout: Optional[float] = None
+) -> subprocess.CompletedProcess:
+    """
+    在独立进程组中以受限资源同步执行命令（供工作线程使用）。
+    登记到任务后，取消或超时会结束整个进程组；超时返回 returncode=-9。
+    超出内存或 CPU 上限时同样结束进程组，原因追加到 stderr 并标记到任务上。
+    """
+    from app.core.task_manager import global_task_manager
+
+    proc = subprocess.Popen(
+        sandbox_command(cmd),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        start_new_session=True,
+    )
+    if task_id:
+        global_task_manager.attach_process(task_id, proc.pid)
+    watchdog = ResourceWatchdog(proc.pid).start()
+    try:
+        stdout, stderr = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        kill_process_group(proc.pid)
+        stdout, stderr = proc.communicate()
+        stderr = f"{stderr}\nProcess timed out after {timeout}s"
+    finally:
+        watchdog.stop()
+        if task_id:
+            global_task_manager.detach_process(task_id, proc.pid)
+    _record_exit(cmd, proc.returncode)
+    breach = watchdog.breach or classify_limit_exit(proc.returncode, stderr or "")
+    if breach:
+        report_limit_breach(os.path.basename(cmd[0]), task_id, *breach)
+        stderr = f"{stderr}\n{breach[1]}"
+    return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+
+async def run_process_async(
+    cmd: List[str], task_id: Optional[str] = None, timeout: Optional[float] = None
+) -> Tuple[int, bytes, bytes]:
+    """在独立进程组中以受限资源异步执行命令，返回 (退出码, stdout, stderr)"""
+    from app.core.task_manager import global_task_manager
+
+    proc = await asyncio.create_subprocess_exec(
+        *sandbox_command(cmd),
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        start_new_session=True,
+    )
+    if task_id:
+        global_task_manager.attach_process(task_id, proc.pid)
+    watchdog = ResourceWatchdog(proc.pid).start()
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+    except asyncio.TimeoutError:
+        kill_process_group(proc.pid)
+        stdout, stderr = await proc.communicate()
+        stderr += f"\nProcess timed out after {timeout}s".encode()
+    except asyncio.CancelledError:
+        kill_process_group(proc.pid)
+        raise
+    finally:
+        watchdog.stop()
+        if task_id:
+            global_task_manager.detach_process(task_id, proc.pid)
+    _record_exit(cmd, proc.returncode)
+    breach = watchdog.breach or classify_limit_exit(
+        proc.returncode, stderr.decode(errors="replace")
+    )
+    if breach:
+        report_limit_breach(os.path.basename(cmd[0]), task_id, *breach)
+        stderr += f"\n{breach[1]}".encode()
+    return proc.returncode, stdout, stderr
@@ -1,13 +1,54 @@
 import asyncio
+import heapq
+import itertools
+import math
+import threading
 import uuid
+from collections import deque
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
 from dataclasses import dataclass, field
 
-# 数据库相关
-from sqlalchemy import insert
-from app.core import database
-from app.models.models import TaskHistory
+from app.core import metrics
+from app.core.history_writer import global_history_writer
+
+# 调度优先级：数值越小越先执行
+PRIORITY_ADMIN = 0
+PRIORITY_GUEST = 1
+
+# 资源消耗类别及其占用的并发预算权重
+COST_HEAVY = "heavy"  # CPU 密集的外部进程，如 LibreOffice
+COST_IO = "io"  # 以磁盘 I/O 为主，如压缩包解压/打包
+COST_LIGHT = "light"  # 进程内的轻量 Python 渲染
+COST_WEIGHTS = {COST_HEAVY: 4, COST_IO: 2, COST_LIGHT: 1}
+
+# 被后来的轻量任务插队超过该次数后，队首任务不再允许被插队，防止饿死
+MAX_BYPASS = 8
+
+# 没有历史数据时各资源类别的预估执行时长（秒）
+DEFAULT_DURATIONS = {COST_HEAVY: 20.0, COST_IO: 10.0, COST_LIGHT: 2.0}
+# 每个模块保留的最近执行耗时样本数
+DURATION_SAMPLES = 100
+
+# 子进程超出内存/CPU 上限而失败的任务状态，与 failed / timeout / cancelled 区分记录
+STATUS_LIMIT_EXCEEDED = "limit_exceeded"
+
+# 设置项键名：普通任务允许的最长预计等待（秒），0 表示不限制
+SETTING_MAX_WAIT = "task_max_wait_seconds"
+
+
+def format_eta(seconds: float) -> str:
+    if seconds < 60:
+        return f"约 {max(1, int(seconds))} 秒"
+    return f"约 {math.ceil(seconds / 60)} 分钟"
+
+
+class QueueFullError(Exception):
+    """预计等待时间超过管理员设置的上限，新的普通任务被拒绝"""
+
+    def __init__(self, eta: float):
+        self.eta = eta
+        super().__init__(f"当前排队任务较多（预计等待{format_eta(eta)}），请稍后再试")
 
 
 @dataclass
@@ -15,13 +56,22 @@ class Task:
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
     name: str = "Unknown Task"
     user_type: str = "guest"  # guest or admin
-    status: str = "waiting"  # waiting, processing, completed, failed
+    status: str = (
+        "waiting"  # waiting, processing, completed, failed, timeout, cancelled
+    )
     created_at: datetime = field(default_factory=datetime.utcnow)
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
     filename: Optional[str] = None
     ip: str = "Unknown"
     error_message: Optional[str] = None
+    cost_class: str = COST_LIGHT
+    weight: int = 1
+    timeout: Optional[float] = None  # 开始执行后的最长时限（秒）
+    client_id: Optional[str] = None  # 公平调度的归属客户端（浏览器 ID）
+    seq: int = field(default=0, repr=False)
+    vstart: float = field(default=0.0, repr=False)  # 公平队列的虚拟开始时间
+    bypassed: int = field(default=0, repr=False)
 
     def to_dict(self):
         return {
@@ -35,69 +85,380 @@ class Task:
             "filename": self.filename,
             "ip": self.ip,
             "error_message": self.error_message,
+            "cost_class": self.cost_class,
+            "weight": self.weight,
         }
 
 
+# 任务事件类型
+EVENT_QUEUED = "queued"  # 入队/订阅时的初始排队位置
+EVENT_POSITION = "position"  # 排队位置发生变化
+EVENT_STARTED = "started"
+EVENT_PROGRESS = "progress"
+EVENT_FINISHED = "finished"
+
+
+@dataclass
+class TaskEvent:
+    task_id: str
+    type: str
+    position: Optional[int] = None
+    current: int = 0
+    total: int = 0
+    message: Optional[str] = None
+    status: Optional[str] = None
+    eta: Optional[float] = None  # 预计还需等待的秒数
+
+
 class TaskManager:
-    def __init__(self, max_concurrent_tasks: int = 2):
-        self.max_concurrent_tasks = max_concurrent_tasks
-        self.queue: List[Task] = []
+    """
+    全局任务调度器。
+    等待中的任务按 (优先级, 入队序号) 存放在堆中，每个任务持有独立的唤醒 Future，
+    名额释放时只唤醒真正可以开始的任务，避免 notify_all 带来的惊群与 O(n) 扫描。
+
+    准入按权重预算进行：每个任务占用其资源类别的权重，运行中任务的权重之和不超过
+    capacity。队首任务放不下时，后方更轻的任务可以先行（有次数上限）。
+
+    同一优先级内按客户端做加权公平排队（start-time fair queuing）：每个任务的虚拟
+    开始时间为 max(当前虚拟时间, 该客户端上一任务的虚拟结束时间)，虚拟结束时间再加上
+    任务权重。提交大量子任务的客户端只会推后自己的任务，其他客户端的新任务仍可尽快开始。
+    """
+
+    def __init__(self, capacity: int = 2, history_writer=None):
+        self.capacity = capacity
+        self._history_writer = history_writer
+        self.used_capacity = 0
         self.active_tasks: Dict[str, Task] = {}
+        # 已入队但尚未开始的任务（按 ID 索引）
+        self._waiting: Dict[str, Task] = {}
+        # 每个资源类别一个就绪堆: (优先级, 虚拟开始时间, 入队序号, 任务ID)，出队时惰性跳过失效条目
+        self._ready: Dict[str, List[Tuple[int, float, int, str]]] = {}
+        self._waiters: Dict[str, asyncio.Future] = {}
+        self._seq = itertools.count()
+        # 公平排队状态：全局虚拟时间与各客户端最后一个任务的虚拟结束时间
+        self._vtime = 0.0
+        self._client_finish: Dict[str, float] = {}
         self._lock = asyncio.Lock()
-        self._condition = asyncio.Condition()
+        # 任务事件订阅者，仅在有订阅者时才计算和推送事件
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self._last_positions: Dict[str, int] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # 执行时限计时器，以及任务登记的子进程组（可能由工作线程写入）
+        self._deadlines: Dict[str, asyncio.TimerHandle] = {}
+        self._processes: Dict[str, Set[int]] = {}
+        # 子进程超出资源上限的任务及原因，任务以失败结束时改记为 STATUS_LIMIT_EXCEEDED
+        self._limit_breaches: Dict[str, str] = {}
+        self._process_lock = threading.Lock()
+        # 各模块最近的执行耗时，按 (任务名, 资源类别) 分别记录，
+        # 同名任务的不同阶段（如压缩包的解压与转换）互不干扰；用于估算排队等待时间与并发自动调节
+        self.durations: Dict[Tuple[str, str], Deque[float]] = {}
+        # 各模块累计记录的耗时样本数（durations 达到上限后长度不再变化，用于判断是否有新样本）
+        self.duration_counts: Dict[Tuple[str, str], int] = {}
+        # 普通任务允许的最长预计等待（秒），0 表示不限制
+        self.max_wait_seconds = 0
+
+    @staticmethod
+    def _priority(task: Task) -> int:
+        return PRIORITY_ADMIN if task.user_type == "admin" else PRIORITY_GUEST
+
+    def _sort_key(self, task: Task) -> Tuple[int, float, int]:
+        return (self._priority(task), task.vstart, task.seq)
+
+    @property
+    def queue(self) -> List[Task]:
+        """等待中的任务，按调度顺序排列（管理员优先，普通任务按客户端公平轮转）"""
+        return sorted(self._waiting.values(), key=self._sort_key)
+
+    def next_waiting(self) -> Optional[Task]:
+        """按调度顺序排在最前的等待任务"""
+        return min(self._waiting.values(), key=self._sort_key, default=None)
+
+    def get_position(self, task_id: str) -> Optional[int]:
+        """返回任务前方等待的任务数，任务不在队列中时返回 None"""
+        task = self._waiting.get(task_id)
+        if task is None:
+            return None
+        key = self._sort_key(task)
+        return sum(1 for t in self._waiting.values() if self._sort_key(t) < key)
 
     async def add_task(
-        self, name: str, user_type: str, ip: str, filename: Optional[str] = None
+        self,
+        name: str,
+        user_type: str,
+        ip: str,
+        filename: Optional[str] = None,
+        cost_class: str = COST_LIGHT,
+        weight: Optional[int] = None,
+        timeout: Optional[float] = None,
+        client_id: Optional[str] = None,
+        check_backlog: bool = True,
     ) -> Task:
-        task = Task(name=name, user_type=user_type, ip=ip, filename=filename)
+        """
+        登记新任务。
+        普通任务的预计等待超过 max_wait_seconds 时抛出 QueueFullError；
+        已被接受的工作拆分出的子任务应传入 check_backlog=False。
+        """
+        if weight is None:
+            weight = COST_WEIGHTS.get(cost_class, 1)
+        task = Task(
+            name=name,
+            user_type=user_type,
+            ip=ip,
+            filename=filename,
+            cost_class=cost_class,
+            weight=max(1, weight),
+            timeout=timeout,
+            client_id=client_id or ip,
+        )
+        task.seq = next(self._seq)
+        task.vstart = max(self._vtime, self._client_finish.get(task.client_id, 0.0))
+        if (
+            check_backlog
+            and self.max_wait_seconds
+            and self._priority(task) != PRIORITY_ADMIN
+        ):
+            eta = self._projected_wait(task)
+            if eta > self.max_wait_seconds:
+                print(f"[Queue] 拒绝新任务: 预计等待 {int(eta)}s 超过上限")
+                raise QueueFullError(eta)
+        self._client_finish[task.client_id] = task.vstart + task.weight
+        self._loop = asyncio.get_running_loop()
         async with self._lock:
-            self.queue.append(task)
+            self._waiting[task.id] = task
             print(f"[Queue] 任务已添加: {task.id}")
-        
-        # 唤醒正在等待 start_task 的协程
-        async with self._condition:
-            self._condition.notify_all()
+        if self._priority(task) == PRIORITY_ADMIN:
+            # 管理员任务插入队列前部，后方任务的位置随之变化
+            self._publish_positions()
         return task
 
+    def expected_duration(self, task: Task) -> float:
+        """按模块最近的执行耗时预估任务时长，没有样本时按资源类别取默认值"""
+        samples = self.durations.get((task.name, task.cost_class))
+        if samples:
+            return sum(samples) / len(samples)
+        return DEFAULT_DURATIONS.get(task.cost_class, 10.0)
+
+    def _record_duration(self, key: Tuple[str, str], elapsed: float):
+        self.durations.setdefault(key, deque(maxlen=DURATION_SAMPLES)).append(elapsed)
+        self.duration_counts[key] = self.duration_counts.get(key, 0) + 1
+
+    def _active_work(self) -> float:
+        """执行中任务的剩余工作量（预估秒数 × 权重）"""
+        now = datetime.utcnow()
+        work = 0.0
+        for t in self.active_tasks.values():
+            elapsed = (now - t.started_at).total_seconds()
+            work += max(self.expected_duration(t) - elapsed, 0) * t.weight
+        return work
+
+    def _queue_etas(self) -> List[Tuple[Task, float]]:
+        """按调度顺序返回等待任务及其预计等待秒数（前方工作量 / 并发预算）"""
+        capacity = max(self.capacity, 1)
+        work = self._active_work()
+        etas = []
+        for t in self.queue:
+            etas.append((t, work / capacity))
+            work += self.expected_duration(t) * t.weight
+        return etas
+
+    def _projected_wait(self, task: Task) -> float:
+        key = self._sort_key(task)
+        work = self._active_work() + sum(
+            self.expected_duration(t) * t.weight
+            for t in self._waiting.values()
+            if self._sort_key(t) < key
+        )
+        return work / max(self.capacity, 1)
+
+    def estimate_wait(self, task_id: str) -> Optional[float]:
+        """返回等待中任务的预计等待秒数，任务不在队列中时返回 None"""
+        task = self._waiting.get(task_id)
+        if task is None:
+            return None
+        return self._projected_wait(task)
+
+    def _publish(self, task_id: str, event: TaskEvent):
+        for q in self._subscribers.get(task_id, ()):
+            q.put_nowait(event)
+
+    def _publish_positions(self):
+        """向订阅了排队位置的等待任务推送位置变化"""
+        watched = [tid for tid in self._subscribers if tid in self._waiting]
+        if not watched:
+            return
+        order = {t.id: (i, eta) for i, (t, eta) in enumerate(self._queue_etas())}
+        for task_id in watched:
+            position, eta = order[task_id]
+            if self._last_positions.get(task_id) != position:
+                self._last_positions[task_id] = position
+                self._publish(
+                    task_id,
+                    TaskEvent(task_id, EVENT_POSITION, position=position, eta=eta),
+                )
+
+    async def events(self, task_id: str) -> AsyncIterator[TaskEvent]:
+        """
+        订阅单个任务的事件流，首个事件反映当前状态，收到 finished 事件后结束。
+        """
+        q: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(task_id, []).append(q)
+        try:
+            if task_id in self.active_tasks:
+                yield TaskEvent(task_id, EVENT_STARTED)
+            elif task_id in self._waiting:
+                position = self.get_position(task_id)
+                self._last_positions[task_id] = position
+                yield TaskEvent(
+                    task_id,
+                    EVENT_QUEUED,
+                    position=position,
+                    eta=self.estimate_wait(task_id),
+                )
+            else:
+                yield TaskEvent(task_id, EVENT_FINISHED)
+                return
+
+            while True:
+                event = await q.get()
+                yield event
+                if event.type == EVENT_FINISHED:
+                    return
+        finally:
+            subscribers = self._subscribers.get(task_id, [])
+            if q in subscribers:
+                subscribers.remove(q)
+            if not subscribers:
+                self._subscribers.pop(task_id, None)
+                self._last_positions.pop(task_id, None)
+
+    def report_progress(
+        self,
+        task_id: str,
+        current: int,
+        total: int,
+        message: Optional[str] = None,
+    ):
+        """上报任务进度，可在工作线程中调用"""
+        event = TaskEvent(
+            task_id, EVENT_PROGRESS, current=current, total=total, message=message
+        )
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is not None and running is self._loop:
+            self._publish(task_id, event)
+        elif self._loop is not None:
+            self._loop.call_soon_threadsafe(self._publish, task_id, event)
+
+    def _activate(self, task: Task):
+        self._waiting.pop(task.id, None)
+        task.status = "processing"
+        task.started_at = datetime.utcnow()
+        metrics.task_wait_seconds.observe(
+            (task.started_at - task.created_at).total_seconds(), module=task.name
+        )
+        self.active_tasks[task.id] = task
+        self.used_capacity += task.weight
+        if task.vstart > self._vtime:
+            self._vtime = task.vstart
+            if len(self._client_finish) > 1024:
+                # 虚拟结束时间已落后于虚拟时间的客户端不再影响排序，可以丢弃
+                self._client_finish = {
+                    c: f for c, f in self._client_finish.items() if f > self._vtime
+                }
+        if task.timeout:
+            self._deadlines[task.id] = asyncio.get_running_loop().call_later(
+                task.timeout, self._expire, task.id
+            )
+        self._last_positions.pop(task.id, None)
+        self._publish(task.id, TaskEvent(task.id, EVENT_STARTED))
+
+    def _fits(self, task: Task) -> bool:
+        # 权重超过总预算的任务在完全空闲时独占执行
+        return (
+            self.used_capacity == 0 or self.used_capacity + task.weight <= self.capacity
+        )
+
+    def _peek(self, lane: List[Tuple[int, float, int, str]]) -> Optional[Task]:
+        while lane:
+            task_id = lane[0][-1]
+            waiter = self._waiters.get(task_id)
+            if waiter is not None and not waiter.done() and task_id in self._waiting:
+                return self._waiting[task_id]
+            heapq.heappop(lane)
+        return None
+
+    def _dispatch(self):
+        """在权重预算允许的范围内，按优先级依次唤醒就绪任务"""
+        if self._admit_ready():
+            self._publish_positions()
+
+    def _admit_ready(self) -> bool:
+        admitted = False
+        while True:
+            heads = []
+            for cost_class, lane in list(self._ready.items()):
+                head = self._peek(lane)
+                if head is None:
+                    del self._ready[cost_class]
+                else:
+                    heads.append(head)
+            if not heads:
+                return admitted
+
+            heads.sort(key=self._sort_key)
+            first = heads[0]
+            if self._fits(first):
+                chosen = first
+            elif first.bypassed < MAX_BYPASS:
+                chosen = next((t for t in heads[1:] if self._fits(t)), None)
+                if chosen is not None:
+                    first.bypassed += 1
+            else:
+                chosen = None
+            if chosen is None:
+                return admitted
+
+            heapq.heappop(self._ready[chosen.cost_class])
+            waiter = self._waiters.pop(chosen.id)
+            self._activate(chosen)
+            print(f"[Queue] 普通任务开始执行: {chosen.id} (权重 {chosen.weight})")
+            waiter.set_result(chosen)
+            admitted = True
+
     async def start_task(self, task_id: str):
         """
         请求开始执行任务。
         管理员任务 (admin) 将跳过限制立即执行。
         普通任务 (guest) 需等待队列顺序和并发限制。
+        任务不存在或在等待期间被取消时返回 None。
         """
-        async with self._condition:
-            while True:
-                async with self._lock:
-                    # 获取当前任务对象
-                    task = next((t for t in self.queue if t.id == task_id), None)
-                    
-                    if task:
-                        index = self.queue.index(task)
-                        # 如果是管理员任务，立即执行
-                        if task.user_type == "admin":
-                            self.queue.pop(index)
-                            task.status = "processing"
-                            task.started_at = datetime.utcnow()
-                            self.active_tasks[task.id] = task
-                            print(f"[Queue] 管理员任务立即开始: {task.id}")
-                            return task
-                        
-                        # 如果是普通任务，检查并发限制和队列顺序
-                        if len(self.active_tasks) < self.max_concurrent_tasks:
-                            # 仅当处于队列首位（或前方全是管理员任务已被处理）时执行
-                            if index == 0:
-                                self.queue.pop(index)
-                                task.status = "processing"
-                                task.started_at = datetime.utcnow()
-                                self.active_tasks[task.id] = task
-                                print(f"[Queue] 普通任务开始执行: {task.id}")
-                                return task
-                    elif task_id in self.active_tasks:
-                        # 任务已经在执行中
-                        return self.active_tasks[task_id]
-                
-                # 等待通知
-                await self._condition.wait()
+        if task_id in self.active_tasks:
+            return self.active_tasks[task_id]
+
+        task = self._waiting.get(task_id)
+        if task is None:
+            return None
+
+        if task.user_type == "admin":
+            self._activate(task)
+            print(f"[Queue] 管理员任务立即开始: {task.id}")
+            self._publish_positions()
+            return task
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[task_id] = waiter
+        heapq.heappush(
+            self._ready.setdefault(task.cost_class, []),
+            (*self._sort_key(task), task_id),
+        )
+        self._dispatch()
+        try:
+            return await waiter
+        finally:
+            # 调用方被取消时移除唤醒句柄，堆中的条目会在出队时被跳过
+            self._waiters.pop(task_id, None)
 
     async def complete_task(
         self,
@@ -105,48 +466,186 @@ class TaskManager:
         status: str = "completed",
         error_message: Optional[str] = None,
     ):
-        async with self._lock:
+        self._finish(task_id, status, error_message)
+
+    def _finish(self, task_id: str, status: str, error_message: Optional[str]):
+        with self._process_lock:
+            breach = self._limit_breaches.pop(task_id, None)
+        if breach and status == "failed":
+            status = STATUS_LIMIT_EXCEEDED
+            error_message = f"{breach}; {error_message}" if error_message else breach
+        if task_id in self._waiting:
+            # 任务尚未开始即结束（如客户端断开或被取消），直接移出队列，
+            # 等待中的 start_task 返回 None
+            task = self._waiting.pop(task_id)
+            task.status = status
+            task.error_message = error_message
+            waiter = self._waiters.pop(task_id, None)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(None)
+            metrics.tasks_finished_total.inc(module=task.name, status=status)
+            self._publish(task_id, TaskEvent(task_id, EVENT_FINISHED, status=status))
+            self._publish_positions()
+            return
+
+        task = self.active_tasks.pop(task_id, None)
+        if task is None:
+            return
+
+        deadline = self._deadlines.pop(task_id, None)
+        if deadline is not None:
+            deadline.cancel()
+        # 工作线程未能注销的子进程（如实例被看门狗结束）不再属于任何执行中的任务
+        with self._process_lock:
+            self._processes.pop(task_id, None)
+        self.used_capacity -= task.weight
+        task.status = status
+        task.completed_at = datetime.utcnow()
+        task.error_message = error_message
+        self._publish(task_id, TaskEvent(task_id, EVENT_FINISHED, status=status))
+        metrics.tasks_finished_total.inc(module=task.name, status=status)
+        metrics.task_service_seconds.observe(
+            (task.completed_at - task.started_at).total_seconds(),
+            module=task.name,
+            status=status,
+        )
+        if task.started_at and status == "completed":
+            elapsed = (task.completed_at - task.started_at).total_seconds()
+            self._record_duration((task.name, task.cost_class), elapsed)
+        # 名额已释放，立即唤醒下一个可执行的任务
+        self._dispatch()
+
+        if self._history_writer is not None:
+            # 历史记录交给后写缓冲批量落库，不在调度路径上等待数据库
+            self._history_writer.submit(self._history_record(task))
+
+    def attach_process(self, task_id: str, pid: int):
+        """登记任务启动的子进程（其自身为进程组组长），可在工作线程中调用"""
+        with self._process_lock:
+            self._processes.setdefault(task_id, set()).add(pid)
+
+    def detach_process(self, task_id: str, pid: int):
+        with self._process_lock:
+            pids = self._processes.get(task_id)
+            if pids is not None:
+                pids.discard(pid)
+                if not pids:
+                    del self._processes[task_id]
+
+    def record_limit_breach(self, task_id: str, reason: str):
+        """登记任务的子进程超出资源上限，可在工作线程中调用"""
+        with self._process_lock:
             if task_id in self.active_tasks:
-                task = self.active_tasks.pop(task_id)
-                task.status = status
-                task.completed_at = datetime.utcnow()
-                task.error_message = error_message
-
-                try:
-                    async with database.AsyncSessionLocal() as session:
-                        duration = 0
-                        if task.completed_at and task.started_at:
-                            duration = int(
-                                (task.completed_at - task.started_at).total_seconds()
-                            )
-
-                        stmt = insert(TaskHistory).values(
-                            task_id=task.id,
-                            task_name=task.name,
-                            user_type=task.user_type,
-                            ip_address=task.ip,
-                            filename=task.filename,
-                            status=task.status,
-                            created_at=task.created_at,
-                            started_at=task.started_at,
-                            completed_at=task.completed_at,
-                            duration=duration,
-                        )
-                        await session.execute(stmt)
-                        await session.commit()
-                except Exception as e:
-                    print(f"[Queue] Failed history save: {e}")
-
-        async with self._condition:
-            self._condition.notify_all()
+                self._limit_breaches[task_id] = reason
+
+    def is_cancelled(self, task_id: str) -> bool:
+        """任务已被取消或超时（不再处于等待或执行中）"""
+        return task_id not in self.active_tasks and task_id not in self._waiting
+
+    def cancel_task(
+        self, task_id: str, status: str = "cancelled", reason: Optional[str] = None
+    ) -> bool:
+        """
+        取消任务：结束其登记的全部子进程组并立即释放名额。
+        仍在运行的工作协程随后调用 complete_task 时不会重复记录。
+        """
+        if task_id not in self.active_tasks and task_id not in self._waiting:
+            return False
+
+        from app.core.processes import kill_process_group
+
+        with self._process_lock:
+            pids = list(self._processes.pop(task_id, ()))
+        for pid in pids:
+            kill_process_group(pid)
+        print(f"[Queue] 任务已终止: {task_id} ({status}) {reason or ''}")
+        self._finish(task_id, status, reason)
+        return True
+
+    def _expire(self, task_id: str):
+        self._deadlines.pop(task_id, None)
+        task = self.active_tasks.get(task_id)
+        if task is not None:
+            self.cancel_task(task_id, "timeout", f"超过执行时限 {task.timeout}s")
+
+    @staticmethod
+    def _history_record(task: Task) -> dict:
+        duration = 0
+        if task.completed_at and task.started_at:
+            duration = int((task.completed_at - task.started_at).total_seconds())
+        return {
+            "task_id": task.id,
+            "task_name": task.name,
+            "cost_class": task.cost_class,
+            "user_type": task.user_type,
+            "ip_address": task.ip,
+            "filename": task.filename,
+            "status": task.status,
+            "created_at": task.created_at,
+            "started_at": task.started_at,
+            "completed_at": task.completed_at,
+            "duration": duration,
+            "error_message": task.error_message,
+        }
+
+    def set_capacity(self, capacity: int):
+        """运行时调整权重预算，扩容后立即尝试唤醒等待中的任务"""
+        self.capacity = max(1, int(capacity))
+        self._dispatch()
 
     def get_status(self):
         return {
-            "waiting_count": len(self.queue),
+            "waiting_count": len(self._waiting),
             "active_count": len(self.active_tasks),
-            "max_concurrent": self.max_concurrent_tasks,
+            "used_capacity": self.used_capacity,
+            "capacity": self.capacity,
+            # 新的普通任务此刻入队的预计等待（秒）
+            "estimated_wait": (
+                self._active_work()
+                + sum(
+                    self.expected_duration(t) * t.weight for t in self._waiting.values()
+                )
+            )
+            / max(self.capacity, 1),
         }
 
+    async def load_settings(self):
+        """从设置表恢复等待上限，并用 TaskHistory 中最近的执行耗时预热估算"""
+        from sqlalchemy import select
+
+        from app.core import database
+        from app.core.settings_manager import get_setting
+        from app.models.models import TaskHistory
+
+        max_wait = await get_setting(SETTING_MAX_WAIT, "")
+        if max_wait.isdigit():
+            self.max_wait_seconds = int(max_wait)
+
+        async with database.AsyncSessionLocal() as session:
+            # 旧记录没有资源类别，无法归入对应的样本，直接跳过
+            res = await session.execute(
+                select(
+                    TaskHistory.task_name, TaskHistory.cost_class, TaskHistory.duration
+                )
+                .where(
+                    TaskHistory.status == "completed",
+                    TaskHistory.duration.isnot(None),
+                    TaskHistory.cost_class.isnot(None),
+                )
+                .order_by(TaskHistory.id.desc())
+                .limit(DURATION_SAMPLES * 10)
+            )
+            rows = res.all()
+        for name, cost_class, duration in reversed(rows):
+            self._record_duration((name, cost_class), float(duration))
+        print(f"[Queue] 已从历史记录载入 {len(rows)} 条执行耗时")
+
+    async def set_max_wait(self, seconds: int):
+        from app.core.settings_manager import set_setting
+
+        self.max_wait_seconds = max(0, int(seconds))
+        await set_setting(SETTING_MAX_WAIT, str(self.max_wait_seconds))
+
     def get_system_stats(self):
         import psutil
 
@@ -159,4 +658,20 @@ class TaskManager:
         }
 
 
-global_task_manager = TaskManager(max_concurrent_tasks=1)
+def _default_capacity() -> int:
+    """
+    默认预算可同时运行 CONVERSION_WORKERS 个 LibreOffice 重任务，
+    至少容纳一个重任务外加一个轻量渲染任务
+    """
+    from app.core.config import settings
+
+    return max(
+        COST_WEIGHTS[COST_HEAVY] + COST_WEIGHTS[COST_LIGHT],
+        settings.CONVERSION_WORKERS * COST_WEIGHTS[COST_HEAVY],
+    )
+
+
+global_task_manager = TaskManager(
+    capacity=_default_capacity(),
+    history_writer=global_history_writer,
+)
@@ -0,0 +1,161 @@
+import asyncio
+import os
+import tempfile
+import time
+import zipfile
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.core.conversion_cache import ENGINE_DOCX, ENGINE_LIBREOFFICE, ENGINE_MARKDOWN
+
+WARMUP_PENDING = "pending"
+WARMUP_RUNNING = "running"
+WARMUP_READY = "ready"
+WARMUP_FAILED = "failed"
+
+_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+</Types>"""
+
+_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>"""
+
+_DOCUMENT = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">
+<w:body><w:p><w:r><w:t>{text}</w:t></w:r></w:p></w:body>
+</w:document>"""
+
+SAMPLE_MARKDOWN = "# 预热\n\n中文与 **English** 混排的示例段落。\n"
+
+
+def write_sample_docx(path: str, text: str = "预热文档 Warmup"):
+    """写入一个只含一段文字的最小 docx"""
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        z.writestr("_rels/.rels", _RELS)
+        z.writestr("word/document.xml", _DOCUMENT.format(text=text))
+
+
+def _warm_libreoffice(work_dir: str):
+    from app.core.office_pool import (
+        convert_to_pdf,
+        global_office_pool,
+        global_profile_pool,
+    )
+
+    # 命令行配置目录与常驻实例的首次启动都要创建用户配置，提前完成
+    global_profile_pool.initialize_all()
+    global_office_pool.warm()
+    sample = os.path.join(work_dir, "warmup.docx")
+    write_sample_docx(sample)
+    code, error = convert_to_pdf(sample, work_dir, timeout=300)
+    if code != 0 or not os.path.exists(os.path.join(work_dir, "warmup.pdf")):
+        raise RuntimeError(error.strip()[-300:] or f"退出码 {code}")
+
+
+def _warm_in_pool(render, sample: str, work_dir: str):
+    from app.core.worker_pool import global_process_pool
+
+    # 每个工作进程各渲染一次，完成 reportlab 的导入与字体初始化
+    futures = [
+        global_process_pool.submit(
+            render, sample, os.path.join(work_dir, f"warmup_{i}.pdf")
+        )
+        for i in range(global_process_pool.workers)
+    ]
+    for future in futures:
+        future.result(timeout=300)
+
+
+def _warm_markdown(work_dir: str):
+    from app.core.markdown_renderer import render_markdown_file
+
+    sample = os.path.join(work_dir, "warmup.md")
+    with open(sample, "w", encoding="utf-8") as f:
+        f.write(SAMPLE_MARKDOWN)
+    _warm_in_pool(render_markdown_file, sample, work_dir)
+
+
+def _warm_docx(work_dir: str):
+    from app.core.docx_renderer import render_docx_file
+
+    sample = os.path.join(work_dir, "warmup.docx")
+    write_sample_docx(sample)
+    _warm_in_pool(render_docx_file, sample, work_dir)
+
+
+WARMERS = {
+    ENGINE_LIBREOFFICE: _warm_libreoffice,
+    ENGINE_MARKDOWN: _warm_markdown,
+    ENGINE_DOCX: _warm_docx,
+}
+
+
+class BackendWarmup:
+    """
+    启动后在后台让各转换引擎并行完成一次真实转换，记录每个引擎的预热耗时。
+    全部引擎预热结束（成功或失败）后 ready 为 True，供就绪探针使用；
+    预热失败的引擎不阻塞就绪，实际请求会按原有逻辑报错或退回命令行。
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.engines: Dict[str, dict] = {
+            name: {"status": WARMUP_PENDING, "seconds": None, "error": ""}
+            for name in WARMERS
+        }
+        self._runner: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        if not self.enabled:
+            return True
+        return all(
+            e["status"] in (WARMUP_READY, WARMUP_FAILED) for e in self.engines.values()
+        )
+
+    async def _warm(self, name: str, work_dir: str):
+        engine = self.engines[name]
+        engine["status"] = WARMUP_RUNNING
+        started = time.perf_counter()
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                None, WARMERS[name], work_dir
+            )
+            engine["status"] = WARMUP_READY
+        except Exception as e:
+            engine["status"] = WARMUP_FAILED
+            engine["error"] = str(e)
+        engine["seconds"] = round(time.perf_counter() - started, 2)
+        result = "完成" if engine["status"] == WARMUP_READY else "失败"
+        print(
+            f"[Warmup] {name} 预热{result}，耗时 {engine['seconds']}s"
+            + (f": {engine['error']}" if engine["error"] else "")
+        )
+
+    async def run(self):
+        started = time.perf_counter()
+        with tempfile.TemporaryDirectory(prefix="toolbox_warmup_") as work_dir:
+            jobs = []
+            for name in WARMERS:
+                engine_dir = os.path.join(work_dir, name)
+                os.makedirs(engine_dir)
+                jobs.append(self._warm(name, engine_dir))
+            await asyncio.gather(*jobs)
+        print(f"[Warmup] 转换引擎预热结束，总耗时 {time.perf_counter() - started:.2f}s")
+
+    def start(self):
+        if not self.enabled or self._runner is not None:
+            return
+        self._runner = asyncio.create_task(self.run())
+
+    def get_status(self) -> dict:
+        return {"ready": self.ready, "engines": self.engines}
+
+
+global_warmup = BackendWarmup(enabled=settings.WARMUP_ENABLED)
@@ -0,0 +1,73 @@
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from app.core.config import settings
+
+
+class ConversionProcessPool:
+    """
+    进程内渲染（Markdown 等纯 Python 转换）使用的工作进程池，绕开 GIL 实现多核并行。
+    首次提交时才创建进程；工作进程异常退出导致进程池损坏时自动重建。
+    使用 spawn 启动方式，避免从带有事件循环与多个线程的主进程 fork；
+    工作进程会重新导入 app.main，其中的 ui.run 在非主进程中直接返回，不会再启动服务。
+    """
+
+    def __init__(self, workers: int):
+        self.workers = max(1, workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                print(f"[Workers] 已创建转换进程池 ({self.workers} 个进程)")
+            return self._executor
+
+    def submit(self, fn, *args) -> Future:
+        try:
+            return self._get_executor().submit(fn, *args)
+        except BrokenProcessPool:
+            print("[Workers] 转换进程池已损坏，正在重建...")
+            with self._lock:
+                broken, self._executor = self._executor, None
+            if broken is not None:
+                broken.shutdown(wait=False, cancel_futures=True)
+            return self._get_executor().submit(fn, *args)
+
+    def recycle(self, reason: str):
+        """
+        结束当前全部工作进程并丢弃进程池，下次提交时重新创建。
+        进程池中的渲染无法单独中断，超时或被取消的渲染只能这样终止；
+        同时在执行的其他渲染会以 BrokenProcessPool 失败，由调用方重新提交。
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        print(f"[Workers] 回收转换进程池: {reason}")
+        # ProcessPoolExecutor 没有公开的终止接口，直接结束其工作进程
+        for process in list((executor._processes or {}).values()):
+            try:
+                process.terminate()
+            except Exception:
+                pass
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_status(self) -> dict:
+        return {"workers": self.workers, "started": self._executor is not None}
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+global_process_pool = ConversionProcessPool(settings.CONVERSION_WORKERS)
@@ -3,8 +3,15 @@ from fastapi import Request, Response
 from nicegui import app, ui
 
 from app.core.config import settings
-from app.core.lifecycle import startup_handler, load_modules, sync_modules_with_db
+from app.core.lifecycle import (
+    startup_handler,
+    shutdown_handler,
+    load_modules,
+    sync_modules_with_db,
+)
 from app.api.tracking import setup_tracking_api
+from app.api.metrics import setup_metrics_api
+from app.api.health import setup_health_api
 from app.ui.setup import create_setup_page
 from app.ui.main_page import create_main_page
 from app.ui.admin import create_admin_page
@@ -67,6 +74,9 @@ async def api_security_middleware(request: Request, call_next):
 @app.middleware("http")
 async def add_no_cache_headers(request: Request, call_next):
     response: Response = await call_next(request)
+    # 接口自行设置了缓存策略时保留（下载响应允许浏览器缓存并以 ETag 条件请求校验）
+    if "cache-control" in response.headers:
+        return response
     response.headers["Cache-Control"] = (
         "no-store, no-cache, must-revalidate, proxy-revalidate, max-age=0"
     )
@@ -91,6 +101,11 @@ async def on_startup():
     await startup_handler(state, modules, module_instances)
 
 
+@app.on_shutdown
+async def on_shutdown():
+    await shutdown_handler()
+
+
 def handle_exception(e: Exception):
     from app.core.updater import generate_emergency_token, pull_updates
 
@@ -155,6 +170,8 @@ def handle_exception(e: Exception):
 app.on_exception(handle_exception)
 
 app.include_router(setup_tracking_api(state))
+app.include_router(setup_metrics_api())
+app.include_router(setup_health_api(state))
 
 create_setup_page(state)
 create_main_page(state, modules)
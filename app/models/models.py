@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, JSON, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, JSON, DateTime, Boolean, Text
 from datetime import datetime
 from app.core.database import Base
 
@@ -57,6 +57,7 @@ class TaskHistory(Base):
     id = Column(Integer, primary_key=True, index=True)
     task_id = Column(String(255), unique=True, index=True)
     task_name = Column(String(255), nullable=False)
+    cost_class = Column(String(50), nullable=True)  # heavy / io / light
     user_type = Column(String(50))
     ip_address = Column(String(255))
     filename = Column(String(255))
@@ -65,3 +66,26 @@ class TaskHistory(Base):
     started_at = Column(DateTime)
     completed_at = Column(DateTime)
     duration = Column(Integer)  # 秒
+    error_message = Column(Text, nullable=True)  # 失败/超时/取消/资源超限原因
+
+
+class Job(Base):
+    """持久化任务队列，多个进程/主机通过 SELECT ... FOR UPDATE SKIP LOCKED 领取"""
+
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String(255), unique=True, index=True, nullable=False)
+    kind = Column(String(100), index=True, nullable=False)
+    status = Column(
+        String(50), index=True, default="queued", nullable=False
+    )  # queued, running, completed, failed
+    priority = Column(Integer, default=1, nullable=False)  # 数值越小越优先
+    payload = Column(JSON, nullable=True)
+    result = Column(JSON, nullable=True)
+    error_message = Column(Text, nullable=True)
+    worker = Column(String(255), nullable=True)  # 领取该任务的节点
+    attempts = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    claimed_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)
+    completed_at = Column(DateTime)
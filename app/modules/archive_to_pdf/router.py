@@ -7,117 +7,82 @@ import secrets
 import hashlib
 import time
 from pathlib import Path
-from typing import Tuple, List
-from app.modules.base import BaseModule
+from typing import Callable, List, Optional, Tuple
+from app.core import metrics
+from app.core.conversion_engine import (
+    ConversionOptions,
+    global_conversion_engine,
+)
+from app.core.downloads import file_response
+from app.core.pdf_tools import INFO_SUFFIX, PdfInfo
+from app.modules.base import BaseModule, TaskProgress, safe_ui
 from nicegui import ui, app
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import JSONResponse
 from starlette.requests import Request
+from app.core.task_manager import EVENT_PROGRESS, QueueFullError
 
 
-def _convert_single_file(args):
-    """静态方法：处理单个文件（用于多进程）"""
-    file_path, file_name, output_dir, progress_queue = args
-    file_lower = file_name.lower()
-
-    try:
-        if file_lower.endswith(".docx"):
-            # 导入并转换 docx
-            import subprocess
-
-            file_stem = Path(file_name).stem
-            output_pdf = os.path.join(output_dir, f"{file_stem}.pdf")
-
-            libreoffice_path = shutil.which("libreoffice") or "/usr/bin/libreoffice"
-
-            result = subprocess.run(
-                [
-                    libreoffice_path,
-                    "--headless",
-                    "--convert-to",
-                    "pdf",
-                    "--outdir",
-                    output_dir,
-                    file_path,
-                ],
-                capture_output=True,
-                text=True,
-            )
+# 每个批量转换同时提交到调度器的子任务数下限（CONVERSION_WORKERS 更大时取后者），
+# 其余文档在本地等待，避免占满队列
+SUBTASK_WINDOW = 4
+# 转换子任务只处理一组文档（不超过 OFFICE_BATCH_SIZE 个），沿用单文档模块的执行时限
+SUBTASK_TIMEOUT = 600
 
-            if result.returncode == 0 and os.path.exists(output_pdf):
-                if progress_queue is not None:
-                    progress_queue.put(1)
-                return ("success", file_name)
-            else:
-                if progress_queue is not None:
-                    progress_queue.put(1)
-                return ("failed", file_name)
-
-        elif file_lower.endswith(".md"):
-            # 转换 md
-            from reportlab.lib.pagesizes import A4
-            from reportlab.lib.styles import getSampleStyleSheet
-            from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-            import markdown
-            import re
-
-            file_stem = Path(file_name).stem
-            output_pdf = os.path.join(output_dir, f"{file_stem}.pdf")
-
-            with open(file_path, "r", encoding="utf-8") as f:
-                md_content = f.read()
-
-            doc = SimpleDocTemplate(output_pdf, pagesize=A4)
-            styles = getSampleStyleSheet()
-            story = []
-
-            lines = md_content.split("\n")
-            for line in lines:
-                if not line.strip():
-                    story.append(Spacer(1, 12))
-                    continue
 
-                style = styles["Normal"]
-                if line.startswith("# "):
-                    style = styles["Heading1"]
-                    line = line[2:]
-                elif line.startswith("## "):
-                    style = styles["Heading2"]
-                    line = line[3:]
-                elif line.startswith("### "):
-                    style = styles["Heading3"]
-                    line = line[4:]
+def _document_cost_class(file_name: str, heavy: str, light: str) -> str:
+    return heavy if file_name.lower().endswith(".docx") else light
 
-                html_line = markdown.markdown(line)
-                clean_line = re.sub("<[^>]*>", "", html_line)
 
-                try:
-                    story.append(Paragraph(clean_line, style))
-                except Exception:
-                    story.append(Paragraph(line, style))
+def _plan_batches(
+    documents: List[Tuple[str, str, str]],
+) -> List[List[Tuple[str, str, str]]]:
+    """
+    按输出目录把 Word 文档分组，每组不超过 OFFICE_BATCH_SIZE 个，由一次 LibreOffice 调用转换；
+    Markdown 等进程内转换的文件各自成组。
+    """
+    from app.core.office_pool import OFFICE_BATCH_SIZE
 
-            doc.build(story)
+    groups: dict = {}
+    batches = []
+    for document in documents:
+        if document[1].lower().endswith(".docx"):
+            group = groups.setdefault(document[2], [])
+            group.append(document)
+            if len(group) >= OFFICE_BATCH_SIZE:
+                batches.append(groups.pop(document[2]))
+        else:
+            batches.append([document])
+    batches.extend(groups.values())
+    return batches
 
-            if os.path.exists(output_pdf):
-                if progress_queue is not None:
-                    progress_queue.put(1)
-                return ("success", file_name)
-            else:
-                if progress_queue is not None:
-                    progress_queue.put(1)
-                return ("failed", file_name)
 
-        else:
-            # 复制非转换文件
-            dest_path = os.path.join(output_dir, file_name)
-            shutil.copy2(file_path, dest_path)
-            if progress_queue is not None:
-                progress_queue.put(1)
-            return ("copied", file_name)
-    except Exception as e:
-        print(f"处理文件失败 {file_name}: {e}")
-        if progress_queue is not None:
-            progress_queue.put(1)
-        return ("failed", file_name)
+def _output_pdf(file_name: str, output_dir: str) -> str:
+    return os.path.join(output_dir, f"{Path(file_name).stem}.pdf")
+
+
+def _convert_batch(
+    group: List[Tuple[str, str, str]], options: ConversionOptions
+) -> List[bool]:
+    """转换 _plan_batches 生成的一组文档，返回每个文档是否成功"""
+    results = global_conversion_engine.convert_batch_sync(
+        [(path, _output_pdf(name, out)) for path, name, out in group], options
+    )
+    return [r.success for r in results]
+
+
+def _take_cached(
+    documents: List[Tuple[str, str, str]], options: ConversionOptions
+) -> Tuple[List[Tuple[str, str, str]], int]:
+    """把命中转换缓存的文档直接复制到输出目录，返回 (仍需转换的文档, 命中数)"""
+    remaining = [
+        document
+        for document in documents
+        if global_conversion_engine.lookup_sync(
+            document[0], _output_pdf(document[1], document[2]), options
+        )
+        is None
+    ]
+    return remaining, len(documents) - len(remaining)
 
 
 class ArchiveToPdfModule(BaseModule):
@@ -137,6 +102,28 @@ class ArchiveToPdfModule(BaseModule):
     def icon(self):
         return "folder_zip"
 
+    @property
+    def cost_class(self):
+        from app.core.task_manager import COST_HEAVY
+
+        return COST_HEAVY
+
+    @property
+    def task_timeout(self):
+        # 解压数百个文档的压缩包或合并全部结果耗时较长，给予更长的执行时限
+        return 3600
+
+    def _estimate_cost_class(self, files: List[dict]) -> str:
+        """
+        按本次上传内容细化主任务的资源类别。
+        批量上传的主任务只负责写入与解压，文档转换拆分为逐文档子任务单独排队。
+        """
+        from app.core.task_manager import COST_HEAVY, COST_IO, COST_LIGHT
+
+        if len(files) > 1 or files[0]["name"].lower().endswith(".zip"):
+            return COST_IO
+        return _document_cost_class(files[0]["name"], COST_HEAVY, COST_LIGHT)
+
     def _generate_token(self, ip: str, file_id: str) -> str:
         raw = f"{ip}:{file_id}:{secrets.randbelow(1000000)}"
         return hashlib.sha256(raw.encode()).hexdigest()[:32]
@@ -172,11 +159,23 @@ class ArchiveToPdfModule(BaseModule):
     def setup_api(self):
         @app.get(f"{self.router.prefix}/download/{{file_id}}/{{file_name}}")
         async def download_archive(
-            request: Request, file_id: str, file_name: str, token: str = None
+            request: Request,
+            file_id: str,
+            file_name: str,
+            token: str = None,
+            inline: bool = False,
         ):
             safe_id = os.path.basename(file_id)
             safe_name = os.path.basename(file_name)
             file_path = os.path.join(self.temp_dir, safe_id, safe_name)
+            # 单个文档的转换结果保存在 output 目录中（合并结果则在任务目录下）
+            single_pdf = os.path.join(self.temp_dir, safe_id, "output", safe_name)
+            if (
+                safe_name.endswith(".pdf")
+                and not os.path.exists(file_path)
+                and os.path.exists(single_pdf)
+            ):
+                file_path = single_pdf
 
             # 如果文件不存在，检查是否需要按需压缩
             if not os.path.exists(file_path):
@@ -233,11 +232,9 @@ class ArchiveToPdfModule(BaseModule):
             if safe_name.endswith(".zip"):
                 media_type = "application/zip"
 
-            return FileResponse(
-                file_path,
-                media_type=media_type,
-                filename=safe_name,
-            )
+            metrics.downloads_total.inc(module=self.name)
+
+            return file_response(request, file_path, safe_name, media_type, inline)
 
     def _extract_archive(self, archive_path: str, extract_to: str) -> bool:
         """解压压缩包，支持zip格式"""
@@ -257,6 +254,9 @@ class ArchiveToPdfModule(BaseModule):
             with zipfile.ZipFile(output_path, "w", zipfile.ZIP_DEFLATED) as zipf:
                 for root, dirs, files in os.walk(source_dir):
                     for file in files:
+                        # 转换结果旁的元数据记录只供服务端使用，不打包
+                        if file.endswith(INFO_SUFFIX):
+                            continue
                         file_path = os.path.join(root, file)
                         arcname = os.path.relpath(file_path, source_dir)
                         zipf.write(file_path, arcname)
@@ -265,105 +265,23 @@ class ArchiveToPdfModule(BaseModule):
             print(f"创建压缩包失败: {e}")
             return False
 
-    def _convert_docx_to_pdf(self, docx_path: str, output_dir: str) -> str:
-        """将docx转换为pdf，返回输出路径"""
-        try:
-            import subprocess
-
-            file_name = Path(docx_path).stem
-            output_pdf = os.path.join(output_dir, f"{file_name}.pdf")
-
-            import shutil
-
-            libreoffice_path = shutil.which("libreoffice") or "/usr/bin/libreoffice"
-
-            result = subprocess.run(
-                [
-                    libreoffice_path,
-                    "--headless",
-                    "--convert-to",
-                    "pdf",
-                    "--outdir",
-                    output_dir,
-                    docx_path,
-                ],
-                capture_output=True,
-                text=True,
-            )
-
-            if result.returncode == 0 and os.path.exists(output_pdf):
-                return output_pdf
-            return None
-        except Exception as e:
-            print(f"转换docx失败: {e}")
-            return None
+    def _conversion_options(self, task_id: Optional[str] = None) -> ConversionOptions:
+        return ConversionOptions(
+            timeout=self.task_timeout, task_id=task_id, module=self.name
+        )
 
-    def _convert_md_to_pdf(self, md_path: str, output_dir: str) -> str:
-        """将markdown转换为pdf，返回输出路径"""
-        try:
-            from reportlab.lib.pagesizes import A4
-            from reportlab.lib.styles import getSampleStyleSheet
-            from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-            import markdown
-            import re
-
-            file_name = Path(md_path).stem
-            output_pdf = os.path.join(output_dir, f"{file_name}.pdf")
-
-            with open(md_path, "r", encoding="utf-8") as f:
-                md_content = f.read()
-
-            doc = SimpleDocTemplate(output_pdf, pagesize=A4)
-            styles = getSampleStyleSheet()
-            story = []
-
-            lines = md_content.split("\n")
-            for line in lines:
-                if not line.strip():
-                    story.append(Spacer(1, 12))
-                    continue
-
-                style = styles["Normal"]
-                if line.startswith("# "):
-                    style = styles["Heading1"]
-                    line = line[2:]
-                elif line.startswith("## "):
-                    style = styles["Heading2"]
-                    line = line[3:]
-                elif line.startswith("### "):
-                    style = styles["Heading3"]
-                    line = line[4:]
-
-                html_line = markdown.markdown(line)
-                clean_line = re.sub("<[^>]*>", "", html_line)
-
-                try:
-                    story.append(Paragraph(clean_line, style))
-                except Exception:
-                    story.append(Paragraph(line, style))
-
-            doc.build(story)
-            return output_pdf if os.path.exists(output_pdf) else None
-        except Exception as e:
-            print(f"转换md失败: {e}")
-            return None
-
-    def _process_directory(
-        self, input_dir: str, output_dir: str, progress_info: dict = None
-    ) -> Tuple[int, int]:
+    def _collect_documents(
+        self, input_dir: str, output_dir: str
+    ) -> List[Tuple[str, str, str]]:
         """
-        递归处理目录中的所有文档（使用2进程并行处理，支持失败重试）
-        :param input_dir: 输入目录
-        :param output_dir: 输出目录
-        :param progress_info: 进度信息字典 {'current': 0, 'total': 0}
-        :return: (成功转换数, 总文件数)
+        递归收集目录中需要转换的文档，并创建对应的输出目录
+        :return: [(file_path, file_name, output_dir)]
         """
-        # 收集所有需要处理的文件
-        files_to_process: List[
-            Tuple[str, str, str]
-        ] = []  # (file_path, file_name, output_dir)
+        documents: List[Tuple[str, str, str]] = []
 
         for root, dirs, files in os.walk(input_dir):
+            # 按名称顺序遍历子目录，合并输出时文档顺序与目录结构一致
+            dirs.sort()
             # 计算相对路径
             rel_path = os.path.relpath(root, input_dir)
 
@@ -375,73 +293,227 @@ class ArchiveToPdfModule(BaseModule):
 
             os.makedirs(current_output_dir, exist_ok=True)
 
-            for file in files:
-                file_path = os.path.join(root, file)
+            for file in sorted(files):
                 file_lower = file.lower()
 
                 # 只处理 .docx 和 .md 文件
                 if file_lower.endswith(".docx") or file_lower.endswith(".md"):
-                    files_to_process.append((file_path, file, current_output_dir))
+                    documents.append(
+                        (os.path.join(root, file), file, current_output_dir)
+                    )
 
-        if not files_to_process:
-            return 0, 0
+        return documents
+
+    def _process_documents(
+        self,
+        documents: List[Tuple[str, str, str]],
+        task_id: Optional[str] = None,
+    ) -> int:
+        """
+        转换一个子任务分到的文档（失败的文档单独重试），返回成功转换数。
+        并行度由调度器控制：每个子任务只处理一组文档，多个子任务按并发预算同时执行。
+        :param documents: [(file_path, file_name, output_dir)]
+        :param task_id: 所属任务 ID，任务被取消或超时后停止处理剩余文件
+        """
+        from app.core.task_manager import global_task_manager
 
-        total_count = len(files_to_process)
         success_count = 0
         max_retries = 3
 
-        # 第一次处理：单线程逐个处理所有文件
-        print(f"[Process] 开始处理 {total_count} 个文件，使用单线程...")
-        failed_files = []
-        for file_path, file_name, output_dir in files_to_process:
-            # 直接调用转换函数（不使用多进程）
-            status, _ = _convert_single_file((file_path, file_name, output_dir, None))
-            
-            if status == "success":
-                success_count += 1
-            else:
-                # 添加到失败列表，供后续重试
-                failed_files.append((file_path, file_name, output_dir))
-            
-            # 更新进度
-            if progress_info is not None:
-                progress_info["current"] += 1
-
-        # 如果有失败的文件，进行重试
-        retry_count = 1
-        while failed_files and retry_count <= max_retries:
-            print(
-                f"[Process] 第 {retry_count} 次重试，处理 {len(failed_files)} 个失败文件..."
-            )
-
-            # 重试失败的文件
-            new_failed_files = []
-            for file_path, file_name, output_dir in failed_files:
-                status, _ = _convert_single_file((file_path, file_name, output_dir, None))
-                
-                if status == "success":
-                    success_count += 1
-                else:
-                    new_failed_files.append((file_path, file_name, output_dir))
+        options = self._conversion_options(task_id)
 
-            failed_files = new_failed_files
-            retry_count += 1
+        def cancelled() -> bool:
+            return bool(task_id) and global_task_manager.is_cancelled(task_id)
 
-            # 短暂延迟后重试
-            if failed_files:
+        pending = list(documents)
+        for attempt in range(max_retries + 1):
+            if attempt:
+                # 短暂延迟后只重试失败的文件
                 time.sleep(1)
+                print(
+                    f"[Process] 第 {attempt} 次重试，处理 {len(pending)} 个失败文件..."
+                )
+
+            failed_files = []
+            for group in _plan_batches(pending):
+                if cancelled():
+                    failed_files.extend(group)
+                    continue
+                try:
+                    results = _convert_batch(group, options)
+                except Exception as e:
+                    print(f"[Process] 转换失败 ({len(group)} 个文件): {e}")
+                    results = [False] * len(group)
+                for document, ok in zip(group, results):
+                    if ok:
+                        success_count += 1
+                    else:
+                        failed_files.append(document)
+
+            if cancelled():
+                print(f"[Process] 任务已终止，放弃 {len(failed_files)} 个未完成文件")
+                return success_count
+
+            pending = failed_files
+            if not pending:
+                break
+
+        for _, fn, _ in pending:
+            print(f"[Process] 重试后仍失败: {fn}")
 
-        # 输出最终结果
-        if failed_files:
-            print(
-                f"[Process] 处理完成：{success_count}/{total_count} 成功，{len(failed_files)} 个文件重试后仍失败"
+        return success_count
+
+    def _merge_documents(
+        self,
+        documents: List[Tuple[str, str, str]],
+        input_dir: str,
+        output_path: str,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+    ) -> PdfInfo:
+        """
+        按目录顺序把已转换成功的文档合并为一个 PDF，书签标题为文档在压缩包中的相对路径
+        :param documents: [(file_path, file_name, output_dir)]
+        """
+        from app.core.pdf_merge import merge_pdfs
+
+        parts = []
+        for path, name, out in documents:
+            pdf_path = _output_pdf(name, out)
+            if os.path.exists(pdf_path):
+                title = os.path.splitext(os.path.relpath(path, input_dir))[0]
+                parts.append((pdf_path, title.replace(os.sep, "/")))
+        if not parts:
+            raise Exception("没有转换成功的文档可供合并")
+        return merge_pdfs(parts, output_path, on_progress, should_stop)
+
+    async def _merge_as_task(
+        self,
+        documents: List[Tuple[str, str, str]],
+        input_dir: str,
+        output_path: str,
+        user_type: str,
+        client_id: str,
+        batch: dict,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> PdfInfo:
+        """
+        合并作为批量转换的最后一个阶段单独排队执行（I/O 类任务），
+        工作线程逐页上报进度，经任务事件回到事件循环中调用 on_progress。
+        """
+        from app.core.task_manager import COST_IO, global_task_manager
+
+        sub = await global_task_manager.add_task(
+            name=f"{self.name} · 合并",
+            user_type=user_type,
+            ip=client_id,
+            filename=f"合并 {os.path.basename(output_path)}",
+            cost_class=COST_IO,
+            timeout=self.task_timeout,
+            client_id=client_id,
+            check_backlog=False,
+        )
+        batch["tasks"].add(sub.id)
+
+        async def follow_progress():
+            async for event in global_task_manager.events(sub.id):
+                if event.type == EVENT_PROGRESS and on_progress is not None:
+                    on_progress(event.current, event.total)
+
+        follower = asyncio.create_task(follow_progress())
+        status, error = "completed", None
+        try:
+            if await global_task_manager.start_task(sub.id) is None:
+                raise Exception(sub.error_message or "任务已取消")
+
+            def report(current: int, total: int):
+                global_task_manager.report_progress(sub.id, current, total)
+
+            return await asyncio.get_running_loop().run_in_executor(
+                None,
+                self._merge_documents,
+                documents,
+                input_dir,
+                output_path,
+                report,
+                lambda: global_task_manager.is_cancelled(sub.id),
             )
-            for fp, fn, od, _ in failed_files:
-                print(f"  - 失败: {fn}")
-        else:
-            print(f"[Process] 处理完成：{success_count}/{total_count} 全部成功")
+        except Exception as e:
+            status, error = "failed", str(e)
+            raise
+        finally:
+            batch["tasks"].discard(sub.id)
+            follower.cancel()
+            await global_task_manager.complete_task(sub.id, status, error)
+
+    async def _convert_as_subtasks(
+        self,
+        documents: List[Tuple[str, str, str]],
+        user_type: str,
+        client_id: str,
+        batch: dict,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> int:
+        """
+        将批量转换拆分为子任务（每个子任务为 _plan_batches 生成的一组文档），
+        交由全局调度器与其他客户端的任务公平交替执行。
+        batch["tasks"] 记录当前未结束的子任务，batch["cancelled"] 置位后不再提交新的子任务。
+        :return: 成功转换数
+        """
+        from app.core.config import settings
+        from app.core.task_manager import COST_HEAVY, COST_LIGHT, global_task_manager
+
+        loop = asyncio.get_running_loop()
+        window = asyncio.Semaphore(max(SUBTASK_WINDOW, settings.CONVERSION_WORKERS))
+        # 命中缓存的文档在提交子任务前直接完成，不占用队列名额
+        total = len(documents)
+        documents, cached = await loop.run_in_executor(
+            None, _take_cached, documents, self._conversion_options()
+        )
+        progress = {"done": cached}
+        if cached and on_progress is not None:
+            on_progress(cached, total)
+
+        async def run_one(group: List[Tuple[str, str, str]]) -> int:
+            async with window:
+                if batch["cancelled"]:
+                    return 0
+                sub = await global_task_manager.add_task(
+                    name=f"{self.name} · 转换",
+                    user_type=user_type,
+                    ip=client_id,
+                    filename=", ".join(d[1] for d in group)[:255],
+                    cost_class=_document_cost_class(
+                        group[0][1], COST_HEAVY, COST_LIGHT
+                    ),
+                    timeout=SUBTASK_TIMEOUT,
+                    client_id=client_id,
+                    check_backlog=False,
+                )
+                batch["tasks"].add(sub.id)
+                status, error, converted = "completed", None, 0
+                try:
+                    if await global_task_manager.start_task(sub.id) is None:
+                        return 0
+                    converted = await loop.run_in_executor(
+                        None, self._process_documents, group, sub.id
+                    )
+                    if converted < len(group):
+                        status = "failed"
+                        error = f"{len(group) - converted}/{len(group)} 个文件转换失败"
+                    return converted
+                except Exception as e:
+                    status, error = "failed", str(e)
+                    return 0
+                finally:
+                    batch["tasks"].discard(sub.id)
+                    await global_task_manager.complete_task(sub.id, status, error)
+                    progress["done"] += len(group)
+                    if on_progress is not None:
+                        on_progress(progress["done"], total)
 
-        return success_count, total_count
+        results = await asyncio.gather(*(run_one(g) for g in _plan_batches(documents)))
+        return cached + sum(results)
 
     def setup_ui(self):
         ui.label("文档批量转PDF").classes("text-h4 mb-4")
@@ -449,22 +521,6 @@ class ArchiveToPdfModule(BaseModule):
             "支持批量上传 .zip、.docx、.md 文件，自动转换为 PDF。压缩包会保持文件夹结构。"
         ).classes("mb-4 text-slate-500")
 
-        # 定义一个内部函数来安全更新 UI，并打印非生命周期错误
-        def safe_ui(func, *args, **kwargs):
-            try:
-                func(*args, **kwargs)
-            except RuntimeError as e:
-                # 忽略元素已删除的错误
-                if (
-                    "deleted" in str(e).lower()
-                    or "parent slot" in str(e).lower()
-                    or "client" in str(e).lower()
-                ):
-                    return
-                print(f"UI Update Runtime Error: {e}")
-            except Exception as e:
-                print(f"UI Update Error: {e}")
-
         async def get_tool_security():
             from app.core import database
             from app.models.models import Tool
@@ -615,6 +671,10 @@ class ArchiveToPdfModule(BaseModule):
                 multiple=True,
             ).props('accept=".zip,.docx,.md" icon="upload_file').classes("w-full mb-6")
 
+            merge_output = ui.checkbox(
+                "合并为单个 PDF（按目录顺序，每个文档一个书签）", value=False
+            ).classes("mb-2")
+
             file_list_container
 
             result_card = (
@@ -658,93 +718,118 @@ class ArchiveToPdfModule(BaseModule):
                 state["processing"] = True
                 safe_ui(convert_btn.disable)
 
-                task = await global_task_manager.add_task(
-                    name="压缩包文档转PDF",
-                    user_type="admin" if is_authenticated() else "guest",
-                    ip=client_ip,
-                    filename=", ".join([f["name"] for f in state["files"]]),
+                progress = TaskProgress(
+                    status_label, progress_container, progress_bar_inner
                 )
 
-                safe_ui(status_label.style, "display: block")
-                safe_ui(progress_container.style, "display: block")
-                safe_ui(progress_bar_inner.style, "width: 0%")
-                state["show_result"] = False
+                def show_single_result(
+                    file_id: str, pdf_name: str, info: Optional[PdfInfo] = None
+                ):
+                    state["processing"] = False
+                    progress.finish("转换完成！")
+                    try:
+                        ui.notify("转换成功！", color="positive")
+                    except Exception:
+                        pass
 
-                # 进度信息共享字典
-                progress_info = {"current": 0, "total": 0}
-
-                async def monitor_progress():
-                    """监控真实进度或模拟进度"""
-                    while state["processing"]:
-                        if progress_info["total"] > 0:
-                            # 真实进度模式（批量）
-                            try:
-                                p = progress_info["current"] / progress_info["total"]
-                                if p > 0.99:
-                                    p = 0.99
-                                safe_ui(progress_bar_inner.style, f"width: {p * 100}%")
-                                safe_ui(
-                                    status_label.set_text,
-                                    f"正在转换... ({progress_info['current']}/{progress_info['total']})",
-                                )
-                            except Exception as e:
-                                print(f"Progress Monitor Error: {e}")
-                        else:
-                            # 模拟进度模式（单文件或初始化阶段）
-                            try:
-                                # 尝试解析当前百分比并模拟增长
-                                current_style = progress_bar_inner.style.get(
-                                    "width", "0%"
-                                )
-                                current_val = (
-                                    float(current_style.replace("%", "")) / 100
-                                )
-                                if current_val < 0.95:
-                                    increment = (0.98 - current_val) / 20
-                                    new_p = (current_val + increment) * 100
-                                    safe_ui(
-                                        progress_bar_inner.style, f"width: {new_p}%"
-                                    )
-                            except Exception:
-                                pass
-                        await asyncio.sleep(0.5)
-
-                asyncio.create_task(monitor_progress())
+                    download_token = self._generate_token(client_ip, file_id)
+                    self._download_tokens[f"{file_id}:{pdf_name}"] = {
+                        "token": download_token,
+                        "ip": client_ip,
+                        "created_at": time.time(),
+                    }
+
+                    download_url = f"{self.router.prefix}/download/{file_id}/{pdf_name}?token={download_token}"
+
+                    try:
+                        result_card.clear()
+                        state["show_result"] = True
+                        with result_card:
+                            with ui.row().classes(
+                                "w-full items-center justify-between"
+                            ):
+                                with ui.column():
+                                    ui.label(pdf_name).classes("font-bold text-lg")
+                                    ui.label(
+                                        info.describe() if info else "文档转换完成"
+                                    ).classes("text-sm text-slate-500")
+                                    # 显示直接下载链接
+                                    ui.link(
+                                        "点击此处下载PDF", download_url, new_tab=True
+                                    ).classes("text-blue-500 hover:underline")
+
+                    except Exception:
+                        pass
 
+                is_batch = len(state["files"]) > 1 or any(
+                    f["name"].lower().endswith(".zip") for f in state["files"]
+                )
+                file_id = str(uuid.uuid4())
+                work_dir = os.path.join(self.temp_dir, file_id)
+                input_dir = os.path.join(work_dir, "input")
+                output_dir = os.path.join(work_dir, "output")
+                os.makedirs(input_dir, exist_ok=True)
+                os.makedirs(output_dir, exist_ok=True)
+
+                if not is_batch:
+                    # 单个文档命中转换缓存时直接给出结果，不进入队列
+                    single = state["files"][0]
+                    pdf_name = f"{Path(single['name']).stem}.pdf"
+                    cached = await global_conversion_engine.lookup(
+                        single["name"],
+                        os.path.join(output_dir, pdf_name),
+                        self._conversion_options(),
+                        single["content"],
+                    )
+                    if cached is not None:
+                        progress.show()
+                        show_single_result(file_id, pdf_name, cached.info)
+                        safe_ui(convert_btn.enable)
+                        return
+
+                user_type = "admin" if is_authenticated() else "guest"
                 try:
+                    task = await global_task_manager.add_task(
+                        name=self.name,
+                        user_type=user_type,
+                        ip=client_ip,
+                        filename=", ".join([f["name"] for f in state["files"]]),
+                        cost_class=self._estimate_cost_class(state["files"]),
+                        timeout=self.task_timeout,
+                        client_id=client_ip,
+                    )
+                except QueueFullError as e:
+                    ui.notify(str(e), color="warning")
+                    shutil.rmtree(work_dir, ignore_errors=True)
+                    state["processing"] = False
+                    safe_ui(convert_btn.enable)
+                    return
+                task_status, task_error = "completed", None
+                batch = {"tasks": set(), "cancelled": False}
+
+                def cancel_all():
+                    batch["cancelled"] = True
+                    for task_id in [task.id, *batch["tasks"]]:
+                        global_task_manager.cancel_task(
+                            task_id, "cancelled", "用户离开页面"
+                        )
 
-                    async def wait_for_start():
-                        while True:
-                            waiting_ids = [t.id for t in global_task_manager.queue]
-                            if task.id in waiting_ids:
-                                pos = waiting_ids.index(task.id) + 1
-                                safe_ui(
-                                    status_label.set_text,
-                                    f"排队中: 前方有 {pos - 1} 个任务...",
-                                )
-                                safe_ui(progress_bar_inner.style, "width: 2%")
-                            elif task.id in global_task_manager.active_tasks:
-                                break
-                            await asyncio.sleep(1.0)
+                # 用户关闭或离开页面时取消主任务及全部子任务，释放队列名额
+                self.cancel_on_disconnect(cancel_all)
 
-                    # 启动状态监控并请求开始任务
-                    monitor_task = asyncio.create_task(wait_for_start())
-                    try:
-                        await global_task_manager.start_task(task.id)
-                    finally:
-                        monitor_task.cancel()
+                progress.show()
+                state["show_result"] = False
 
-                    file_id = str(uuid.uuid4())
-                    work_dir = os.path.join(self.temp_dir, file_id)
-                    input_dir = os.path.join(work_dir, "input")
-                    output_dir = os.path.join(work_dir, "output")
-                    os.makedirs(input_dir, exist_ok=True)
-                    os.makedirs(output_dir, exist_ok=True)
+                # 单文件没有逐文件进度，开始执行后以缓慢过渡示意
+                event_follower = progress.follow(
+                    task.id, None if is_batch else "正在转换文档..."
+                )
+
+                try:
+                    if await global_task_manager.start_task(task.id) is None:
+                        raise Exception(task.error_message or "任务已取消")
 
                     files_to_process = []
-                    is_batch = len(state["files"]) > 1 or any(
-                        f["name"].lower().endswith(".zip") for f in state["files"]
-                    )
 
                     for f in state["files"]:
                         file_path = os.path.join(input_dir, f["name"])
@@ -757,43 +842,43 @@ class ArchiveToPdfModule(BaseModule):
                     input_stem = Path(original_input_name).stem
 
                     if is_batch:
-                        safe_ui(status_label.set_text, "正在处理文件...")
+                        progress.set_text("正在处理文件...")
 
                         temp_input = input_dir
                         if any(f[1].lower().endswith(".zip") for f in files_to_process):
-                            safe_ui(status_label.set_text, "正在解压压缩包...")
+                            progress.set_text("正在解压压缩包...")
                             for file_path, file_name in files_to_process:
                                 if file_name.lower().endswith(".zip"):
                                     self._extract_archive(file_path, temp_input)
                                     os.remove(file_path)
 
-                        # 预先扫描计算总文件数
-                        total_files = 0
-                        for root, _, files in os.walk(temp_input):
-                            for file in files:
-                                if file.lower().endswith((".docx", ".md")):
-                                    total_files += 1
-                        progress_info["total"] = total_files
-
+                        documents = self._collect_documents(temp_input, output_dir)
+                        total_files = len(documents)
                         if total_files == 0:
                             raise Exception("没有找到可转换的文档")
 
-                        safe_ui(
-                            status_label.set_text, f"准备转换 {total_files} 个文件..."
+                        # 解压完成即结束主任务，文档转换拆分为子任务与其他用户公平排队
+                        await global_task_manager.complete_task(task.id)
+                        progress.set_text(f"准备转换 {total_files} 个文件...")
+                        progress.creep("2%")
+
+                        def on_document_done(current: int, total: int):
+                            p = min(current / total, 0.99)
+                            progress.creep(f"{p * 100}%")
+                            progress.set_text(f"正在转换... ({current}/{total})")
+
+                        success_count = await self._convert_as_subtasks(
+                            documents,
+                            user_type,
+                            client_ip,
+                            batch,
+                            on_document_done,
                         )
+                        total_count = total_files
+                        if batch["cancelled"]:
+                            raise Exception("任务已取消")
 
-                        (
-                            success_count,
-                            total_count,
-                        ) = await asyncio.get_event_loop().run_in_executor(
-                            None,
-                            self._process_directory,
-                            temp_input,
-                            output_dir,
-                            progress_info,
-                        )
-
-                        safe_ui(status_label.set_text, "正在打包结果...")
+                        progress.set_text("正在打包结果...")
 
                         # 确定输出压缩包名称逻辑
                         is_original_zip = len(
@@ -807,10 +892,33 @@ class ArchiveToPdfModule(BaseModule):
                             output_zip_name = "ToolBox_Converted.zip"
 
                         output_zip_path = os.path.join(work_dir, output_zip_name)
+                        output_name = output_zip_name
+                        merged_info = None
+
+                        if merge_output.value:
+                            # 合并模式：不打包，按目录顺序合并为单个 PDF
+                            output_name = f"{Path(output_zip_name).stem}.pdf"
+                            progress.set_text("正在合并 PDF...")
+                            progress.creep("0%")
+
+                            def on_page_merged(current: int, total: int):
+                                progress.creep(f"{min(current / total, 0.99) * 100}%")
+                                progress.set_text(
+                                    f"正在合并 PDF... (第 {current}/{total} 页)"
+                                )
 
+                            merged_info = await self._merge_as_task(
+                                documents,
+                                temp_input,
+                                os.path.join(work_dir, output_name),
+                                user_type,
+                                client_ip,
+                                batch,
+                                on_page_merged,
+                            )
                         # 压缩逻辑：只有原本是压缩包上传的才立即执行压缩
-                        if is_original_zip:
-                            safe_ui(status_label.set_text, "正在打包结果...")
+                        elif is_original_zip:
+                            progress.set_text("正在打包结果...")
                             if not self._create_archive(output_dir, output_zip_path):
                                 raise Exception("创建输出压缩包失败")
                         else:
@@ -820,26 +928,20 @@ class ArchiveToPdfModule(BaseModule):
                         shutil.rmtree(temp_input, ignore_errors=True)
 
                         state["processing"] = False
-                        safe_ui(progress_bar_inner.style, "width: 100%")
-                        safe_ui(
-                            progress_bar_inner.classes,
-                            add="bg-green-500",
-                            remove="bg-blue-500",
-                        )
-                        safe_ui(status_label.set_text, "处理完成！")
+                        progress.finish("处理完成！")
                         try:
                             ui.notify("转换成功！", color="positive")
                         except Exception:
                             pass
 
                         download_token = self._generate_token(client_ip, file_id)
-                        self._download_tokens[f"{file_id}:{output_zip_name}"] = {
+                        self._download_tokens[f"{file_id}:{output_name}"] = {
                             "token": download_token,
                             "ip": client_ip,
                             "created_at": time.time(),
                         }
 
-                        download_url = f"{self.router.prefix}/download/{file_id}/{output_zip_name}?token={download_token}"
+                        download_url = f"{self.router.prefix}/download/{file_id}/{output_name}?token={download_token}"
 
                         try:
                             result_card.clear()
@@ -849,12 +951,15 @@ class ArchiveToPdfModule(BaseModule):
                                     "w-full items-center justify-between"
                                 ):
                                     with ui.column():
-                                        ui.label(output_zip_name).classes(
+                                        ui.label(output_name).classes(
                                             "font-bold text-lg"
                                         )
-                                        ui.label(
-                                            f"成功转换 {success_count}/{total_count} 个文档"
-                                        ).classes("text-sm text-slate-500")
+                                        summary = f"成功转换 {success_count}/{total_count} 个文档"
+                                        if merged_info is not None:
+                                            summary += f" · {merged_info.describe()}"
+                                        ui.label(summary).classes(
+                                            "text-sm text-slate-500"
+                                        )
                                         # 显示直接下载链接
                                         ui.link("点击此处下载结果", download_url, new_tab=True).classes(
                                             "text-blue-500 hover:underline"
@@ -863,80 +968,36 @@ class ArchiveToPdfModule(BaseModule):
                         except Exception:
                             pass
                     else:
-                        safe_ui(status_label.set_text, "正在转换文档...")
-
-                        single_file_path, single_file_name = files_to_process[0]
-                        result_pdf = None
-
-                        if single_file_name.lower().endswith(".docx"):
-                            result_pdf = self._convert_docx_to_pdf(
-                                single_file_path, output_dir
-                            )
-                        elif single_file_name.lower().endswith(".md"):
-                            result_pdf = self._convert_md_to_pdf(
-                                single_file_path, output_dir
-                            )
-
-                        if not result_pdf or not os.path.exists(result_pdf):
-                            raise Exception("转换失败")
+                        progress.set_text("正在转换文档...")
 
+                        single_file_path, _ = files_to_process[0]
                         # 确保单文件输出也是原文件名
                         pdf_name = f"{input_stem}.pdf"
-                        final_pdf_path = os.path.join(output_dir, pdf_name)
-                        if os.path.exists(result_pdf) and result_pdf != final_pdf_path:
-                            shutil.move(result_pdf, final_pdf_path)
-
-                        state["processing"] = False
-                        safe_ui(progress_bar_inner.style, "width: 100%")
-                        safe_ui(
-                            progress_bar_inner.classes,
-                            add="bg-green-500",
-                            remove="bg-blue-500",
+                        result = await global_conversion_engine.convert(
+                            single_file_path,
+                            os.path.join(output_dir, pdf_name),
+                            self._conversion_options(task.id),
                         )
-                        safe_ui(status_label.set_text, "转换完成！")
-                        try:
-                            ui.notify("转换成功！", color="positive")
-                        except Exception:
-                            pass
 
-                        download_token = self._generate_token(client_ip, file_id)
-                        self._download_tokens[f"{file_id}:{pdf_name}"] = {
-                            "token": download_token,
-                            "ip": client_ip,
-                            "created_at": time.time(),
-                        }
-
-                        download_url = f"{self.router.prefix}/download/{file_id}/{pdf_name}?token={download_token}"
-
-                        try:
-                            result_card.clear()
-                            state["show_result"] = True
-                            with result_card:
-                                with ui.row().classes(
-                                    "w-full items-center justify-between"
-                                ):
-                                    with ui.column():
-                                        ui.label(pdf_name).classes("font-bold text-lg")
-                                        ui.label("文档转换完成").classes(
-                                            "text-sm text-slate-500"
-                                        )
-                                        # 显示直接下载链接
-                                        ui.link("点击此处下载PDF", download_url, new_tab=True).classes(
-                                            "text-blue-500 hover:underline"
-                                        )
-
-                        except Exception:
-                            pass
+                        if global_task_manager.is_cancelled(task.id):
+                            raise Exception(task.error_message or "任务已取消")
+                        if not result.success:
+                            raise Exception(result.error or "转换失败")
+                        show_single_result(file_id, pdf_name, result.info)
 
                 except Exception as ex:
                     error_msg = str(ex)
+                    task_status, task_error = "failed", error_msg
                     try:
                         ui.notify("处理失败", color="negative")
                     except Exception:
                         pass
                     show_error_report(error_msg)
                 finally:
-                    await global_task_manager.complete_task(task.id)
+                    await global_task_manager.complete_task(
+                        task.id, task_status, task_error
+                    )
+                    event_follower.cancel()
                     state["processing"] = False
                     safe_ui(convert_btn.enable)
 
@@ -1,6 +1,89 @@
 from abc import ABC, abstractmethod
+from typing import Callable, Optional
+
 from fastapi import APIRouter
 
+# 任务开始执行后进度条推进到 90% 所用的时间（秒），没有实际进度时示意仍在处理
+RUNNING_CREEP_SECONDS = 30
+
+
+def safe_ui(func, *args, **kwargs):
+    """安全更新 UI：页面关闭后元素已删除，忽略相关错误"""
+    try:
+        func(*args, **kwargs)
+    except RuntimeError as e:
+        if (
+            "deleted" in str(e).lower()
+            or "parent slot" in str(e).lower()
+            or "client" in str(e).lower()
+        ):
+            return
+        print(f"UI Update Runtime Error: {e}")
+    except Exception as e:
+        print(f"UI Update Error: {e}")
+
+
+class TaskProgress:
+    """
+    任务在页面上的进度反馈：状态文字与进度条。
+    进度条交给浏览器以 CSS 过渡渐进，服务端无需轮询刷新。
+    """
+
+    def __init__(self, status_label, progress_container, progress_bar):
+        self.status_label = status_label
+        self.progress_container = progress_container
+        self.progress_bar = progress_bar
+
+    def show(self):
+        safe_ui(self.status_label.style, "display: block")
+        safe_ui(self.progress_container.style, "display: block")
+        safe_ui(self.progress_bar.style, "width: 0%")
+
+    def set_text(self, text: str):
+        safe_ui(self.status_label.set_text, text)
+
+    def creep(self, width: str, seconds: float = 0.3):
+        safe_ui(
+            self.progress_bar.style,
+            f"width: {width}; transition-duration: {seconds}s",
+        )
+
+    def queued(self, position: Optional[int], eta: Optional[float] = None):
+        from app.core.task_manager import format_eta
+
+        wait = f"，预计等待{format_eta(eta)}" if eta else ""
+        self.set_text(f"排队中: 前方有 {position or 0} 个任务{wait}...")
+        self.creep("2%")
+
+    def running(self, text: str):
+        self.set_text(text)
+        self.creep("90%", RUNNING_CREEP_SECONDS)
+
+    def finish(self, text: str):
+        self.creep("100%")
+        safe_ui(self.progress_bar.classes, add="bg-green-500", remove="bg-blue-500")
+        self.set_text(text)
+
+    def follow(self, task_id: str, running_text: Optional[str] = None):
+        """订阅任务事件，排队位置变化时刷新界面；返回的后台任务应在任务结束后取消"""
+        import asyncio
+
+        from app.core.task_manager import (
+            EVENT_POSITION,
+            EVENT_QUEUED,
+            EVENT_STARTED,
+            global_task_manager,
+        )
+
+        async def follow_events():
+            async for event in global_task_manager.events(task_id):
+                if event.type in (EVENT_QUEUED, EVENT_POSITION):
+                    self.queued(event.position, event.eta)
+                elif event.type == EVENT_STARTED and running_text is not None:
+                    self.running(running_text)
+
+        return asyncio.create_task(follow_events())
+
 
 class BaseModule(ABC):
     def __init__(self):
@@ -16,6 +99,25 @@ class BaseModule(ABC):
         """默认是否开启"""
         return True
 
+    @property
+    def cost_class(self):
+        """资源消耗类别 (heavy / io / light)，决定任务在全局队列中占用的预算"""
+        from app.core.task_manager import COST_LIGHT
+
+        return COST_LIGHT
+
+    @property
+    def cost_weight(self):
+        """占用的并发预算权重，默认取资源类别对应的权重"""
+        from app.core.task_manager import COST_WEIGHTS
+
+        return COST_WEIGHTS.get(self.cost_class, 1)
+
+    @property
+    def task_timeout(self):
+        """单个任务开始执行后的最长时限（秒），超时将被终止并释放队列名额"""
+        return 600
+
     @property
     @abstractmethod
     def name(self):
@@ -36,3 +138,159 @@ class BaseModule(ABC):
     def setup_api(self):
         """可选：设置 FastAPI 路由"""
         pass
+
+    def cancel_on_disconnect(self, cancel: Callable[[], object]):
+        """用户关闭或离开页面时调用 cancel，取消任务并释放队列名额"""
+        from nicegui import ui
+
+        try:
+            ui.context.client.on_delete(cancel)
+        except Exception:
+            pass
+
+    async def run_conversion(
+        self,
+        input_path: str,
+        output_path: str,
+        options,
+        progress: TaskProgress,
+        *,
+        job_kind: str,
+        user_type: str,
+        ip: str,
+        filename: str,
+        content: Optional[bytes] = None,
+        running_text: str = "正在转换...",
+    ):
+        """
+        转换单个文档并在页面上反馈进度，返回 ConversionResult。
+        相同内容与选项命中转换缓存时直接返回；集群模式写入 jobs 表，由任意节点领取后交给
+        handle_conversion_job 执行；否则经本地 TaskManager 排队，在转换引擎中执行。
+        本地任务结束（成功、失败或取消）时记入任务历史；队列已满时抛出 QueueFullError。
+        """
+        from dataclasses import replace
+
+        from app.core import job_queue
+        from app.core.conversion_engine import (
+            ConversionResult,
+            global_conversion_engine,
+        )
+        from app.core.pdf_tools import load_pdf_info
+        from app.core.task_manager import (
+            PRIORITY_ADMIN,
+            PRIORITY_GUEST,
+            global_task_manager,
+        )
+
+        result = await global_conversion_engine.lookup(
+            input_path, output_path, options, content
+        )
+        if result is not None:
+            return result
+
+        if job_queue.is_enabled():
+            job_id = await job_queue.global_job_queue.enqueue(
+                job_kind,
+                {
+                    "input_path": input_path,
+                    "output_path": output_path,
+                    "add_blank_page": options.add_blank_page,
+                    "task_name": self.name,
+                    "user_type": user_type,
+                    "ip": ip,
+                    "filename": filename,
+                    "cost_class": self.cost_class,
+                    "timeout": self.task_timeout,
+                },
+                priority=PRIORITY_ADMIN if user_type == "admin" else PRIORITY_GUEST,
+            )
+            started = set()
+            disconnected = []
+            # 用户离开页面后，等待循环在下次轮询时取消任务
+            self.cancel_on_disconnect(lambda: disconnected.append(True))
+
+            async def on_poll(job):
+                if job["status"] == job_queue.JOB_QUEUED:
+                    progress.queued(await job_queue.global_job_queue.position(job_id))
+                elif job["worker"] not in started:
+                    started.add(job["worker"])
+                    progress.running(f"{running_text} (节点 {job['worker']})")
+
+            job = await job_queue.global_job_queue.wait(
+                job_id,
+                on_poll=on_poll,
+                timeout=self.task_timeout + job_queue.QUEUE_GRACE_SECONDS,
+                should_stop=lambda: bool(disconnected),
+            )
+            # 执行节点已在输出文件旁写入元数据记录（共享存储）
+            info = load_pdf_info(output_path)
+            return ConversionResult(
+                job["status"] == job_queue.JOB_COMPLETED,
+                output_path,
+                info.pages if info else (job["result"] or {}).get("pages", 0),
+                error=job["error_message"] or "",
+                info=info,
+            )
+
+        task = await global_task_manager.add_task(
+            name=self.name,
+            user_type=user_type,
+            ip=ip,
+            filename=filename,
+            cost_class=self.cost_class,
+            weight=self.cost_weight,
+            timeout=self.task_timeout,
+        )
+        self.cancel_on_disconnect(
+            lambda: global_task_manager.cancel_task(
+                task.id, "cancelled", "用户离开页面"
+            )
+        )
+        follower = progress.follow(task.id, running_text)
+        status, error = "completed", None
+        try:
+            if await global_task_manager.start_task(task.id) is None:
+                result = ConversionResult(False)
+            else:
+                result = await global_conversion_engine.convert(
+                    input_path, output_path, replace(options, task_id=task.id)
+                )
+            if global_task_manager.is_cancelled(task.id):
+                status, error = task.status, task.error_message
+                result = ConversionResult(False, error=error or "任务已取消")
+            elif not result.success:
+                status, error = "failed", result.error[-500:]
+            return result
+        except Exception as e:
+            status, error = "failed", str(e)
+            raise
+        finally:
+            await global_task_manager.complete_task(task.id, status, error)
+            follower.cancel()
+
+    async def handle_conversion_job(self, payload: dict) -> dict:
+        """run_conversion 写入 jobs 表的任务处理函数，在领取到任务的节点上执行"""
+        import os
+
+        from app.core.conversion_engine import (
+            ConversionOptions,
+            global_conversion_engine,
+        )
+
+        input_path = payload["input_path"]
+        output_path = (
+            payload.get("output_path") or f"{os.path.splitext(input_path)[0]}.pdf"
+        )
+        result = await global_conversion_engine.convert(
+            input_path,
+            output_path,
+            ConversionOptions(
+                add_blank_page=payload.get("add_blank_page", False),
+                timeout=payload.get("timeout"),
+                task_id=payload.get("task_id"),
+                module=self.name,
+            ),
+        )
+        if not result.success:
+            raise RuntimeError(result.error)
+        return {"pages": result.pages, "info": result.info.to_dict()}
@@ -1,14 +1,19 @@
 import os
 import uuid
-import asyncio
 import secrets
 import hashlib
 import time
 from pathlib import Path
-from app.modules.base import BaseModule
+from app.modules.base import BaseModule, TaskProgress, safe_ui
 from nicegui import ui, app
 from fastapi import Request
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import JSONResponse
+from app.core import job_queue, metrics
+from app.core.conversion_engine import ConversionOptions
+from app.core.downloads import file_response
+from app.core.task_manager import QueueFullError
+
+JOB_KIND = "docx_to_pdf"
 
 
 class DocxToPdfModule(BaseModule):
@@ -19,6 +24,9 @@ class DocxToPdfModule(BaseModule):
         self._download_tokens = {}
         self.setup_api()
         self._start_cleanup_timer()
+        job_queue.global_job_worker.register_handler(
+            JOB_KIND, self.handle_conversion_job
+        )
 
     def _generate_token(self, ip: str, file_id: str) -> str:
         raw = f"{ip}:{file_id}:{secrets.randbelow(1000000)}"
@@ -52,10 +60,20 @@ class DocxToPdfModule(BaseModule):
     def icon(self):
         return "picture_as_pdf"
 
+    @property
+    def cost_class(self):
+        from app.core.task_manager import COST_HEAVY
+
+        return COST_HEAVY
+
     def setup_api(self):
         @app.get(f"{self.router.prefix}/download/{{file_id}}/{{file_name}}")
         async def download_pdf(
-            request: Request, file_id: str, file_name: str, token: str = None
+            request: Request,
+            file_id: str,
+            file_name: str,
+            token: str = None,
+            inline: bool = False,
         ):
             # 路径安全防护：强制仅提取文件名，防止穿越攻击
             safe_id = os.path.basename(file_id)
@@ -95,79 +113,17 @@ class DocxToPdfModule(BaseModule):
                     content={"error": "User-Agent无效", "reason": "ua_invalid"},
                 )
 
-            return FileResponse(
-                file_path, media_type="application/pdf", filename=safe_name
+            metrics.downloads_total.inc(module=self.name)
+            return file_response(
+                request, file_path, safe_name, "application/pdf", inline
             )
 
-    def _get_pdf_info(self, pdf_path: str) -> dict:
-        try:
-            from pypdf import PdfReader
-
-            reader = PdfReader(pdf_path)
-            return {"pages": len(reader.pages)}
-        except Exception as e:
-            print(f"读取 PDF 信息出错: {e}")
-            return {"pages": 0}
-
-    def _add_blank_page_if_needed(self, pdf_path: str, add_blank_page: bool) -> bool:
-        if not add_blank_page:
-            return True
-        try:
-            import shutil
-            from pypdf import PdfReader, PdfWriter
-
-            reader = PdfReader(pdf_path)
-            num_pages = len(reader.pages)
-            if num_pages % 2 == 1:
-                writer = PdfWriter()
-                for page in reader.pages:
-                    writer.add_page(page)
-                last_page = reader.pages[-1]
-                width = float(last_page.mediabox.width)
-                height = float(last_page.mediabox.height)
-
-                from reportlab.pdfgen import canvas
-
-                blank_pdf_path = pdf_path.replace(".pdf", "_blank.pdf")
-                c = canvas.Canvas(blank_pdf_path, pagesize=(width, height))
-                c.showPage()
-                c.save()
-                blank_reader = PdfReader(blank_pdf_path)
-                writer.add_page(blank_reader.pages[0])
-                temp_output = pdf_path.replace(".pdf", "_temp.pdf")
-                with open(temp_output, "wb") as f:
-                    writer.write(f)
-                shutil.move(temp_output, pdf_path)
-                if os.path.exists(blank_pdf_path):
-                    os.remove(blank_pdf_path)
-                return True
-            return True
-        except Exception as e:
-            print(f"添加空白页时出错: {e}")
-            return False
-
     def setup_ui(self):
         ui.label("Word 转 PDF 转换器").classes("text-h4 mb-4")
         ui.markdown(
             "上传 `.docx` 文件，将其转换为高质量的 PDF，支持页数统计与在线预览。"
         ).classes("mb-4 text-slate-500")
 
-        # 定义一个内部函数来安全更新 UI，并打印非生命周期错误
-        def safe_ui(func, *args, **kwargs):
-            try:
-                func(*args, **kwargs)
-            except RuntimeError as e:
-                # 忽略元素已删除的错误
-                if (
-                    "deleted" in str(e).lower()
-                    or "parent slot" in str(e).lower()
-                    or "client" in str(e).lower()
-                ):
-                    return
-                print(f"UI Update Runtime Error: {e}")
-            except Exception as e:
-                print(f"UI Update Error: {e}")
-
         async def get_tool_security():
             from app.core import database
             from app.models.models import Tool
@@ -305,7 +261,6 @@ class DocxToPdfModule(BaseModule):
                 if not state["content"]:
                     return
 
-                from app.core.task_manager import global_task_manager
                 from app.core.auth import is_authenticated, verify_turnstile
 
                 if (
@@ -331,69 +286,18 @@ class DocxToPdfModule(BaseModule):
 
                 client_ip = app.storage.browser.get("id", "Anonymous")
 
+                input_path = None
+                progress = TaskProgress(
+                    status_label, progress_container, progress_bar_inner
+                )
                 try:
                     state["processing"] = True
                     safe_ui(convert_btn.disable)
 
-                    task = await global_task_manager.add_task(
-                        name="Word 转 PDF",
-                        user_type="admin" if is_authenticated() else "guest",
-                        ip=client_ip,
-                        filename=state["name"],
-                    )
-
                     # 显示进度条容器和状态标签
-                    safe_ui(status_label.style, "display: block")
-                    safe_ui(progress_container.style, "display: block")
-                    safe_ui(progress_bar_inner.style, "width: 0%")
+                    progress.show()
                     safe_ui(result_card.set_visibility, False)
 
-                    async def simulate_fake_progress():
-                        while state["processing"]:
-                            try:
-                                # 尝试解析当前百分比并模拟增长
-                                current_style = progress_bar_inner.style.get(
-                                    "width", "0%"
-                                )
-                                current_val = (
-                                    float(current_style.replace("%", "")) / 100
-                                )
-                                if current_val < 0.95:
-                                    # 进度越往后越慢
-                                    increment = (0.98 - current_val) / 20
-                                    new_p = (current_val + increment) * 100
-                                    safe_ui(
-                                        progress_bar_inner.style, f"width: {new_p}%"
-                                    )
-                            except Exception:
-                                pass
-                            await asyncio.sleep(0.8)
-
-                    asyncio.create_task(simulate_fake_progress())
-
-                    async def wait_for_start():
-                        while True:
-                            waiting_ids = [t.id for t in global_task_manager.queue]
-                            if task.id in waiting_ids:
-                                pos = waiting_ids.index(task.id) + 1
-                                safe_ui(
-                                    status_label.set_text,
-                                    f"排队中: 前方有 {pos - 1} 个任务...",
-                                )
-                                safe_ui(progress_bar_inner.style, "width: 2%")
-                            elif task.id in global_task_manager.active_tasks:
-                                break
-                            await asyncio.sleep(1.0)
-
-                    # 启动状态监控并请求开始任务
-                    monitor_task = asyncio.create_task(wait_for_start())
-                    try:
-                        await global_task_manager.start_task(task.id)
-                    finally:
-                        monitor_task.cancel()
-
-                    safe_ui(status_label.set_text, "正在转换 (LibreOffice 渲染中)...")
-
                     file_id = str(uuid.uuid4())
                     work_dir = os.path.join(self.temp_dir, file_id)
                     os.makedirs(work_dir, exist_ok=True)
@@ -409,47 +313,34 @@ class DocxToPdfModule(BaseModule):
                     with open(input_path, "wb") as f:
                         f.write(state["content"])
 
-                    import shutil
-
-                    libreoffice_path = (
-                        shutil.which("libreoffice") or "/usr/bin/libreoffice"
-                    )
+                    try:
+                        result = await self.run_conversion(
+                            input_path,
+                            output_path,
+                            ConversionOptions(
+                                add_blank_page=bool(add_blank_page.value),
+                                timeout=self.task_timeout,
+                                module=self.name,
+                            ),
+                            progress,
+                            job_kind=JOB_KIND,
+                            user_type="admin" if is_authenticated() else "guest",
+                            ip=client_ip,
+                            filename=state["name"],
+                            content=state["content"],
+                            running_text="正在转换 (LibreOffice 渲染中)...",
+                        )
+                    except QueueFullError as e:
+                        progress.set_text(str(e))
+                        try:
+                            ui.notify(str(e), color="warning")
+                        except Exception:
+                            pass
+                        return
 
-                    process = await asyncio.create_subprocess_exec(
-                        libreoffice_path,
-                        "--headless",
-                        "--convert-to",
-                        "pdf",
-                        input_path,
-                        "--outdir",
-                        work_dir,
-                        stdout=asyncio.subprocess.PIPE,
-                        stderr=asyncio.subprocess.PIPE,
-                    )
-                    stdout, stderr = await process.communicate()
-
-                    if process.returncode == 0:
-                        # 转换出的文件名可能不完全一致，确保它被重命名为原名.pdf
-                        actual_output = input_path.replace(".docx", ".pdf")
-                        if (
-                            os.path.exists(actual_output)
-                            and actual_output != output_path
-                        ):
-                            shutil.move(actual_output, output_path)
-
-                        safe_ui(status_label.set_text, "后期处理中...")
-                        if add_blank_page.value:
-                            self._add_blank_page_if_needed(output_path, True)
-
-                        info = self._get_pdf_info(output_path)
+                    if result.success:
                         state["processing"] = False
-                        safe_ui(progress_bar_inner.style, "width: 100%")
-                        safe_ui(
-                            progress_bar_inner.classes,
-                            add="bg-green-500",
-                            remove="bg-blue-500",
-                        )
-                        safe_ui(status_label.set_text, "转换完成！")
+                        progress.finish("转换完成！")
                         try:
                             ui.notify("转换成功！", color="positive")
                         except Exception:
@@ -476,9 +367,11 @@ class DocxToPdfModule(BaseModule):
                                         ui.label(output_name).classes(
                                             "font-bold text-lg"
                                         )
-                                        ui.label(f"页数: {info['pages']} 页").classes(
-                                            "text-sm text-slate-500"
-                                        )
+                                        ui.label(
+                                            result.info.describe()
+                                            if result.info
+                                            else f"页数: {result.pages} 页"
+                                        ).classes("text-sm text-slate-500")
 
                                     with ui.row().classes("gap-2"):
                                         ui.button(
@@ -486,7 +379,7 @@ class DocxToPdfModule(BaseModule):
                                             icon="visibility",
                                             on_click=lambda: (
                                                 preview_frame.set_content(
-                                                    f'<iframe src="{download_url}" style="width:100%; height:100%; border:none;"></iframe>'
+                                                    f'<iframe src="{download_url}&inline=1" style="width:100%; height:100%; border:none;"></iframe>'
                                                 ),
                                                 preview_dialog.open(),
                                             ),
@@ -499,7 +392,7 @@ class DocxToPdfModule(BaseModule):
                         except Exception:
                             pass
                     else:
-                        error_detail = f"LibreOffice Error:\n{stderr.decode()}"
+                        error_detail = f"LibreOffice Error:\n{result.error}"
                         try:
                             ui.notify("转换失败", color="negative")
                         except Exception:
@@ -512,8 +405,6 @@ class DocxToPdfModule(BaseModule):
                         pass
                     show_error_report(str(ex))
                 finally:
-                    if "task" in locals():
-                        await global_task_manager.complete_task(task.id)
                     state["processing"] = False
                     safe_ui(convert_btn.enable)
                     if input_path and os.path.exists(input_path):
@@ -3,15 +3,16 @@ import asyncio
 import secrets
 import hashlib
 import time
-from app.modules.base import BaseModule
+from app.core import job_queue, metrics
+from app.core.conversion_engine import ConversionOptions
+from app.core.downloads import file_response
+from app.core.task_manager import QueueFullError
+from app.modules.base import BaseModule, TaskProgress, safe_ui
 from nicegui import ui, app
 from fastapi import Request
-from fastapi.responses import FileResponse, JSONResponse
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-import markdown
-import re
+from fastapi.responses import JSONResponse
+
+JOB_KIND = "md_to_pdf"
 
 
 class MdToPdfModule(BaseModule):
@@ -22,6 +23,9 @@ class MdToPdfModule(BaseModule):
         self._download_tokens = {}
         self.setup_api()
         self._start_cleanup_timer()
+        job_queue.global_job_worker.register_handler(
+            JOB_KIND, self.handle_conversion_job
+        )
 
     def _generate_token(self, ip: str, file_id: str) -> str:
         raw = f"{ip}:{file_id}:{secrets.randbelow(1000000)}"
@@ -55,9 +59,17 @@ class MdToPdfModule(BaseModule):
     def icon(self):
         return "description"
 
+    @property
+    def cost_class(self):
+        from app.core.task_manager import COST_LIGHT
+
+        return COST_LIGHT
+
     def setup_api(self):
         @app.get(f"{self.router.prefix}/download/{{file_id}}")
-        async def download_md_pdf(request: Request, file_id: str, token: str = None):
+        async def download_md_pdf(
+            request: Request, file_id: str, token: str = None, inline: bool = False
+        ):
             safe_id = os.path.basename(file_id)
             file_path = os.path.join(self.temp_dir, f"{safe_id}.pdf")
 
@@ -93,48 +105,11 @@ class MdToPdfModule(BaseModule):
                     content={"error": "User-Agent无效", "reason": "ua_invalid"},
                 )
 
-            return FileResponse(
-                file_path,
-                media_type="application/pdf",
-                filename="Markdown转换结果.pdf",
+            metrics.downloads_total.inc(module=self.name)
+            return file_response(
+                request, file_path, "Markdown转换结果.pdf", "application/pdf", inline
             )
 
-    def _convert_md_to_pdf(self, md_content: str, output_path: str):
-        doc = SimpleDocTemplate(output_path, pagesize=A4)
-        styles = getSampleStyleSheet()
-
-        story = []
-
-        # 简单的 Markdown 处理：按行拆分并转换为 Paragraph
-        lines = md_content.split("\n")
-        for line in lines:
-            if not line.strip():
-                story.append(Spacer(1, 12))
-                continue
-
-            style = styles["Normal"]
-            if line.startswith("# "):
-                style = styles["Heading1"]
-                line = line[2:]
-            elif line.startswith("## "):
-                style = styles["Heading2"]
-                line = line[3:]
-            elif line.startswith("### "):
-                style = styles["Heading3"]
-                line = line[4:]
-
-            # 处理加粗等简单 HTML 标签（Markdown 转换后）
-            html_line = markdown.markdown(line)
-            # 移除外层的 <p> 标签，因为 reportlab Paragraph 会处理
-            clean_line = re.sub("<[^>]*>", "", html_line)
-
-            try:
-                story.append(Paragraph(clean_line, style))
-            except Exception:
-                story.append(Paragraph(line, style))
-
-        doc.build(story)
-
     def setup_ui(self):
         ui.label("Markdown 转 PDF").classes("text-h4 mb-4")
         ui.markdown("在下方输入或粘贴 Markdown 内容，将其转换为 PDF 文件。").classes(
@@ -164,6 +139,23 @@ class MdToPdfModule(BaseModule):
                 label="Markdown 内容", placeholder="在此输入 Markdown..."
             ).classes("w-full h-96 mb-4")
 
+            with (
+                ui.element("div")
+                .classes("w-full bg-slate-100 rounded-full h-3 mb-4 overflow-hidden")
+                .style("display: none") as progress_container
+            ):
+                progress_bar_inner = (
+                    ui.element("div")
+                    .classes("bg-blue-500 h-full transition-all duration-300")
+                    .style("width: 0%")
+                )
+
+            status_label = (
+                ui.label("")
+                .classes("text-sm text-slate-500 mb-2")
+                .style("display: none")
+            )
+
             result_card = ui.card().classes(
                 "w-full p-4 bg-slate-50 border-dashed border-2 border-slate-200 hidden mt-4"
             )
@@ -173,17 +165,64 @@ class MdToPdfModule(BaseModule):
                     ui.notify("请输入内容", color="warning")
                     return
 
+                from app.core.auth import is_authenticated
+
+                client_ip = app.storage.browser.get("id", "Anonymous")
+                content = md_input.value.encode("utf-8")
+
+                md_path = None
+                progress = TaskProgress(
+                    status_label, progress_container, progress_bar_inner
+                )
                 state["processing"] = True
                 convert_btn.disable()
                 try:
+                    progress.show()
+                    safe_ui(result_card.set_visibility, False)
+
                     file_id = str(asyncio.get_event_loop().time()).replace(".", "")
                     output_path = os.path.join(self.temp_dir, f"{file_id}.pdf")
-
-                    # 运行转换（同步执行，单线程）
-                    self._convert_md_to_pdf(md_input.value, output_path)
-
-                    # 获取客户端 IP 并生成 token
-                    client_ip = app.storage.browser.get("id", "Anonymous")
+                    md_path = os.path.join(self.temp_dir, f"{file_id}.md")
+
+                    # 渲染在转换进程池（或集群中的其他节点）执行，源文本经共享目录中的文件传递
+                    with open(md_path, "wb") as f:
+                        f.write(content)
+
+                    try:
+                        result = await self.run_conversion(
+                            md_path,
+                            output_path,
+                            ConversionOptions(
+                                timeout=self.task_timeout, module=self.name
+                            ),
+                            progress,
+                            job_kind=JOB_KIND,
+                            user_type="admin" if is_authenticated() else "guest",
+                            ip=client_ip,
+                            filename=f"{file_id}.md",
+                            content=content,
+                            running_text="正在渲染 PDF...",
+                        )
+                    except QueueFullError as e:
+                        progress.set_text(str(e))
+                        try:
+                            ui.notify(str(e), color="warning")
+                        except Exception:
+                            pass
+                        return
+
+                    if not result.success:
+                        progress.set_text("转换失败")
+                        try:
+                            ui.notify("转换失败", color="negative")
+                        except Exception:
+                            pass
+                        show_error_report(result.error or "未知错误")
+                        return
+
+                    progress.finish("转换完成！")
+
+                    # 生成下载 token
                     download_token = self._generate_token(client_ip, file_id)
                     self._download_tokens[f"{file_id}:md_pdf"] = {
                         "token": download_token,
@@ -194,26 +233,42 @@ class MdToPdfModule(BaseModule):
                     state["pdf_id"] = file_id
                     download_url = f"{self.router.prefix}/download/{file_id}?token={download_token}"
 
-                    result_card.set_visibility(True)
-                    with result_card:
+                    try:
                         result_card.clear()
-                        ui.label("转换成功！").classes("text-green-600 font-bold mb-2")
-
-                        with ui.column().classes("gap-2"):
-                            # 显示直接下载链接
-                            ui.link("点击此处下载 PDF", download_url, new_tab=True).classes(
-                                "text-blue-500 hover:underline text-lg"
+                        result_card.set_visibility(True)
+                        with result_card:
+                            ui.label("转换成功！").classes(
+                                "text-green-600 font-bold mb-2"
                             )
-                            ui.link("点击此处预览", download_url, new_tab=True).classes(
-                                "text-blue-500 hover:underline text-base"
-                            )
-
-                    ui.notify("转换完成", color="positive")
+                            if result.info:
+                                ui.label(result.info.describe()).classes(
+                                    "text-sm text-slate-500"
+                                )
+
+                            with ui.column().classes("gap-2"):
+                                # 显示直接下载链接
+                                ui.link("点击此处下载 PDF", download_url, new_tab=True).classes(
+                                    "text-blue-500 hover:underline text-lg"
+                                )
+                                ui.link(
+                                    "点击此处预览",
+                                    f"{download_url}&inline=1",
+                                    new_tab=True,
+                                ).classes("text-blue-500 hover:underline text-base")
+
+                        ui.notify("转换完成", color="positive")
+                    except Exception:
+                        pass
                 except Exception as e:
-                    ui.notify(f"转换失败: {str(e)}", color="negative")
+                    try:
+                        ui.notify(f"转换失败: {str(e)}", color="negative")
+                    except Exception:
+                        pass
                 finally:
-                    state["processing"] = True
-                    convert_btn.enable()
+                    state["processing"] = False
+                    safe_ui(convert_btn.enable)
+                    if md_path and os.path.exists(md_path):
+                        os.remove(md_path)
 
             convert_btn = (
                 ui.button("开始转换", on_click=convert)
@@ -4,7 +4,7 @@ from fastapi import Request
 from sqlalchemy import select, func
 
 from app.core import database
-from app.core.auth import is_authenticated
+from app.core.auth import get_admin_allowed_hosts, is_authenticated, is_host_allowed
 from app.ui.auth import render_login
 from app.ui.dashboard import render_dashboard, render_settings, render_smtp
 from app.ui.tools import render_tools
@@ -38,14 +38,9 @@ def create_admin_page(state, load_modules_func, sync_modules_func):
             ui.navigate.to("/setup")
             return
 
-        from app.core.settings_manager import get_setting
-
-        allowed_hosts_str = await get_setting("admin_allowed_hosts", "")
-        if allowed_hosts_str:
-            allowed_hosts = [
-                h.strip() for h in allowed_hosts_str.split(",") if h.strip()
-            ]
-            if client_ip not in allowed_hosts and request_host not in allowed_hosts:
+        allowed_hosts = await get_admin_allowed_hosts()
+        if allowed_hosts:
+            if not is_host_allowed(allowed_hosts, client_ip, request_host):
                 with ui.card().classes(
                     "absolute-center p-8 text-center shadow-lg border-t-4 border-red-500"
                 ):
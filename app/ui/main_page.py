@@ -51,7 +51,7 @@ def create_main_page(state, modules):
             with ui.row().classes("items-center gap-4"):
                 if state.db_connected:
                     # 队列状态组件
-                    from app.core.task_manager import global_task_manager
+                    from app.core.task_manager import format_eta, global_task_manager
 
                     @ui.refreshable
                     def queue_status_ui():
@@ -59,7 +59,7 @@ def create_main_page(state, modules):
                         with ui.row().classes(
                             "items-center bg-slate-700 rounded-full px-3 py-1 gap-2 border border-slate-600"
                         ):
-                            if status["active_count"] >= status["max_concurrent"]:
+                            if status["waiting_count"] > 0:
                                 ui.icon("hourglass_empty", color="orange").classes(
                                     "text-sm"
                                 )
@@ -72,7 +72,12 @@ def create_main_page(state, modules):
                                 )
                                 ui.label("空闲").classes("text-[10px] text-green-300")
                             with ui.tooltip(
-                                f"并发限制: {status['max_concurrent']} | 正在处理: {status['active_count']}"
+                                f"预算占用: {status['used_capacity']}/{status['capacity']} | 正在处理: {status['active_count']}"
+                                + (
+                                    f" | 预计等待: {format_eta(status['estimated_wait'])}"
+                                    if status["waiting_count"] > 0
+                                    else ""
+                                )
                             ):
                                 ui.label("详情").classes(
                                     "text-[10px] text-slate-400 underline cursor-help"
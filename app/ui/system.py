@@ -3,7 +3,11 @@ from nicegui import ui
 from sqlalchemy import select, text
 from app.core import database
 from app.models.models import TaskHistory
-from app.core.task_manager import global_task_manager
+from app.core.task_manager import format_eta, global_task_manager
+from app.core.history_writer import global_history_writer
+from app.core.office_pool import global_office_pool
+from app.core.conversion_cache import global_conversion_cache
+from app.core.warmup import global_warmup
 from app.core.updater import (
     check_for_updates,
     pull_updates,
@@ -18,6 +22,10 @@ async def render_system_status(state):
     with ui.grid(columns=(1, "md:3")).classes("w-full gap-4 mb-6"):
         c_lab = ui.label("CPU: -")
         m_lab = ui.label("MEM: -")
+        h_lab = ui.label("历史写入: -")
+        o_lab = ui.label("LibreOffice 实例池: -")
+        cache_lab = ui.label("转换缓存: -")
+        warm_lab = ui.label("引擎预热: -")
 
         async def update_stats():
             try:
@@ -26,6 +34,34 @@ async def render_system_status(state):
                 m_lab.set_text(
                     f"MEM: {s['memory_percent']}% ({s['memory_available']}G Free)"
                 )
+                h = global_history_writer.get_stats()
+                h_lab.set_text(
+                    f"历史写入: 积压 {h['backlog']} | 已写入 {h['flushed']} | "
+                    f"丢弃 {h['dropped']} | 延迟 {h['last_flush_ms']}ms (峰值 {h['max_flush_ms']}ms)"
+                )
+                o = global_office_pool.get_status()
+                o_lab.set_text(
+                    f"LibreOffice 实例池: 存活 {o['alive']}/{o['size']} | 空闲 {o['idle']}"
+                    if o["enabled"]
+                    else f"LibreOffice 实例池: 未启用 {o['reason']}".rstrip()
+                )
+                cs = global_conversion_cache.get_status()
+                cache_lab.set_text(
+                    f"转换缓存: 命中 {cs['hits']} | 未命中 {cs['misses']} "
+                    f"({cs['hit_rate']}%) | {cs['entries']} 项, "
+                    f"{cs['bytes'] / 1024 / 1024:.1f}/{cs['max_bytes'] / 1024 / 1024:.0f}MB"
+                    if cs["enabled"]
+                    else "转换缓存: 未启用"
+                )
+                w = global_warmup.get_status()
+                warm_lab.set_text(
+                    "引擎预热: "
+                    + " | ".join(
+                        f"{name} {e['status']}"
+                        + (f" {e['seconds']}s" if e["seconds"] is not None else "")
+                        for name, e in w["engines"].items()
+                    )
+                )
             except RuntimeError as e:
                 if "parent slot" in str(e):
                     return
@@ -154,24 +190,109 @@ async def render_update():
 
 
 def render_queue():
+    from app.core.autotuner import global_autotuner
+
     ui.label("队列监控").classes("text-2xl font-bold mb-6")
 
+    with ui.card().classes("w-full p-4 shadow-sm border mb-4"):
+        ui.label("并发预算").classes("font-bold mb-2")
+        tune_lab = ui.label("").classes("text-sm text-slate-600")
+
+        def update_tune_label():
+            t = global_autotuner.get_status()
+            mode = "自动" if t["enabled"] else "手动"
+            tune_lab.set_text(
+                f"当前预算: {t['capacity']} ({mode}) | 范围: {t['floor']}-{t['ceiling']} | "
+                f"{t['last_decision']}"
+            )
+
+        update_tune_label()
+
+        with ui.row().classes("items-center gap-4 mt-2"):
+            capacity_input = ui.number(
+                "预算", value=global_task_manager.capacity, min=1, precision=0
+            ).classes("w-24")
+
+            async def apply_override():
+                await global_autotuner.override(int(capacity_input.value or 1))
+                auto_switch.set_value(False)
+                update_tune_label()
+                ui.notify(f"并发预算已设为 {global_task_manager.capacity}")
+
+            ui.button("应用", on_click=apply_override).props("outline")
+
+            async def toggle_auto(e):
+                if e.value != global_autotuner.enabled:
+                    await global_autotuner.set_enabled(e.value)
+                    update_tune_label()
+
+            auto_switch = ui.switch(
+                "自动调节", value=global_autotuner.enabled, on_change=toggle_auto
+            )
+
+        with ui.row().classes("items-center gap-4 mt-2"):
+            floor_input = ui.number(
+                "下限", value=global_autotuner.floor, min=1, precision=0
+            ).classes("w-24")
+            ceiling_input = ui.number(
+                "上限", value=global_autotuner.ceiling, min=1, precision=0
+            ).classes("w-24")
+
+            async def apply_bounds():
+                await global_autotuner.set_bounds(
+                    int(floor_input.value or 1), int(ceiling_input.value or 1)
+                )
+                update_tune_label()
+                ui.notify("调节范围已保存")
+
+            ui.button("保存范围", on_click=apply_bounds).props("outline")
+
+        with ui.row().classes("items-center gap-4 mt-2"):
+            max_wait_input = ui.number(
+                "最长预计等待 (秒, 0 为不限制)",
+                value=global_task_manager.max_wait_seconds,
+                min=0,
+                precision=0,
+            ).classes("w-56")
+
+            async def apply_max_wait():
+                await global_task_manager.set_max_wait(int(max_wait_input.value or 0))
+                ui.notify("等待上限已保存，超出时将拒绝新的访客任务")
+
+            ui.button("保存上限", on_click=apply_max_wait).props("outline")
+
     @ui.refreshable
     def q_list():
         active = list(global_task_manager.active_tasks.values())
         waiting = global_task_manager.queue
         with ui.card().classes("w-full p-4 shadow-sm border"):
-            ui.label(f"活跃: {len(active)} | 等待: {len(waiting)}").classes(
-                "font-bold mb-4"
-            )
+            status = global_task_manager.get_status()
+            ui.label(
+                f"活跃: {len(active)} | 等待: {len(waiting)} | "
+                f"预算: {status['used_capacity']}/{status['capacity']} | "
+                f"新任务预计等待: {format_eta(status['estimated_wait'])}"
+            ).classes("font-bold mb-4")
             for t in active:
-                ui.label(f"● {t.name} ({t.id[:8]}) - 处理中").classes(
-                    "text-green-600 text-sm"
-                )
+                with ui.row().classes("w-full items-center justify-between"):
+                    ui.label(
+                        f"● {t.name} ({t.id[:8]}) [{t.cost_class}×{t.weight}] - 处理中"
+                    ).classes("text-green-600 text-sm")
+                    ui.button("取消", on_click=lambda t=t: cancel(t.id)).props(
+                        "flat dense color=negative size=sm"
+                    )
             for i, t in enumerate(waiting):
-                ui.label(f"{i + 1}. {t.name} ({t.id[:8]}) - 等待中").classes(
-                    "text-slate-500 text-sm"
-                )
+                with ui.row().classes("w-full items-center justify-between"):
+                    ui.label(
+                        f"{i + 1}. {t.name} ({t.id[:8]}) [{t.cost_class}×{t.weight}] - 等待中"
+                    ).classes("text-slate-500 text-sm")
+                    ui.button("取消", on_click=lambda t=t: cancel(t.id)).props(
+                        "flat dense color=negative size=sm"
+                    )
+
+    def cancel(task_id: str):
+        if global_task_manager.cancel_task(task_id, "cancelled", "管理员取消"):
+            ui.notify("任务已取消", color="positive")
+        q_list.refresh()
 
     q_container = ui.element("div")
     with q_container:
@@ -179,6 +300,7 @@ def render_queue():
 
     def safe_refresh_q():
         try:
+            update_tune_label()
             q_list.refresh()
         except RuntimeError as e:
             if "parent slot" in str(e):
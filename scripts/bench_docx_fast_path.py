@@ -0,0 +1,209 @@
+"""
+Word 转 PDF 快速路径基准测试。
+
+生成一组样例 docx（纯文本、标题与列表、表格、长文档、含图片），
+分别用纯 Python 渲染器与 LibreOffice 转换，比较耗时、页数与提取文字的相似度。
+含图片等复杂内容的文档应被复杂度检查拦下，只走 LibreOffice。
+未安装 LibreOffice 时只测量快速路径。
+
+用法: python scripts/bench_docx_fast_path.py [每个文档重复次数=5]
+"""
+
+import difflib
+import os
+import statistics
+import sys
+import tempfile
+import time
+import zipfile
+from typing import List, Optional
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.docx_renderer import analyze_docx, render_docx  # noqa: E402
+from app.core.office_pool import (  # noqa: E402
+    convert_to_pdf,
+    global_office_pool,
+    libreoffice_path,
+)
+
+NS = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+<Override PartName="/word/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>
+<Override PartName="/word/numbering.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.numbering+xml"/>
+</Types>"""
+RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>"""
+DOCUMENT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/numbering" Target="numbering.xml"/>
+</Relationships>"""
+STYLES = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:styles {NS}>
+<w:docDefaults><w:rPrDefault><w:rPr><w:sz w:val="21"/></w:rPr></w:rPrDefault>
+<w:pPrDefault><w:pPr><w:spacing w:after="120" w:line="276" w:lineRule="auto"/></w:pPr></w:pPrDefault></w:docDefaults>
+<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/></w:style>
+<w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/><w:basedOn w:val="Normal"/>
+<w:pPr><w:spacing w:before="240" w:after="120"/><w:outlineLvl w:val="0"/></w:pPr><w:rPr><w:b/><w:sz w:val="32"/></w:rPr></w:style>
+<w:style w:type="paragraph" w:styleId="Heading2"><w:name w:val="heading 2"/><w:basedOn w:val="Normal"/>
+<w:pPr><w:outlineLvl w:val="1"/></w:pPr><w:rPr><w:b/><w:sz w:val="28"/></w:rPr></w:style>
+</w:styles>"""
+NUMBERING = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:numbering {NS}>
+<w:abstractNum w:abstractNumId="0"><w:lvl w:ilvl="0"><w:numFmt w:val="bullet"/><w:lvlText w:val="•"/>
+<w:pPr><w:ind w:left="720" w:hanging="360"/></w:pPr></w:lvl></w:abstractNum>
+<w:abstractNum w:abstractNumId="1"><w:lvl w:ilvl="0"><w:numFmt w:val="decimal"/><w:lvlText w:val="%1."/>
+<w:pPr><w:ind w:left="720" w:hanging="360"/></w:pPr></w:lvl></w:abstractNum>
+<w:num w:numId="1"><w:abstractNumId w:val="0"/></w:num>
+<w:num w:numId="2"><w:abstractNumId w:val="1"/></w:num>
+</w:numbering>"""
+SECTION = (
+    '<w:sectPr><w:pgSz w:w="11906" w:h="16838"/>'
+    '<w:pgMar w:top="1440" w:right="1800" w:bottom="1440" w:left="1800"/></w:sectPr>'
+)
+TEXT = (
+    "转换服务需要在保持排版的前提下尽快返回结果。"
+    "The quick brown fox jumps over the lazy dog, 敏捷的棕色狐狸跳过了懒狗。"
+)
+
+
+def para(text: str, style: Optional[str] = None, num: Optional[int] = None) -> str:
+    ppr = ""
+    if style or num:
+        ppr = "<w:pPr>"
+        if style:
+            ppr += f'<w:pStyle w:val="{style}"/>'
+        if num:
+            ppr += f'<w:numPr><w:ilvl w:val="0"/><w:numId w:val="{num}"/></w:numPr>'
+        ppr += "</w:pPr>"
+    return f'<w:p>{ppr}<w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>'
+
+
+def table(rows: int, cols: int) -> str:
+    grid = "".join('<w:gridCol w:w="2000"/>' for _ in range(cols))
+    body = ""
+    for r in range(rows):
+        cells = "".join(
+            f'<w:tc><w:tcPr><w:tcW w:w="2000" w:type="dxa"/></w:tcPr>{para(f"单元格 {r}-{c}")}</w:tc>'
+            for c in range(cols)
+        )
+        body += f"<w:tr>{cells}</w:tr>"
+    return f"<w:tbl><w:tblGrid>{grid}</w:tblGrid>{body}</w:tbl>"
+
+
+def write_docx(path: str, body: List[str]):
+    document = (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f"<w:document {NS}><w:body>{''.join(body)}{SECTION}</w:body></w:document>"
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml", CONTENT_TYPES)
+        z.writestr("_rels/.rels", RELS)
+        z.writestr("word/_rels/document.xml.rels", DOCUMENT_RELS)
+        z.writestr("word/document.xml", document)
+        z.writestr("word/styles.xml", STYLES)
+        z.writestr("word/numbering.xml", NUMBERING)
+
+
+def corpus() -> dict:
+    outline = [para("项目周报", "Heading1")]
+    for i in range(3):
+        outline.append(para(f"第 {i + 1} 部分", "Heading2"))
+        outline.extend(para(f"{TEXT} 要点 {j}", num=1 + j % 2) for j in range(5))
+        outline.append(para(TEXT * 2))
+    long_doc = []
+    for i in range(20):
+        long_doc.append(para(f"章节 {i + 1}", "Heading1"))
+        long_doc.extend(para(TEXT * 3) for _ in range(12))
+    image = [
+        para("含图片的文档", "Heading1"),
+        '<w:p><w:r><w:drawing><wp:inline xmlns:wp="http://schemas.openxmlformats.org/'
+        'drawingml/2006/wordprocessingDrawing"/></w:drawing></w:r></w:p>',
+        para(TEXT),
+    ]
+    return {
+        "plain": [para(TEXT * 2) for _ in range(10)],
+        "outline": outline,
+        "table": [para("数据表", "Heading1"), table(12, 4), para(TEXT)],
+        "long": long_doc,
+        "image": image,
+    }
+
+
+def pdf_text(path: str) -> str:
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    return "".join("".join(p.extract_text().split()) for p in reader.pages)
+
+
+def page_count(path: str) -> int:
+    from pypdf import PdfReader
+
+    return len(PdfReader(path).pages)
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    has_office = os.path.exists(libreoffice_path())
+    mode = "UNO 实例池" if has_office and global_office_pool.available() else "命令行"
+    print(
+        f"LibreOffice: {mode if has_office else '未安装，仅测量快速路径'}，重复 {repeat} 次取中位数\n"
+    )
+    print(
+        f"{'文档':<8}{'复杂度检查':<12}{'快速路径(ms)':>14}{'LibreOffice(ms)':>17}"
+        f"{'页数(快/LO)':>14}{'文字相似度':>12}"
+    )
+    with tempfile.TemporaryDirectory() as work:
+        for name, body in corpus().items():
+            src = os.path.join(work, f"{name}.docx")
+            write_docx(src, body)
+            reason = analyze_docx(src)
+            check = "通过" if reason is None else reason
+            fast_pdf = os.path.join(work, f"{name}_fast.pdf")
+            fast_ms = lo_ms = None
+            if reason is None:
+                fast_ms = timed(lambda: render_docx(src, fast_pdf), repeat)
+            lo_dir = os.path.join(work, "lo")
+            os.makedirs(lo_dir, exist_ok=True)
+            lo_pdf = os.path.join(lo_dir, f"{name}.pdf")
+            if has_office:
+                lo_ms = timed(lambda: convert_to_pdf(src, lo_dir, timeout=120), repeat)
+
+            pages, similarity = "-", "-"
+            if fast_ms is not None and os.path.exists(lo_pdf):
+                pages = f"{page_count(fast_pdf)}/{page_count(lo_pdf)}"
+                ratio = difflib.SequenceMatcher(
+                    None, pdf_text(fast_pdf), pdf_text(lo_pdf), autojunk=False
+                ).ratio()
+                similarity = f"{ratio:.1%}"
+            elif fast_ms is not None:
+                pages = f"{page_count(fast_pdf)}/-"
+            print(
+                f"{name:<8}{check:<12}"
+                f"{'-' if fast_ms is None else f'{fast_ms:.1f}':>14}"
+                f"{'-' if lo_ms is None else f'{lo_ms:.1f}':>17}"
+                f"{pages:>14}{similarity:>12}"
+            )
+    global_office_pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+预览首屏时间基准测试。
+
+生成一份带图片的多页 PDF，通过下载接口使用的 file_response 提供服务，按三种方式
+模拟浏览器 PDF 查看器显示第一页前需要传输的数据：
+  整文件下载   不支持 Range（或以附件方式返回）时必须下载完整文件
+  Range        未线性化的文件：先读文件末尾的交叉引用表，再按需分段读取第一页的对象
+  Range+线性化 线性化文件：读取开头的线性化字典，取到第一页结束位置 /E 即可显示
+分段大小与 pdf.js 默认的 rangeChunkSize 一致，首屏时间按给定带宽与往返延迟估算：
+请求数 × RTT + 传输字节 / 带宽。线性化需要安装 qpdf。
+
+用法: python scripts/bench_first_page.py [页数=200] [带宽 Mbit/s=20] [RTT ms=50]
+"""
+
+import io
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings  # noqa: E402
+from app.core.downloads import file_response  # noqa: E402
+from app.core.pdf_tools import inspect_pdf, linearize_pdf, save_pdf_info  # noqa: E402
+
+# pdf.js 默认的分段请求大小
+CHUNK = 65536
+_LINEARIZED = re.compile(rb"/Linearized\b.*?/E\s+(\d+)", re.S)
+
+
+def make_pdf(path: str, pages: int):
+    """每页一段文字和一张不可压缩的噪点图，接近扫描件/插图较多的文档"""
+    from PIL import Image
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+
+    rng = random.Random(0)
+    c = canvas.Canvas(path, pagesize=A4)
+    for i in range(pages):
+        noise = bytes(rng.getrandbits(8) for _ in range(160 * 120 * 3))
+        image = Image.frombytes("RGB", (160, 120), noise)
+        c.drawImage(ImageReader(image), 60, 380, width=480, height=360)
+        for line in range(12):
+            c.drawString(60, 780 - line * 16, f"Page {i + 1} line {line + 1}")
+        c.showPage()
+    c.save()
+
+
+class RangeFile(io.RawIOBase):
+    """按 CHUNK 分段通过 HTTP Range 请求读取远端文件，记录请求数与传输字节数"""
+
+    def __init__(self, client, url: str, size: int):
+        self.client, self.url, self.size = client, url, size
+        self.pos = 0
+        self.buffer = bytearray(size)
+        self.chunks = set()
+        self.requests = 0
+        self.transferred = 0
+
+    def fetch(self, start: int, end: int):
+        """确保 [start, end) 已下载，连续缺失的分段合并为一次请求"""
+        missing = [
+            i
+            for i in range(start // CHUNK, (end - 1) // CHUNK + 1)
+            if i not in self.chunks
+        ]
+        while missing:
+            first = last = missing.pop(0)
+            while missing and missing[0] == last + 1:
+                last = missing.pop(0)
+            lo, hi = first * CHUNK, min((last + 1) * CHUNK, self.size) - 1
+            resp = self.client.get(self.url, headers={"Range": f"bytes={lo}-{hi}"})
+            assert resp.status_code == 206, resp.status_code
+            self.buffer[lo : hi + 1] = resp.content
+            self.chunks.update(range(first, last + 1))
+            self.requests += 1
+            self.transferred += len(resp.content)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.pos, io.SEEK_END: self.size}[whence]
+        self.pos = max(0, base + offset)
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+    def readinto(self, b):
+        end = min(self.pos + len(b), self.size)
+        if end <= self.pos:
+            return 0
+        self.fetch(self.pos, end)
+        n = end - self.pos
+        b[:n] = self.buffer[self.pos : end]
+        self.pos = end
+        return n
+
+
+def first_page_by_range(client, url: str, size: int):
+    """
+    模拟查看器：线性化文件读到 /E 为止；否则读取交叉引用表后沿页面树的第一个分支找到第一页，
+    再读取其内容流与图片（与 pdf.js 一样不展开整个页面树）
+    """
+    from pypdf import PdfReader
+
+    remote = RangeFile(client, url, size)
+    remote.fetch(0, min(CHUNK, size))
+    match = _LINEARIZED.search(bytes(remote.buffer[:1024]))
+    if match:
+        remote.fetch(0, min(int(match.group(1)), size))
+    else:
+        # 非严格模式会校验每个对象头，读遍整个文件；查看器只读取用到的对象
+        reader = PdfReader(io.BufferedReader(remote, CHUNK), strict=True)
+        page = reader.trailer["/Root"]["/Pages"]
+        while page.get("/Type") != "/Page":
+            page = page["/Kids"][0].get_object()
+        page["/Contents"].get_object().get_data()
+        for xobject in page["/Resources"].get("/XObject", {}).values():
+            xobject.get_object().get_data()
+    return remote.requests, remote.transferred
+
+
+def main():
+    from fastapi import FastAPI, Request
+    from fastapi.testclient import TestClient
+
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    mbps = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rtt = float(sys.argv[3]) if len(sys.argv) > 3 else 50
+    has_qpdf = shutil.which("qpdf") is not None
+
+    with tempfile.TemporaryDirectory() as work:
+        plain = os.path.join(work, "plain.pdf")
+        make_pdf(plain, pages)
+        files = {"plain": plain}
+        if has_qpdf:
+            linear = os.path.join(work, "linear.pdf")
+            shutil.copy(plain, linear)
+            settings.PDF_LINEARIZE_MIN_PAGES = 1
+            if not linearize_pdf(linear, pages):
+                print("qpdf 线性化失败")
+                return
+            files["linear"] = linear
+        for path in files.values():
+            save_pdf_info(path, inspect_pdf(path, pages))
+
+        app = FastAPI()
+
+        @app.get("/download/{name}")
+        def download(request: Request, name: str):
+            return file_response(
+                request, files[name], f"{name}.pdf", "application/pdf", inline=True
+            )
+
+        client = TestClient(app)
+        size = os.path.getsize(plain)
+        rows = [("整文件下载", 1, len(client.get("/download/plain").content), size)]
+        rows.append(
+            ("Range", *first_page_by_range(client, "/download/plain", size), size)
+        )
+        if has_qpdf:
+            linear_size = os.path.getsize(files["linear"])
+            rows.append(
+                (
+                    "Range+线性化",
+                    *first_page_by_range(client, "/download/linear", linear_size),
+                    linear_size,
+                )
+            )
+
+    print(f"{pages} 页，带宽 {mbps:g} Mbit/s，RTT {rtt:g} ms")
+    if not has_qpdf:
+        print("未安装 qpdf，跳过线性化")
+    print(f"{'方式':<12}{'文件(MB)':>10}{'请求数':>8}{'传输(KB)':>12}{'首屏(ms)':>12}")
+    for label, requests, transferred, file_size in rows:
+        ms = requests * rtt + transferred * 8 / (mbps * 1000)
+        print(
+            f"{label:<12}{file_size / 1024 / 1024:>10.1f}{requests:>8}"
+            f"{transferred / 1024:>12.0f}{ms:>12.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Markdown 渲染吞吐基准测试。
+
+生成一份包含标题、段落、列表、引用、代码块与表格的 Markdown 文档，分别用旧的逐行渲染
+（每行调用一次 markdown.markdown 并重建样式表）与当前的块级渲染重复排版，
+按文档数/秒与 MB/秒比较吞吐；两者都在当前进程内执行，不经过转换进程池。
+
+用法: python scripts/bench_markdown.py [章节数=40] [重复次数=10]
+"""
+
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.markdown_renderer import render_markdown  # noqa: E402
+
+SECTION = """## 第 {n} 节 性能说明
+
+本节介绍 **转换引擎** 的 *排队策略* 与 `TaskManager` 的实现细节，参见 [文档](https://example.com/{n})。
+长段落用于测试中英文混排的折行效果：The quick brown fox jumps over the lazy dog.
+每个任务在进程池中执行，事件循环只负责调度与推送进度。
+
+- 第一项：读取源文件
+- 第二项：渲染 PDF
+  - 嵌套：补齐空白页
+  - 嵌套：写入元数据
+- 第三项：返回结果
+
+1. 提交任务
+2. 等待完成
+
+> 提示：缓存命中时直接返回结果，不再重复渲染。
+
+```python
+def convert(path: str) -> str:
+    for i in range({n}):
+        print("第", i, "次")
+    return path
+```
+
+| 指标 | 数值 | 说明 |
+|:---|---:|:---:|
+| 页数 | {n} | 输出文件 |
+| 耗时 | 0.{n}s | 单次渲染 |
+
+---
+"""
+
+
+def make_document(sections: int) -> str:
+    return "# Markdown 渲染基准\n\n" + "\n".join(
+        SECTION.format(n=i + 1) for i in range(sections)
+    )
+
+
+def render_markdown_per_line(md_content: str, output_path: str):
+    """旧实现：逐行转换为段落，每次调用都重建样式表"""
+    import markdown
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+
+    doc = SimpleDocTemplate(output_path, pagesize=A4)
+    styles = getSampleStyleSheet()
+    story = []
+
+    for line in md_content.split("\n"):
+        if not line.strip():
+            story.append(Spacer(1, 12))
+            continue
+
+        style = styles["Normal"]
+        if line.startswith("# "):
+            style = styles["Heading1"]
+            line = line[2:]
+        elif line.startswith("## "):
+            style = styles["Heading2"]
+            line = line[3:]
+        elif line.startswith("### "):
+            style = styles["Heading3"]
+            line = line[4:]
+
+        html_line = markdown.markdown(line)
+        clean_line = re.sub("<[^>]*>", "", html_line)
+
+        try:
+            story.append(Paragraph(clean_line, style))
+        except Exception:
+            story.append(Paragraph(line, style))
+
+    doc.build(story)
+
+
+def measure(fn, text: str, output_path: str, repeat: int) -> float:
+    # 首次调用包含字体注册与模块导入，不计入
+    fn(text, output_path)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(text, output_path)
+    return time.perf_counter() - start
+
+
+def main():
+    sections = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    from pypdf import PdfReader
+
+    text = make_document(sections)
+    size_mb = len(text.encode("utf-8")) / 1024 / 1024
+    print(
+        f"文档 {len(text.encode('utf-8')) / 1024:.1f} KB，{sections} 节，重复 {repeat} 次"
+    )
+    print(f"{'方式':<8}{'耗时(s)':>10}{'文档/秒':>10}{'MB/秒':>10}{'页数':>8}")
+    with tempfile.TemporaryDirectory() as work:
+        for label, fn in (
+            ("逐行", render_markdown_per_line),
+            ("块级", render_markdown),
+        ):
+            target = os.path.join(work, f"{label}.pdf")
+            seconds = measure(fn, text, target, repeat)
+            pages = len(PdfReader(target).pages)
+            print(
+                f"{label:<8}{seconds:>10.2f}{repeat / seconds:>10.1f}"
+                f"{size_mb * repeat / seconds:>10.2f}{pages:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
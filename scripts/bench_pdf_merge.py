@@ -0,0 +1,86 @@
+"""
+合并输出基准测试。
+
+生成若干份多页 PDF，分别用 pypdf PdfWriter 一次性合并与流式逐页合并，
+比较耗时与峰值内存；流式合并的峰值内存应只随单个文档大小变化，与总页数无关。
+
+用法: python scripts/bench_pdf_merge.py [文档数,...=10,50,200] [每份页数=20]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.pdf_merge import merge_pdfs  # noqa: E402
+
+# 每页写入的文字行数，使文件大小接近真实的论文/报告
+LINES_PER_PAGE = 40
+
+
+def make_pdf(path: str, pages: int):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    c = canvas.Canvas(path, pagesize=A4)
+    for i in range(pages):
+        for line in range(LINES_PER_PAGE):
+            c.drawString(
+                60, 780 - line * 18, f"Page {i + 1} line {line + 1}: " + "lorem " * 12
+            )
+        c.showPage()
+    c.save()
+
+
+def merge_with_writer(parts, output_path: str):
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for path, title in parts:
+        writer.append(path, outline_item=title)
+    with open(output_path, "wb") as f:
+        writer.write(f)
+
+
+def measure(fn, parts, output_path: str):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn(parts, output_path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024
+
+
+def main():
+    counts = (
+        [int(n) for n in sys.argv[1].split(",")] if len(sys.argv) > 1 else [10, 50, 200]
+    )
+    pages = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    from pypdf import PdfReader
+
+    print(
+        f"{'文档数':>6}{'总页数':>8}{'方式':>11}{'耗时(s)':>10}"
+        f"{'峰值内存(MB)':>14}{'输出(MB)':>10}{'结果页数':>10}"
+    )
+    with tempfile.TemporaryDirectory() as work:
+        source = os.path.join(work, "source.pdf")
+        make_pdf(source, pages)
+        for count in counts:
+            parts = [(source, f"文档 {i + 1}") for i in range(count)]
+            for label, fn in (("PdfWriter", merge_with_writer), ("流式", merge_pdfs)):
+                target = os.path.join(work, f"{label}_{count}.pdf")
+                seconds, peak = measure(fn, parts, target)
+                size_mb = os.path.getsize(target) / 1024 / 1024
+                result = len(PdfReader(target).pages)
+                print(
+                    f"{count:>6}{count * pages:>8}{label:>11}{seconds:>10.2f}"
+                    f"{peak:>14.1f}{size_mb:>10.1f}{result:>10}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+空白页补齐基准测试。
+
+生成不同页数的奇数页 PDF，分别用旧的 pypdf 完整重写与新的增量更新追加空白页，
+比较耗时、峰值内存与写入的字节数，并用 pypdf 校验结果页数。
+
+用法: python scripts/bench_pdf_padding.py [页数,...=101,1001,5001]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.pdf_tools import _pad_by_rewrite, append_blank_page  # noqa: E402
+
+# 每页写入的文字行数，使文件大小接近真实的论文/报告
+LINES_PER_PAGE = 40
+
+
+def make_pdf(path: str, pages: int):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    c = canvas.Canvas(path, pagesize=A4)
+    for i in range(pages):
+        for line in range(LINES_PER_PAGE):
+            c.drawString(
+                60, 780 - line * 18, f"Page {i + 1} line {line + 1}: " + "lorem " * 12
+            )
+        c.showPage()
+    c.save()
+
+
+def measure(fn, path: str):
+    before = os.path.getsize(path)
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn(path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed * 1000, peak / 1024 / 1024, os.path.getsize(path) - before
+
+
+def main():
+    sizes = (
+        [int(n) for n in sys.argv[1].split(",")]
+        if len(sys.argv) > 1
+        else [101, 1001, 5001]
+    )
+    from pypdf import PdfReader
+
+    print(
+        f"{'页数':>6}{'文件(MB)':>10}{'方式':>8}{'耗时(ms)':>12}"
+        f"{'峰值内存(MB)':>14}{'增加字节':>12}{'结果页数':>10}"
+    )
+    with tempfile.TemporaryDirectory() as work:
+        for pages in sizes:
+            source = os.path.join(work, f"src_{pages}.pdf")
+            make_pdf(source, pages)
+            size_mb = os.path.getsize(source) / 1024 / 1024
+            for label, fn in (("重写", _pad_by_rewrite), ("增量", append_blank_page)):
+                target = os.path.join(work, f"{label}_{pages}.pdf")
+                shutil.copy(source, target)
+                ms, peak, grown = measure(fn, target)
+                result = len(PdfReader(target).pages)
+                print(
+                    f"{pages:>6}{size_mb:>10.1f}{label:>8}{ms:>12.1f}"
+                    f"{peak:>14.1f}{grown:>12}{result:>10}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+任务队列调度基准测试。
+
+在 10/100/1000 个等待者的情况下，测量每次 complete_task 到下一个任务开始执行的耗时，
+并与旧版基于 Condition.notify_all + 列表线性扫描的实现对比。
+
+用法: python scripts/bench_task_manager.py
+"""
+
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.task_manager import Task, TaskManager  # noqa: E402
+
+WAITER_COUNTS = (10, 100, 1000)
+# 旧实现每次完成都是 O(n²)，只测量前若干次完成以控制总耗时
+MEASURED_COMPLETIONS = 50
+
+
+class LegacyTaskManager:
+    """旧版调度逻辑的精简复刻，仅用于对比"""
+
+    def __init__(self, capacity: int = 1):
+        self.max_concurrent_tasks = capacity
+        self.queue: List[Task] = []
+        self.active_tasks: Dict[str, Task] = {}
+        self._lock = asyncio.Lock()
+        self._condition = asyncio.Condition()
+
+    async def add_task(self, name, user_type, ip, filename=None):
+        task = Task(name=name, user_type=user_type, ip=ip, filename=filename)
+        async with self._lock:
+            self.queue.append(task)
+        async with self._condition:
+            self._condition.notify_all()
+        return task
+
+    async def start_task(self, task_id):
+        async with self._condition:
+            while True:
+                async with self._lock:
+                    task = next((t for t in self.queue if t.id == task_id), None)
+                    if task:
+                        index = self.queue.index(task)
+                        if (
+                            len(self.active_tasks) < self.max_concurrent_tasks
+                            and index == 0
+                        ):
+                            self.queue.pop(index)
+                            task.status = "processing"
+                            task.started_at = datetime.utcnow()
+                            self.active_tasks[task.id] = task
+                            return task
+                    elif task_id in self.active_tasks:
+                        return self.active_tasks[task_id]
+                await self._condition.wait()
+
+    async def complete_task(self, task_id, status="completed", error_message=None):
+        async with self._lock:
+            self.active_tasks.pop(task_id, None)
+        async with self._condition:
+            self._condition.notify_all()
+
+
+async def measure(manager_cls, waiters: int) -> float:
+    """返回单次完成（含唤醒下一个任务）的平均耗时，单位微秒"""
+    manager = manager_cls(capacity=1)
+    started = asyncio.Queue()
+
+    async def worker(task):
+        await manager.start_task(task.id)
+        await started.put(task)
+
+    tasks = []
+    for i in range(waiters + 1):
+        tasks.append(await manager.add_task(f"bench-{i}", "guest", "127.0.0.1"))
+    workers = [asyncio.create_task(worker(t)) for t in tasks]
+
+    current = await started.get()
+    # 让所有等待者进入等待状态
+    await asyncio.sleep(0)
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+    rounds = min(waiters, MEASURED_COMPLETIONS)
+    begin = time.perf_counter()
+    for _ in range(rounds):
+        await manager.complete_task(current.id)
+        current = await started.get()
+    elapsed = time.perf_counter() - begin
+
+    for w in workers:
+        w.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    return elapsed / rounds * 1e6
+
+
+async def main():
+    print(f"{'waiters':>8} | {'legacy (us)':>12} | {'indexed (us)':>12} | speedup")
+    print("-" * 52)
+    for count in WAITER_COUNTS:
+        with contextlib.redirect_stdout(io.StringIO()):
+            legacy = await measure(LegacyTaskManager, count)
+            indexed = await measure(TaskManager, count)
+        print(
+            f"{count:>8} | {legacy:>12.1f} | {indexed:>12.1f} | {legacy / indexed:>6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
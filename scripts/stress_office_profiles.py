@@ -0,0 +1,77 @@
+"""
+LibreOffice 并发转换压力测试。
+
+生成若干最小 docx 文档，以指定并发调用 convert_to_pdf，
+统计失败数与配置目录加锁错误，用于验证每个工作进程使用独立用户配置目录后不再互相阻塞。
+任何转换失败时以非零状态退出。
+
+用法: python scripts/stress_office_profiles.py [文档数=300] [并发=8]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.office_pool import (  # noqa: E402
+    convert_to_pdf,
+    global_office_pool,
+    global_profile_pool,
+)
+from app.core.warmup import write_sample_docx  # noqa: E402
+
+# 多个 soffice 共用同一配置目录时常见的报错关键字
+LOCK_MARKERS = ("lock", "user installation could not be completed")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    parallel = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    with tempfile.TemporaryDirectory() as work:
+        inputs = []
+        for i in range(count):
+            path = os.path.join(work, f"doc_{i}.docx")
+            write_sample_docx(path, f"Stress document {i}")
+            inputs.append(path)
+        out_dir = os.path.join(work, "out")
+        os.makedirs(out_dir)
+
+        mode = "UNO 实例池" if global_office_pool.available() else "命令行"
+        print(
+            f"转换方式: {mode}, 文档数 {count}, 并发 {parallel}, "
+            f"命令行配置目录 {global_profile_pool.size} 个"
+        )
+
+        def run(path: str):
+            try:
+                code, error = convert_to_pdf(path, out_dir, timeout=120)
+            except Exception as e:
+                code, error = -1, str(e)
+            pdf = os.path.join(out_dir, os.path.basename(path)[:-5] + ".pdf")
+            return code == 0 and os.path.exists(pdf), error or ""
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=parallel) as pool:
+            results = list(pool.map(run, inputs))
+        elapsed = time.perf_counter() - start
+
+    failures = [err for ok, err in results if not ok]
+    lock_errors = [
+        err for err in failures if any(m in err.lower() for m in LOCK_MARKERS)
+    ]
+    print(
+        f"耗时 {elapsed:.1f}s, 吞吐 {count / elapsed:.2f} 个/秒, "
+        f"失败 {len(failures)} 个 (其中配置目录锁错误 {len(lock_errors)} 个)"
+    )
+    for err in failures[:5]:
+        print(f"  - {err.strip()[:200]}")
+    global_office_pool.close()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()